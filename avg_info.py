@@ -1,9 +1,12 @@
 #!/usr/bin/env python
 from typing import List
 
+import numpy as np
+
 from qvis_qperf.aggregated_connection import AggregatedConnection
+from qvis_qperf.confidence import mean_confidence_interval
 from qvis_qperf.connection import Connection, load_all_connections
-from qvis_qperf.plot import mean_confidence_interval
+from qvis_qperf.pipeline import Target
 
 
 def report_bytes_at_second(output, conn: AggregatedConnection, time: float):
@@ -20,14 +23,8 @@ def create_report(connections: List[Connection], output_name: str):
         f.write(f'mean connection establishment time: {agg_connection.establishment_time} s\n')
         f.write(f'mean time to first byte: {agg_connection.time_to_first_byte} s\n')
         f.write(f'mean rate (from ttfb): {agg_connection.mean_rate()} bit/s\n')
-        if agg_connection.time_to_first_byte > 6:
-            # for 2000ms rtt scenarios
-            f.write(f'inaccurate mean ramp up time (from ttfb): {agg_connection.reduce_steps(20).ramp_up_time_from_ttfb}\n')
-            f.write(
-                f'inaccurate mean rate (after ramp up): {agg_connection.reduce_steps(20).mean_rate_after_ramp_up} bit/s\n')
-        else:
-            f.write(f'inaccurate mean ramp up time (from ttfb): {agg_connection.reduce_steps(10).ramp_up_time_from_ttfb}\n')
-            f.write(f'inaccurate mean rate (after ramp up): {agg_connection.reduce_steps(10).mean_rate_after_ramp_up} bit/s\n')
+        f.write(f'mean ramp up time (from ttfb): {np.nanmean(agg_connection.ramp_up_times_from_ttfb)} s\n')
+        f.write(f'mean rate (after ramp up): {np.nanmean(agg_connection.steady_state_rates)} bit/s\n')
         f.write(f'total at 5s: {agg_connection.total_bytes_at(5)} byte\n')
         f.write(f'total at 10s: {agg_connection.total_bytes_at(10)} byte\n')
         f.write(f'total at 20s: {agg_connection.total_bytes_at(20)} byte\n')
@@ -39,31 +36,49 @@ def create_report(connections: List[Connection], output_name: str):
         f.write(f'time to first 100MB: {agg_connection.to_avg_connection().time_to_received_bytes(100_000_000)} s\n')
 
 
-create_report(load_all_connections('./data/72ms/qperf'), 'avg_info_72ms')
-create_report(load_all_connections('./data/72ms_client_side_proxy/qperf'), 'avg_info_72ms_client_side_proxy')
-create_report(load_all_connections('./data/72ms_two_proxies/qperf'), 'avg_info_72ms_two_proxies')
-create_report(load_all_connections('./data/72ms_two_proxies_simple/qperf'), 'avg_info_72ms_two_proxies_simple')
-create_report(load_all_connections('./data/72ms_two_proxies_simple_xse/qperf'), 'avg_info_72ms_two_proxies_simple_xse')
-
-create_report(load_all_connections('./data/220ms/qperf'), 'avg_info_220ms')
-create_report(load_all_connections('./data/220ms_client_side_proxy/qperf'), 'avg_info_220ms_client_side_proxy')
-create_report(load_all_connections('./data/220ms_two_proxies/qperf'), 'avg_info_220ms_two_proxies')
-create_report(load_all_connections('./data/220ms_two_proxies_simple/qperf'), 'avg_info_220ms_two_proxies_simple')
-create_report(load_all_connections('./data/220ms_two_proxies_simple_xse/qperf'), 'avg_info_220ms_two_proxies_simple_xse')
-
-create_report(load_all_connections('./data/500ms/qperf'), 'avg_info_500ms')
-create_report(load_all_connections('./data/500ms_client_side_proxy/qperf'), 'avg_info_500ms_client_side_proxy')
-create_report(load_all_connections('./data/500ms_two_proxies/qperf'), 'avg_info_500ms_two_proxies')
-create_report(load_all_connections('./data/500ms_two_proxies_simple/qperf'), 'avg_info_500ms_two_proxies_simple')
-create_report(load_all_connections('./data/500ms_two_proxies_simple_xse/qperf'), 'avg_info_500ms_two_proxies_simple_xse')
-
-create_report(load_all_connections('./data/1000ms/qperf'), 'avg_info_1000ms')
-create_report(load_all_connections('./data/1000ms_client_side_proxy/qperf'), 'avg_info_1000ms_client_side_proxy')
-create_report(load_all_connections('./data/1000ms_two_proxies/qperf'), 'avg_info_1000ms_two_proxies')
-create_report(load_all_connections('./data/1000ms_two_proxies_simple/qperf'), 'avg_info_1000ms_two_proxies_simple')
-create_report(load_all_connections('./data/1000ms_two_proxies_simple_xse/qperf'), 'avg_info_1000ms_two_proxies_simple_xse')
-
-create_report(load_all_connections('./data/2000ms/qperf'), 'avg_info_2000ms')
-create_report(load_all_connections('./data/2000ms_client_side_proxy/qperf'), 'avg_info_2000ms_client_side_proxy')
-create_report(load_all_connections('./data/2000ms_two_proxies/qperf'), 'avg_info_2000ms_two_proxies')
-create_report(load_all_connections('./data/2000ms_two_proxies_simple/qperf'), 'avg_info_2000ms_two_proxies_simple')
+def create_report_of_dir(dir: str, output_name: str):
+    create_report(load_all_connections(dir), output_name)
+
+
+def target(scenario: str) -> Target:
+    """scenario: directory name in ./data"""
+    dir = f'./data/{scenario}/qperf'
+    return Target(f'./results/avg_info_{scenario}.txt', create_report_of_dir, dir, f'avg_info_{scenario}', inputs=[dir])
+
+
+def targets() -> List[Target]:
+    return [
+        target('72ms'),
+        target('72ms_client_side_proxy'),
+        target('72ms_two_proxies'),
+        target('72ms_two_proxies_simple'),
+        target('72ms_two_proxies_simple_xse'),
+
+        target('220ms'),
+        target('220ms_client_side_proxy'),
+        target('220ms_two_proxies'),
+        target('220ms_two_proxies_simple'),
+        target('220ms_two_proxies_simple_xse'),
+
+        target('500ms'),
+        target('500ms_client_side_proxy'),
+        target('500ms_two_proxies'),
+        target('500ms_two_proxies_simple'),
+        target('500ms_two_proxies_simple_xse'),
+
+        target('1000ms'),
+        target('1000ms_client_side_proxy'),
+        target('1000ms_two_proxies'),
+        target('1000ms_two_proxies_simple'),
+        target('1000ms_two_proxies_simple_xse'),
+
+        target('2000ms'),
+        target('2000ms_client_side_proxy'),
+        target('2000ms_two_proxies'),
+        target('2000ms_two_proxies_simple'),
+    ]
+
+
+if __name__ == '__main__':
+    for t in targets():
+        t.run()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""import time of the qvis_qperf modules in fresh interpreters, the start up cost of every short script
+
+run from the repository root: python -m benchmarks.import_time [--repeat n] [module ...]
+
+fails if a data only module imports one of the plotting or statistics packages"""
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+DATA_MODULES = [
+    'qvis_qperf.connection',
+    'qvis_qperf.aggregated_connection',
+    'qvis_qperf.confidence',
+    'qvis_qperf.stream',
+    'qvis_qperf.qlog',
+    'qvis_qperf.xse',
+    'qvis_qperf.rtt',
+    'qvis_qperf.utilization',
+    'qvis_qperf.join',
+    'qvis_qperf.catalog',
+    'qvis_qperf.pipeline',
+]
+"""modules that must not import HEAVY_PACKAGES"""
+
+PLOT_MODULES = [
+    'qvis_qperf.plot',
+]
+"""modules that import HEAVY_PACKAGES on first use only"""
+
+HEAVY_PACKAGES = ['matplotlib', 'scipy']
+
+SHOWN_IMPORTS = 5
+"""slowest imported packages shown per module"""
+
+
+def import_times(module: str) -> Tuple[float, Dict[str, float]]:
+    """time to import module and the cumulative import time of each top level package,
+    in seconds, from python -X importtime"""
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             capture_output=True, text=True, check=True)
+    packages: Dict[str, float] = {}
+    total = 0.0
+    for line in process.stderr.splitlines():
+        fields = line[len('import time:'):].split('|')
+        if not line.startswith('import time:') or len(fields) != 3 or not fields[1].strip().isdigit():
+            # header line
+            continue
+        seconds = int(fields[1]) / 1_000_000
+        name = fields[2].strip()
+        if name == module:
+            total = seconds
+        elif '.' not in name:
+            packages[name] = seconds
+    return total, packages
+
+
+def loaded_heavy_packages(module: str) -> List[str]:
+    process = subprocess.run(
+        [sys.executable, '-c', f'import sys, {module}; print(*sorted(sys.modules))'],
+        capture_output=True, text=True, check=True)
+    return [package for package in HEAVY_PACKAGES if package in process.stdout.split()]
+
+
+def benchmark(module: str, repeat: int) -> float:
+    """median import time in seconds"""
+    # modules the interpreter imports on start up
+    _, startup = import_times('sys')
+    times = []
+    packages: Dict[str, List[float]] = {}
+    for _ in range(repeat):
+        total, imported = import_times(module)
+        times.append(total)
+        for package, seconds in imported.items():
+            if package not in startup and package != module.split('.')[0]:
+                packages.setdefault(package, []).append(seconds)
+    median = statistics.median(times)
+    slowest = sorted(packages.items(), key=lambda item: -statistics.median(item[1]))[:SHOWN_IMPORTS]
+    print(f'{module}: {median * 1000:.1f} ms  (' +
+          ', '.join(map(lambda item: f'{item[0]} {statistics.median(item[1]) * 1000:.1f} ms', slowest)) + ')')
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser(description='import time of qvis_qperf modules')
+    parser.add_argument('modules', nargs='*', default=DATA_MODULES + PLOT_MODULES)
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='interpreter starts per module')
+    args = parser.parse_args()
+
+    benchmark('numpy', args.repeat)
+    for module in args.modules:
+        benchmark(module, args.repeat)
+
+    failed = False
+    for module in DATA_MODULES + PLOT_MODULES:
+        heavy = loaded_heavy_packages(module)
+        if heavy:
+            print(f'{module} imports {", ".join(heavy)}')
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""throughput of qvis_qperf.parser compared to the former regex parser
+
+run from the repository root: python -m benchmarks.parse_qperf_log [dir]"""
+import os
+import re
+import sys
+import time
+from typing import List
+
+from qvis_qperf.connection import connection_files
+from qvis_qperf.parser import parse_qperf_log, CLIENT_REPORT_REGEX, ESTABLISHMENT_TIME_REGEX, \
+    TIME_TO_FIRST_BYTE_REGEX, INTERNAL_ERROR_REGEX
+
+
+def parse_qperf_log_regex(file: str, add_zero_report: bool = True, max_s: float = float('inf')) -> List[tuple]:
+    """the parser used by Connection before qvis_qperf.parser"""
+    reports = []
+    time_to_first_byte = None
+    with open(file) as f:
+        for line in f:
+            match = re.match(CLIENT_REPORT_REGEX, line)
+            if match:
+                time = float(match.group('time')) + time_to_first_byte
+                if time <= max_s:
+                    reports.append((time, float(match.group('rate')), int(match.group('bytes')),
+                                    int(match.group('packets'))))
+                continue
+            match = re.match(ESTABLISHMENT_TIME_REGEX, line)
+            if match:
+                continue
+            match = re.match(TIME_TO_FIRST_BYTE_REGEX, line)
+            if match:
+                time_to_first_byte = float(match.group('time'))
+                if add_zero_report:
+                    reports.append((time_to_first_byte, 0, 0, 0))
+                continue
+            re.match(INTERNAL_ERROR_REGEX, line)
+    return reports
+
+
+def benchmark(name: str, parse, files: List[str], size: int, lines: int, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for file in files:
+            parse(file)
+        best = min(best, time.perf_counter() - start)
+    print(f'{name}: {best:.3f}s, {lines / best:,.0f} lines/s, {size / best / 1_000_000:.1f} MB/s')
+    return best
+
+
+def main(dir: str = './data/2000ms/qperf'):
+    files = connection_files(dir)
+    size = sum(map(os.path.getsize, files))
+    lines = 0
+    for file in files:
+        with open(file) as f:
+            lines += sum(1 for _ in f)
+    print(f'{len(files)} files, {lines} lines, {size / 1_000_000:.1f} MB')
+
+    for file in files:
+        log = parse_qperf_log(file)
+        reports = list(zip(log.times, log.download_rates, log.bytes_received, log.packets_received))
+        if reports != parse_qperf_log_regex(file):
+            raise ValueError(f'parsers disagree on {file}')
+
+    regex = benchmark('regex parser', parse_qperf_log_regex, files, size, lines)
+    fast = benchmark('qvis_qperf.parser', parse_qperf_log, files, size, lines)
+    print(f'speedup: {regex / fast:.2f}x')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
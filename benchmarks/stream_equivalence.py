@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""checks that qperf logs replayed through a ConnectionStream aggregate like AggregatedConnection over the same files
+
+run from the repository root: python -m benchmarks.stream_equivalence [--runs n] [log ...]
+
+compares mean, variance and to_avg_connection of the logs as they are, of the logs with the first one
+missing its connection establishment line and of that one alone. fails if any of them differ"""
+import argparse
+import glob
+import io
+import math
+import os
+import statistics
+import sys
+import tempfile
+import warnings
+from typing import List
+
+import numpy as np
+
+from qvis_qperf.aggregated_connection import AggregatedConnection, COLUMNS
+from qvis_qperf.compressed import open_text
+from qvis_qperf.connection import Connection
+from qvis_qperf.parser import ESTABLISHMENT_TIME_PREFIX
+from qvis_qperf.stream import ConnectionStream, replay
+
+DEFAULT_LOGS = './data/*/qperf/*.log'
+DEFAULT_RUNS = 5
+
+AVG_COLUMNS = ['times', 'download_rates', 'bytes_received', 'packets_received']
+"""columns of to_avg_connection"""
+
+
+def without_establishment_time(file: str, directory: str) -> str:
+    """copy of the qperf log file in directory without its connection establishment line"""
+    copy = os.path.join(directory, 'no_establishment.log')
+    with open_text(file) as source, open(copy, 'w') as f:
+        f.writelines(filter(lambda line: not line.startswith(ESTABLISHMENT_TIME_PREFIX), source))
+    return copy
+
+
+def mean_time(connections: List[Connection], name: str) -> float:
+    """mean of the connections that have the time, NaN if none has it, like OnlineAggregatedConnection"""
+    times = [getattr(c, name) for c in connections if getattr(c, name, None) is not None]
+    return statistics.mean(times) if times else math.nan
+
+
+def _close(a, b) -> bool:
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    return a.shape == b.shape and bool(np.allclose(a, b, rtol=1e-9, atol=0, equal_nan=True))
+
+
+def compare(files: List[str]) -> List[str]:
+    """differences of the replayed stream and the AggregatedConnection of files, empty if they aggregate alike"""
+    output = io.StringIO()
+    replay(files, output, speed=math.inf)
+    stream = ConnectionStream().feed(io.StringIO(output.getvalue()))
+    stream.finish_run()
+    online = stream.aggregate
+    connections = list(map(Connection, files))
+    aggregated = AggregatedConnection(connections)
+
+    differences = []
+    if online.num_runs != len(connections):
+        differences.append(f'runs: {online.num_runs} != {len(connections)}')
+    for column in COLUMNS:
+        if not _close(online.mean(column), aggregated.mean(column)):
+            differences.append(f'mean of {column}')
+        matrix = aggregated.matrix(column)
+        with warnings.catch_warnings():
+            # columns with a single run
+            warnings.simplefilter('ignore', RuntimeWarning)
+            variance = np.where(aggregated.counts > 1, np.nanvar(matrix, axis=0, ddof=1), np.nan)
+        if not _close(online.variance(column), variance):
+            differences.append(f'variance of {column}')
+
+    avg = online.to_avg_connection()
+    # AggregatedConnection.establishment_time needs the time of every run
+    expected = Connection.from_arrays(
+        aggregated.mean('times'),
+        aggregated.mean('download_rates'),
+        aggregated.sum('bytes_received').astype(np.int64) // aggregated.counts,
+        aggregated.sum('packets_received').astype(np.int64) // aggregated.counts,
+        establishment_time=mean_time(connections, 'establishment_time'),
+        time_to_first_byte=aggregated.time_to_first_byte,
+    )
+    for column in AVG_COLUMNS:
+        if not _close(getattr(avg, column), getattr(expected, column)):
+            differences.append(f'to_avg_connection {column}')
+    for name in ('establishment_time', 'time_to_first_byte'):
+        if not _close(getattr(avg, name), getattr(expected, name)):
+            differences.append(f'to_avg_connection {name}: {getattr(avg, name)} != {getattr(expected, name)}')
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ConnectionStream against AggregatedConnection')
+    parser.add_argument('logs', nargs='*', help=f'qperf logs, default: the first --runs of {DEFAULT_LOGS}')
+    parser.add_argument('-n', '--runs', type=int, default=DEFAULT_RUNS)
+    args = parser.parse_args()
+    files = args.logs or sorted(glob.glob(DEFAULT_LOGS))[:args.runs]
+    if not files:
+        sys.exit(f'no qperf logs match {DEFAULT_LOGS}')
+
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        stripped = without_establishment_time(files[0], directory)
+        cases = {
+            'logs': files,
+            'first without establishment time': [stripped] + files[1:],
+            'only without establishment time': [stripped],
+        }
+        for name, case in cases.items():
+            differences = compare(case)
+            print(f'{name} ({len(case)} runs): ' + ('ok' if not differences else ', '.join(differences)))
+            failed = failed or bool(differences)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+"""scaling benchmarks of parsing, aggregation, intersections, reduce_steps and plotting on synthetic data
+
+run from the repository root: python -m benchmarks.suite [--full] [--output file.json] [--compare old.json]
+
+results are stored as JSON, see Result, so scaling curves can be tracked across commits"""
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import numpy as np
+from matplotlib import pyplot as plt
+
+from benchmarks.synthetic import DEFAULT_INTERVAL, write_qlog, write_qperf_logs
+from qvis_qperf.aggregated_connection import AggregatedConnection
+from qvis_qperf.connection import Connection, all_intersections, load_all_connections, reduce_steps
+from qvis_qperf.qlog import load_qlog, parse_qlog, read_qlog_window
+from qvis_qperf import plot
+
+RESULTS_DIR = './benchmarks/results'
+
+QUICK_RUNS = [1, 10, 100]
+QUICK_DURATIONS = [40, 600]
+FULL_RUNS = [1, 10, 100, 1000, 10000]
+FULL_DURATIONS = [40, 600, 3600]
+"""in seconds"""
+
+MAX_PAIRWISE_RUNS = 300
+"""all_intersections and plot_data_received_intersection compare all pairs of runs,
+larger run counts are skipped"""
+
+MAX_PLOTTED_RUNS = 1000
+
+QLOG_WINDOW_MS = 2000
+"""window of read_qlog_window, like the zoom figures"""
+
+SUPERLINEAR_EXPONENT = 1.5
+"""scaling exponents above this are reported"""
+
+REGRESSION_RATIO = 1.25
+"""slowdowns above this factor are reported by --compare"""
+
+
+class Workload:
+    """synthetic qperf logs and qlog traces, generated on first use"""
+    root: str
+    interval_s: float
+    rtt_ms: float
+
+    def __init__(self, root: str, interval_s: float = DEFAULT_INTERVAL, rtt_ms: float = 72):
+        self.root = root
+        self.interval_s = interval_s
+        self.rtt_ms = rtt_ms
+
+    def qperf_dir(self, runs: int, duration_s: float) -> str:
+        dir = os.path.join(self.root, f'qperf-{runs}runs-{duration_s}s-{self.interval_s}s-{self.rtt_ms}ms')
+        if not os.path.isdir(dir):
+            write_qperf_logs(dir + '.tmp', runs, duration_s=duration_s, interval_s=self.interval_s,
+                             rtt_ms=self.rtt_ms)
+            os.replace(dir + '.tmp', dir)
+        return dir
+
+    def connections(self, runs: int, duration_s: float) -> List[Connection]:
+        return load_all_connections(self.qperf_dir(runs, duration_s), use_cache=False)
+
+    def qlog(self, duration_s: float, packets_per_second: int) -> str:
+        file = os.path.join(self.root, f'{duration_s}s-{packets_per_second}pps-{self.rtt_ms}ms.qlog.gz')
+        if not os.path.isfile(file):
+            write_qlog(file + '.tmp.gz', duration_s=duration_s, rtt_ms=self.rtt_ms,
+                       packets_per_second=packets_per_second)
+            os.replace(file + '.tmp.gz', file)
+        return file
+
+
+class Result:
+    case: str
+    params: Dict[str, float]
+    best_s: float
+    mean_s: float
+    repeat: int
+
+    def __init__(self, case: str, params: Dict[str, float], times: List[float]):
+        self.case = case
+        self.params = params
+        self.best_s = min(times)
+        self.mean_s = sum(times) / len(times)
+        self.repeat = len(times)
+
+    def to_json(self) -> dict:
+        return {'case': self.case, 'params': self.params, 'best_s': self.best_s, 'mean_s': self.mean_s,
+                'repeat': self.repeat}
+
+    @property
+    def key(self) -> str:
+        return f'{self.case}({", ".join(f"{k}={v}" for k, v in sorted(self.params.items()))})'
+
+
+def measure(function: Callable[[], object], repeat: int = 3, budget_s: float = 10) -> List[float]:
+    """wall clock times of repeated calls, stops early once budget_s is used up"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+        if sum(times) > budget_s:
+            break
+    return times
+
+
+def _warm(function: Callable[[], object]) -> Callable[[], object]:
+    """call function once before timing, e.g. to fill a cache"""
+    function()
+    return function
+
+
+def _plot(function: Callable[..., object], *args, **kwargs) -> Callable[[], object]:
+    def render():
+        fig, ax = plt.subplots()
+        function(ax, *args, **kwargs)
+        fig.canvas.draw()
+        plt.close(fig)
+    return render
+
+
+class Suite:
+    workload: Workload
+    runs: List[int]
+    durations: List[float]
+    repeat: int
+    cases: Optional[List[str]]
+    results: List[Result]
+
+    def __init__(self, workload: Workload, runs: List[int], durations: List[float], repeat: int = 3,
+                 cases: Optional[List[str]] = None):
+        self.workload = workload
+        self.runs = runs
+        self.durations = durations
+        self.repeat = repeat
+        self.cases = cases
+        self.results = []
+
+    def _run(self, case: str, params: Dict[str, float], setup: Callable[[], Callable[[], object]]):
+        """setup is not timed, it returns the function to time"""
+        if self.cases is not None and case not in self.cases:
+            return
+        function = setup()
+        result = Result(case, params, measure(function, repeat=self.repeat))
+        self.results.append(result)
+        print(f'{result.key}: {result.best_s:.4f}s', flush=True)
+
+    def run(self) -> List[Result]:
+        w = self.workload
+        duration = self.durations[0]
+        for duration_s in self.durations:
+            params = {'duration_s': duration_s}
+            file = os.path.join(w.qperf_dir(1, duration_s), '1.log')
+            self._run('parse_connection', params, lambda: lambda: Connection(file))
+            self._run('intersections', params, lambda: _intersections(*w.connections(2, duration_s)))
+            self._run('reduce_steps', params, lambda: _reduce_steps(w.connections(1, duration_s)[0]))
+            self._run('plot_rate', params, lambda: _plot(plot.plot_rate, w.connections(1, duration_s)[0]))
+            self._run('plot_data_received', params,
+                      lambda: _plot(plot.plot_data_received, w.connections(1, duration_s)[0]))
+            qlog = w.qlog(duration_s, packets_per_second=200)
+            self._run('parse_qlog', params, lambda: lambda: parse_qlog(qlog))
+            self._run('load_qlog_cached', params, lambda: _warm(lambda: load_qlog(qlog)))
+            # the first call builds the index, a window read should not depend on the duration
+            self._run('read_qlog_window', params, lambda: _warm(lambda: read_qlog_window(qlog, max_ms=QLOG_WINDOW_MS)))
+
+        for num_runs in self.runs:
+            params = {'runs': num_runs, 'duration_s': duration}
+            dir = w.qperf_dir(num_runs, duration)
+            self._run('load_all_connections', params, lambda: lambda: load_all_connections(dir, use_cache=False))
+            self._run('load_all_connections_cached', params,
+                      lambda: _warm(lambda: load_all_connections(dir)))
+            connections = w.connections(num_runs, duration)
+            self._run('aggregate', params, lambda: lambda: _aggregate(connections))
+            self._run('reduce_steps_all', params, lambda: lambda: reduce_steps(connections, 10))
+            if num_runs <= MAX_PAIRWISE_RUNS:
+                self._run('all_intersections', params, lambda: lambda: list(all_intersections(connections)))
+            if num_runs <= MAX_PLOTTED_RUNS:
+                self._run('plot_rate_runs', params, lambda: _plot(plot.plot_rate, connections))
+                self._run('plot_rate_aggregated', params,
+                          lambda: _plot(plot.plot_rate, AggregatedConnection(connections)))
+                self._run('plot_time_to_first_byte', params,
+                          lambda: _plot(plot.plot_time_to_first_byte, AggregatedConnection(connections)))
+                self._run('plot_bytes_at_second', params,
+                          lambda: _plot(plot.plot_bytes_at_second, [connections], duration / 2, x=['runs']))
+            if num_runs <= MAX_PAIRWISE_RUNS and num_runs <= 30:
+                colors = [f'C{index % 10}' for index in range(num_runs)]
+                self._run('plot_data_received_intersection', params,
+                          lambda: _plot(plot.plot_data_received_intersection, connections, colors))
+        return self.results
+
+
+def _intersections(a: Connection, b: Connection) -> Callable[[], object]:
+    return lambda: list(a.intersections(b))
+
+
+def _reduce_steps(connection: Connection) -> Callable[[], object]:
+    return lambda: connection.reduce_steps(10)
+
+
+def _aggregate(connections: List[Connection]):
+    aggregated = AggregatedConnection(connections)
+    aggregated.to_avg_connection()
+    aggregated.percentile([5, 50, 95])
+    aggregated.total_bytes_at_times([10, 20])
+    return aggregated.mean_rate()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def to_json(results: List[Result], workload: Workload) -> dict:
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workload': {'interval_s': workload.interval_s, 'rtt_ms': workload.rtt_ms},
+        'results': list(map(lambda r: r.to_json(), results)),
+    }
+
+
+def scaling_exponents(results: List[Result]) -> List[str]:
+    """log-log slope between consecutive sizes of each case,
+    1 is linear, 2 quadratic. only cases with a single varying parameter are considered"""
+    lines = []
+    by_case: Dict[str, List[Result]] = {}
+    for result in results:
+        by_case.setdefault(result.case, []).append(result)
+    for case, case_results in by_case.items():
+        varying = [p for p in case_results[0].params if len(set(r.params[p] for r in case_results)) > 1]
+        if len(varying) != 1:
+            continue
+        parameter = varying[0]
+        case_results = sorted(case_results, key=lambda r: r.params[parameter])
+        for smaller, larger in zip(case_results, case_results[1:]):
+            exponent = (math.log(larger.best_s / smaller.best_s) /
+                        math.log(larger.params[parameter] / smaller.params[parameter]))
+            marker = '  <- superlinear' if exponent > SUPERLINEAR_EXPONENT else ''
+            lines.append(f'{case}: {parameter} {smaller.params[parameter]} -> {larger.params[parameter]}: '
+                         f'exponent {exponent:.2f}{marker}')
+    return lines
+
+
+def compare(results: List[Result], previous_file: str) -> List[str]:
+    """slowdowns compared to a previous results file"""
+    with open(previous_file) as f:
+        previous = {Result(r['case'], r['params'], [r['best_s']]).key: r['best_s'] for r in json.load(f)['results']}
+    lines = []
+    for result in results:
+        if result.key in previous and previous[result.key] > 0:
+            ratio = result.best_s / previous[result.key]
+            marker = '  <- regression' if ratio > REGRESSION_RATIO else ''
+            lines.append(f'{result.key}: {ratio:.2f}x{marker}')
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark qvis_qperf on synthetic data')
+    parser.add_argument('--full', action='store_true',
+                        help=f'runs {FULL_RUNS} and durations {FULL_DURATIONS}s, '
+                             f'default: runs {QUICK_RUNS} and durations {QUICK_DURATIONS}s')
+    parser.add_argument('--runs', type=int, nargs='+', help='numbers of runs')
+    parser.add_argument('--durations', type=float, nargs='+', help='run durations in seconds')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='report interval in seconds')
+    parser.add_argument('--rtt', type=float, default=72, help='in milliseconds')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--cases', nargs='+', help='only run these cases')
+    parser.add_argument('--workdir', help='keep the generated data in this directory, default: a temporary one')
+    parser.add_argument('--output', help=f'results file, default: {RESULTS_DIR}/<time>.json')
+    parser.add_argument('--compare', metavar='RESULTS', help='report slowdowns compared to a previous results file')
+    args = parser.parse_args()
+
+    runs = args.runs or (FULL_RUNS if args.full else QUICK_RUNS)
+    durations = args.durations or (FULL_DURATIONS if args.full else QUICK_DURATIONS)
+    with tempfile.TemporaryDirectory() as tmp:
+        workload = Workload(args.workdir or tmp, interval_s=args.interval, rtt_ms=args.rtt)
+        os.makedirs(workload.root, exist_ok=True)
+        results = Suite(workload, runs, durations, repeat=args.repeat, cases=args.cases).run()
+
+    output = args.output or os.path.join(RESULTS_DIR, f'{datetime.datetime.now():%Y%m%d-%H%M%S}.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(to_json(results, workload), f, indent=1)
+    print(f'saved results as {output}')
+
+    print('\n'.join(scaling_exponents(results)))
+    if args.compare:
+        print('\n'.join(compare(results, args.compare)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
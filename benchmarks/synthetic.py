@@ -0,0 +1,139 @@
+"""synthetic qperf client logs and qlog NDJSON traces of arbitrary size
+
+the shape follows the measurements in ./data: a slow start that doubles the rate every RTT
+up to the bottleneck bandwidth, noise, and rare rate drops, so runs cross each other"""
+import gzip
+import json
+import os
+from typing import IO, Iterator, List
+
+import numpy as np
+
+DEFAULT_BANDWIDTH = 100_000_000
+"""in bit per second"""
+
+DEFAULT_INTERVAL = 0.1
+"""in seconds, qperf reports every 100ms"""
+
+PACKET_SIZE = 1252
+"""in bytes"""
+
+
+def _open(file: str) -> IO[str]:
+    if file.endswith('.gz'):
+        return gzip.open(file, 'wt', compresslevel=1)
+    return open(file, 'w')
+
+
+def _rates(times: np.ndarray, rtt_ms: float, bandwidth: float, rng: np.random.Generator) -> np.ndarray:
+    """in bit per second"""
+    rtt = rtt_ms / 1000
+    initial_rate = 32 * PACKET_SIZE * 8 / rtt
+    rates = np.minimum(initial_rate * np.exp2(np.minimum(times / rtt, 60)), bandwidth * 0.95)
+    rates *= rng.normal(1, 0.03, len(times))
+    drops = rng.random(len(times)) < 0.005
+    rates[drops] *= rng.uniform(0.3, 0.8, np.count_nonzero(drops))
+    return np.clip(rates, 0, bandwidth * 1.3)
+
+
+def qperf_log_lines(duration_s: float = 40, interval_s: float = DEFAULT_INTERVAL, rtt_ms: float = 72,
+                    bandwidth: float = DEFAULT_BANDWIDTH, seed: int = 0) -> List[str]:
+    """lines of a qperf client log with a report every interval_s seconds"""
+    rng = np.random.default_rng(seed)
+    rtt = rtt_ms / 1000
+    establishment_time = 2 * rtt + rng.uniform(0, 0.01)
+    time_to_first_byte = establishment_time + rtt + rng.uniform(0, 0.01)
+    count = int(duration_s / interval_s)
+    times = (np.arange(1, count + 1) * interval_s + rng.uniform(0, interval_s * 0.01, count))
+    rates = _rates(times, rtt_ms, bandwidth, rng)
+    bytes_received = (rates * interval_s / 8).astype(np.int64)
+    packets_received = bytes_received // PACKET_SIZE
+    lines = [
+        f'Bandwidth: {bandwidth / 1_000_000:.0f} Mbit/s',
+        f'RTT: {rtt_ms:.0f} ms',
+        f'BDP: {int(bandwidth / 8 * rtt)} B/s',
+        f'Max In-Flight Packets: {int(bandwidth / 8 * rtt / PACKET_SIZE)}',
+        f'[server] starting server with pid 1, port 18080, cc cubic, iw 32',
+        f'[server][session 0] open',
+        f'[client] connection establishment time: {establishment_time:.6f} s',
+        f'[server][session 0][stream 0] open',
+        f'[client] time to first byte: {time_to_first_byte:.6f} s',
+    ]
+    lines.extend(map(
+        lambda r: f'[client] second {r[0]:.6f}: {r[1]:.6f} bit/s, bytes received: {r[2]} B, packets received: {r[3]}',
+        zip(times.tolist(), rates.tolist(), bytes_received.tolist(), packets_received.tolist())))
+    lines.append(f'[client] total: bytes received: {int(bytes_received.sum())} B, '
+                 f'packets received: {int(packets_received.sum())}')
+    return lines
+
+
+def write_qperf_log(file: str, duration_s: float = 40, interval_s: float = DEFAULT_INTERVAL, rtt_ms: float = 72,
+                    bandwidth: float = DEFAULT_BANDWIDTH, seed: int = 0):
+    with _open(file) as f:
+        f.write('\n'.join(qperf_log_lines(duration_s, interval_s, rtt_ms, bandwidth, seed)))
+        f.write('\n')
+
+
+def write_qperf_logs(dir: str, runs: int, duration_s: float = 40, interval_s: float = DEFAULT_INTERVAL,
+                     rtt_ms: float = 72, bandwidth: float = DEFAULT_BANDWIDTH, extension: str = '.log') -> List[str]:
+    """runs logs named like the measurements, 1.log to {runs}.log"""
+    os.makedirs(dir, exist_ok=True)
+    files = []
+    for run in range(1, runs + 1):
+        file = os.path.join(dir, f'{run}{extension}')
+        write_qperf_log(file, duration_s, interval_s, rtt_ms, bandwidth, seed=run)
+        files.append(file)
+    return files
+
+
+def qlog_events(duration_s: float = 40, rtt_ms: float = 72, packets_per_second: int = 2000,
+                vantage_point: str = 'client', seed: int = 0) -> Iterator[dict]:
+    """qlog events of a download as seen by the client, or the server if vantage_point is 'server':
+    1RTT packets with one stream frame each, an ACK every second packet and metrics every 10 packets"""
+    rng = np.random.default_rng(seed)
+    count = int(duration_s * packets_per_second)
+    times = np.sort(rng.uniform(rtt_ms * 3, duration_s * 1000, count)).round(6)
+    lengths = rng.integers(PACKET_SIZE // 2, PACKET_SIZE, count)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    data_event = 'transport:packet_received' if vantage_point == 'client' else 'transport:packet_sent'
+    ack_event = 'transport:packet_sent' if vantage_point == 'client' else 'transport:packet_received'
+    yield {
+        'qlog_format': 'NDJSON',
+        'qlog_version': 'draft-02',
+        'title': 'synthetic qlog',
+        'trace': {
+            'vantage_point': {'type': vantage_point},
+            'common_fields': {'ODCID': 'c0ffee', 'reference_time': 1645139833497.7573, 'time_format': 'relative'},
+        },
+    }
+    for index, (time, length, offset) in enumerate(zip(times.tolist(), lengths.tolist(), offsets.tolist())):
+        yield {'time': time, 'name': data_event, 'data': {
+            'header': {'packet_type': '1RTT', 'packet_number': index, 'dcid': '65816d76'},
+            'raw': {'length': length + 30, 'payload_length': length + 13},
+            'frames': [{'frame_type': 'stream', 'stream_id': 0, 'offset': offset, 'length': length}],
+        }}
+        if index % 2 == 1:
+            yield {'time': time, 'name': ack_event, 'data': {
+                'header': {'packet_type': '1RTT', 'packet_number': index // 2, 'dcid': '87612b00'},
+                'raw': {'length': 29},
+                'frames': [{'frame_type': 'ack', 'ack_delay': 0.5, 'acked_ranges': [[index - 1, index]]}],
+            }}
+        if index % 10 == 0:
+            yield {'time': time, 'name': 'recovery:metrics_updated', 'data': {
+                'min_rtt': rtt_ms,
+                'smoothed_rtt': rtt_ms * 1.05,
+                'latest_rtt': rtt_ms * float(rng.uniform(1, 1.2)),
+                'rtt_variance': rtt_ms * 0.05,
+                'congestion_window': 40064 + index * 100,
+                'bytes_in_flight': int(rng.integers(0, 40064 + index * 100)),
+                'packets_in_flight': int(rng.integers(0, 100)),
+            }}
+
+
+def write_qlog(file: str, duration_s: float = 40, rtt_ms: float = 72, packets_per_second: int = 2000,
+               vantage_point: str = 'client', seed: int = 0):
+    """NDJSON qlog, gzip compressed if file ends with .gz"""
+    with _open(file) as f:
+        for event in qlog_events(duration_s, rtt_ms, packets_per_second, vantage_point, seed):
+            f.write(json.dumps(event, separators=(',', ':')))
+            f.write('\n')
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+import argparse
+import logging
+import sys
+
+import avg_info
+import compare_congestion
+import compare_rtt_server
+import data_received
+import data_received_example
+import data_sent_example
+import rate
+import rate_start
+import rtt_degradation
+import rtt_degradation_qlog
+import total_data
+import xse_overhead_500ms
+import xse_overhead_ratio
+from qvis_qperf.pipeline import Pipeline, STATE_FILE
+from qvis_qperf.render import PROFILES, set_profile
+
+SCRIPTS = [
+    avg_info,
+    compare_congestion,
+    compare_rtt_server,
+    data_received,
+    data_received_example,
+    data_sent_example,
+    rate,
+    rate_start,
+    rtt_degradation,
+    rtt_degradation_qlog,
+    total_data,
+    xse_overhead_500ms,
+    xse_overhead_ratio,
+]
+"""modules with a targets() function"""
+
+
+def pipeline() -> Pipeline:
+    pipeline = Pipeline()
+    for script in SCRIPTS:
+        for target in script.targets():
+            pipeline.add(target)
+    return pipeline
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='build all plots and results whose inputs changed')
+    parser.add_argument('outputs', nargs='*', help='only build these files')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of processes, default: cpu count')
+    parser.add_argument('-f', '--force', action='store_true', help='rebuild up to date targets')
+    parser.add_argument('-l', '--list', action='store_true', help='list all targets and exit')
+    parser.add_argument('-p', '--profile', choices=list(PROFILES), default=None,
+                        help='render profile of the figures, default: publication')
+    args = parser.parse_args()
+    if args.profile is not None:
+        # before the targets are created, their figure paths depend on it
+        set_profile(args.profile)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    pipeline = pipeline()
+    if args.list:
+        for target in pipeline.targets:
+            print(target.output)
+        sys.exit(0)
+    if not pipeline.build(workers=args.workers, force=args.force, outputs=args.outputs or None):
+        sys.exit(1)
+    logging.info(f'build state stored in {STATE_FILE}')
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 import os
+from typing import List
 
 import matplotlib
 from matplotlib import pyplot as plt
@@ -7,6 +8,12 @@ from matplotlib import pyplot as plt
 from qvis.connection import Connection, read_qlog
 from qvis.plot import QvisByteAxisFormatter, QvisTimeAxisFormatter, plot_congestion_window, plot_bytes_in_flight
 
+from qvis_qperf.catalog import NO_PEP, CLIENT_SIDE_PEP, DISTRIBUTED_PEP, DISTRIBUTED_PEP_STATIC_CC, scenario_dir
+from qvis_qperf.pipeline import Target
+from qvis_qperf.plot import save_figure
+from qvis_qperf.render import rc_params
+from qvis_qperf.utilization import CONGESTION_TRACES, write_utilization_table
+
 
 def plot(rtt_ms: int, server_side_proxy_handover_ms: int, output_path: str, max_ms = 40000):
     conn: Connection = read_qlog(f'./data/{rtt_ms}ms/qlog/server.qlog.gz', max_ms=max_ms)
@@ -17,11 +24,11 @@ def plot(rtt_ms: int, server_side_proxy_handover_ms: int, output_path: str, max_
                                     shift_ms=server_side_proxy_handover_ms,
                                     max_ms=max_ms)
     # %% plot
-    plt.rcParams.update({
+    plt.rcParams.update(rc_params({
         "font.family": "serif",
         "text.usetex": True,
         "pgf.rcfonts": False,
-    })
+    }))
     fig, ax = plt.subplots()
     bdp = rtt_ms / 1000 * 100_000_000 / 8
     ax.axline((0, bdp), (1, bdp), color='gray', linestyle=(0, (1, 10)))
@@ -45,13 +52,31 @@ def plot(rtt_ms: int, server_side_proxy_handover_ms: int, output_path: str, max_
     ax.yaxis.set_major_formatter(QvisByteAxisFormatter)
     ax.xaxis.set_label_text('Time (s)')
     ax.yaxis.set_label_text('Data (bytes)')
-    fig.savefig(output_path, bbox_inches='tight', dpi=300)
+    output_path = save_figure(fig, output_path, bbox_inches='tight', dpi=300)
     print(f'saved plot as {output_path}')
     plt.plot()
 
 
-plot(72, 144, './plots/compare_congestion_72ms.pdf')
-plot(220, 440, './plots/compare_congestion_220ms.pdf')
-plot(500, 1000, './plots/compare_congestion_500ms.pdf')
-plot(1000, 2000, './plots/compare_congestion_1000ms.pdf')
-plot(2000, 4000, './plots/compare_congestion_2000ms.pdf')
+def plot_target(rtt_ms: int, handover_ms: int, output_path: str, **kwargs) -> Target:
+    inputs = [scenario_dir(rtt_ms, variant, 'qlog') for variant in
+              [NO_PEP, CLIENT_SIDE_PEP, DISTRIBUTED_PEP, DISTRIBUTED_PEP_STATIC_CC]]
+    return Target(output_path, plot, rtt_ms, handover_ms, output_path, inputs=inputs, **kwargs)
+
+
+def targets() -> List[Target]:
+    return [
+        plot_target(72, 144, './plots/compare_congestion_72ms.pdf'),
+        plot_target(220, 440, './plots/compare_congestion_220ms.pdf'),
+        plot_target(500, 1000, './plots/compare_congestion_500ms.pdf'),
+        plot_target(1000, 2000, './plots/compare_congestion_1000ms.pdf'),
+        plot_target(2000, 4000, './plots/compare_congestion_2000ms.pdf'),
+        # the pipeline runs targets in parallel already
+        Target('./results/congestion_utilization.txt', write_utilization_table, './results/congestion_utilization.txt',
+               workers=1, inputs=[scenario_dir(rtt_ms, variant, 'qlog') for rtt_ms in [72, 220, 500, 1000, 2000]
+                                  for variant in CONGESTION_TRACES]),
+    ]
+
+
+if __name__ == '__main__':
+    for t in targets():
+        t.run()
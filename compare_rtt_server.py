@@ -1,13 +1,21 @@
 #!/usr/bin/env python
 import math
 import os
+from typing import List
 
 import matplotlib
+import numpy as np
 from matplotlib import pyplot as plt
 
 from qvis.connection import Connection, read_qlog
 from qvis.plot import QvisTimeAxisFormatter, plot_rtt
 
+from qvis_qperf.catalog import NO_PEP, CLIENT_SIDE_PEP, DISTRIBUTED_PEP, DISTRIBUTED_PEP_STATIC_CC, scenario_dir
+from qvis_qperf.pipeline import Target
+from qvis_qperf.plot import save_figure
+from qvis_qperf.render import rc_params
+from qvis_qperf.rtt import RttStatistics
+
 
 def plot(rtt_ms: int, server_side_proxy_handover_ms: int, output_path: str, max_ms: int = 40000, xmin: float = 0,
          ymax=None, xaxis_steps: int = 2):
@@ -21,11 +29,11 @@ def plot(rtt_ms: int, server_side_proxy_handover_ms: int, output_path: str, max_
         shift_ms=server_side_proxy_handover_ms,
         max_ms=max_ms)
 
-    plt.rcParams.update({
+    plt.rcParams.update(rc_params({
         "font.family": "serif",
         "text.usetex": True,
         "pgf.rcfonts": False,
-    })
+    }))
     fig, ax = plt.subplots()
     plot_rtt(ax, conn, label='No PEP', color='#253c4b', rtt_ms_step_size=min(5, rtt_ms/100), linewidth=1.5)
     plot_rtt(ax, conn_1p, label='Client-side PEP', color='#00885c', rtt_ms_step_size=min(5, rtt_ms/100), linewidth=1.5)
@@ -44,13 +52,60 @@ def plot(rtt_ms: int, server_side_proxy_handover_ms: int, output_path: str, max_
     ax.xaxis.set_major_locator(matplotlib.ticker.MultipleLocator(xaxis_steps))
     ax.xaxis.set_label_text('Time (s)')
     ax.yaxis.set_label_text('RTT (ms)')
-    fig.savefig(output_path, bbox_inches='tight', dpi=600)
+    output_path = save_figure(fig, output_path, bbox_inches='tight', dpi=600)
     print(f'saved plot as {output_path}')
     plt.plot()
 
 
-plot(72, 144, './plots/compare_rtt_72ms_server.pdf')
-plot(220, 440, './plots/compare_rtt_220ms_server.pdf')
-plot(500, 1000, './plots/compare_rtt_500ms_server.pdf')
-plot(1000, 2000, './plots/compare_rtt_1000ms_server.pdf')
-plot(2000, 4000, './plots/compare_rtt_2000ms_server.pdf')
+def report(rtt_ms: int, server_side_proxy_handover_ms: int, output_file: str, window_ms: float = 1000):
+    """RTT quantiles and the largest median RTT inflation over the base RTT of a window"""
+    traces = [
+        ('No PEP', f'./data/{rtt_ms}ms/qlog/server.qlog.gz', 0),
+        ('Client-side PEP', f'./data/{rtt_ms}ms_client_side_proxy/qlog/server.qlog.gz', 0),
+        ('Distributed PEP', f'./data/{rtt_ms}ms_two_proxies_simple/qlog/server_side_proxy_client_facing.qlog.gz',
+         server_side_proxy_handover_ms),
+        ('Distributed PEP (static CC)', f'./data/{rtt_ms}ms_two_proxies/qlog/server_side_proxy_client_facing.qlog.gz',
+         server_side_proxy_handover_ms),
+    ]
+    with open(output_file, 'w') as f:
+        for label, file, shift_ms in traces:
+            statistics = RttStatistics(window_ms, relative_accuracy=0.001)
+            statistics.add_file(file, shift_ms=shift_ms)
+            for vantage_point in statistics.vantage_points:
+                summary = statistics.overall(vantage_point, 'latest_rtt').summary()
+                _, inflation = statistics.inflation(vantage_point, 'smoothed_rtt', 0.5)
+                f.write(f'{label}: {vantage_point}: base rtt: {statistics.base_rtt(vantage_point)} ms, ' +
+                        ', '.join(map(lambda item: f'{item[0]}: {item[1]} ms', summary.items())) +
+                        f', max inflation: {np.nanmax(inflation) if len(inflation) > 0 else math.nan}\n')
+
+
+def report_target(rtt_ms: int, handover_ms: int, output_file: str) -> Target:
+    inputs = [scenario_dir(rtt_ms, variant, 'qlog') for variant in
+              [NO_PEP, CLIENT_SIDE_PEP, DISTRIBUTED_PEP, DISTRIBUTED_PEP_STATIC_CC]]
+    return Target(output_file, report, rtt_ms, handover_ms, output_file, inputs=inputs)
+
+
+def plot_target(rtt_ms: int, handover_ms: int, output_path: str, **kwargs) -> Target:
+    inputs = [scenario_dir(rtt_ms, variant, 'qlog') for variant in
+              [NO_PEP, CLIENT_SIDE_PEP, DISTRIBUTED_PEP, DISTRIBUTED_PEP_STATIC_CC]]
+    return Target(output_path, plot, rtt_ms, handover_ms, output_path, inputs=inputs, **kwargs)
+
+
+def targets() -> List[Target]:
+    return [
+        plot_target(72, 144, './plots/compare_rtt_72ms_server.pdf'),
+        plot_target(220, 440, './plots/compare_rtt_220ms_server.pdf'),
+        plot_target(500, 1000, './plots/compare_rtt_500ms_server.pdf'),
+        plot_target(1000, 2000, './plots/compare_rtt_1000ms_server.pdf'),
+        plot_target(2000, 4000, './plots/compare_rtt_2000ms_server.pdf'),
+        report_target(72, 144, './results/rtt_72ms_server.txt'),
+        report_target(220, 440, './results/rtt_220ms_server.txt'),
+        report_target(500, 1000, './results/rtt_500ms_server.txt'),
+        report_target(1000, 2000, './results/rtt_1000ms_server.txt'),
+        report_target(2000, 4000, './results/rtt_2000ms_server.txt'),
+    ]
+
+
+if __name__ == '__main__':
+    for t in targets():
+        t.run()
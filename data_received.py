@@ -1,32 +1,36 @@
 #!/usr/bin/env python
-from typing import Optional
+from typing import List, Optional
 
 import matplotlib
 from matplotlib import pyplot as plt
 from qvis.plot import QvisTimeAxisFormatter, QvisByteAxisFormatter
 
 from qvis_qperf.aggregated_connection import AggregatedConnection
-from qvis_qperf.connection import load_all_connections, all_intersections
-from qvis_qperf.plot import plot_time_to_first_byte, plot_data_received, plot_data_received_intersection
+from qvis_qperf.catalog import Catalog, NO_PEP, CLIENT_SIDE_PEP, DISTRIBUTED_PEP, DISTRIBUTED_PEP_STATIC_CC, scenario_dir
+from qvis_qperf.connection import all_intersections
+from qvis_qperf.pipeline import Target
+from qvis_qperf.plot import plot_time_to_first_byte, plot_data_received, plot_data_received_intersection, save_figure
+from qvis_qperf.render import rc_params
+
+catalog = Catalog('./data')
 
 
 def plot(rtt_ms: int, output_path: str, start_time: float = 0, timespan: float = 40,
          xaxis_steps: Optional[float] = None, show_max_line:bool = True, ymax: Optional[float] = None):
     end_time = start_time + timespan
 
-    conn_no_pep = AggregatedConnection(load_all_connections(f'./data/{rtt_ms}ms/qperf', max_s=end_time + 0.1))
-    conn_client_side_pep = AggregatedConnection(
-        load_all_connections(f'./data/{rtt_ms}ms_client_side_proxy/qperf', max_s=end_time + 0.1))
-    conn_distributed_pep = AggregatedConnection(
-        load_all_connections(f'./data/{rtt_ms}ms_two_proxies_simple/qperf', max_s=end_time + 0.1))
+    max_s = end_time + 0.1
+    conn_no_pep = AggregatedConnection(catalog.connections(rtt_ms, NO_PEP, max_s=max_s))
+    conn_client_side_pep = AggregatedConnection(catalog.connections(rtt_ms, CLIENT_SIDE_PEP, max_s=max_s))
+    conn_distributed_pep = AggregatedConnection(catalog.connections(rtt_ms, DISTRIBUTED_PEP, max_s=max_s))
     conn_distributed_pep_static_cc = AggregatedConnection(
-        load_all_connections(f'./data/{rtt_ms}ms_two_proxies/qperf', max_s=end_time + 0.1))
+        catalog.connections(rtt_ms, DISTRIBUTED_PEP_STATIC_CC, max_s=max_s))
 
-    plt.rcParams.update({
+    plt.rcParams.update(rc_params({
         "font.family": "serif",
         "text.usetex": True,
         "pgf.rcfonts": False,
-    })
+    }))
     fig, ax = plt.subplots()
     if show_max_line:
         ax.axline((0, 0), (1, 100_000_000 / 8), color='gray', linestyle=(0, (1, 10)))
@@ -64,16 +68,16 @@ def plot(rtt_ms: int, output_path: str, start_time: float = 0, timespan: float =
         ax.xaxis.set_major_locator(matplotlib.ticker.MultipleLocator(xaxis_steps))
     ax.yaxis.set_major_formatter(QvisByteAxisFormatter)
     fig.set_size_inches(8, 6)
-    fig.savefig(output_path, bbox_inches='tight', dpi=300)
+    output_path = save_figure(fig, output_path, bbox_inches='tight', dpi=300)
     print(f'saved plot as {output_path}')
     plt.plot()
 
 
 def report_intercept(rtt_ms: int, output_path: str):
-    conn_no_pep = AggregatedConnection(load_all_connections(f'./data/{rtt_ms}ms/qperf'))
-    conn_client_side_pep = AggregatedConnection(load_all_connections(f'./data/{rtt_ms}ms_client_side_proxy/qperf'))
-    conn_distributed_pep = AggregatedConnection(load_all_connections(f'./data/{rtt_ms}ms_two_proxies_simple/qperf'))
-    conn_distributed_pep_static_cc = AggregatedConnection(load_all_connections(f'./data/{rtt_ms}ms_two_proxies/qperf'))
+    conn_no_pep = AggregatedConnection(catalog.connections(rtt_ms, NO_PEP))
+    conn_client_side_pep = AggregatedConnection(catalog.connections(rtt_ms, CLIENT_SIDE_PEP))
+    conn_distributed_pep = AggregatedConnection(catalog.connections(rtt_ms, DISTRIBUTED_PEP))
+    conn_distributed_pep_static_cc = AggregatedConnection(catalog.connections(rtt_ms, DISTRIBUTED_PEP_STATIC_CC))
 
     with open(output_path, 'w') as f:
         connections = list(map(lambda c: c.to_avg_connection(), [conn_no_pep, conn_client_side_pep, conn_distributed_pep, conn_distributed_pep_static_cc]))
@@ -84,20 +88,41 @@ def report_intercept(rtt_ms: int, output_path: str):
             f.write(f'{upper_name} overtakes {lower_name} at {interception.time}s {interception.bytes_received}B\n')
 
 
-plot(72, './plots/data_received_72ms.pdf', xaxis_steps=2)
-plot(220, './plots/data_received_220ms.pdf', xaxis_steps=2)
-plot(500, './plots/data_received_500ms.pdf', xaxis_steps=2)
-plot(1000, './plots/data_received_1000ms.pdf', xaxis_steps=2)
-plot(2000, './plots/data_received_2000ms.pdf', xaxis_steps=2)
+def inputs(rtt_ms: int) -> List[str]:
+    return [scenario_dir(rtt_ms, variant) for variant in
+            [NO_PEP, CLIENT_SIDE_PEP, DISTRIBUTED_PEP, DISTRIBUTED_PEP_STATIC_CC]]
+
+
+def plot_target(rtt_ms: int, output_path: str, **kwargs) -> Target:
+    return Target(output_path, plot, rtt_ms, output_path, inputs=inputs(rtt_ms), **kwargs)
+
+
+def report_intercept_target(rtt_ms: int, output_path: str) -> Target:
+    return Target(output_path, report_intercept, rtt_ms, output_path, inputs=inputs(rtt_ms))
+
+
+def targets() -> List[Target]:
+    return [
+        plot_target(72, './plots/data_received_72ms.pdf', xaxis_steps=2),
+        plot_target(220, './plots/data_received_220ms.pdf', xaxis_steps=2),
+        plot_target(500, './plots/data_received_500ms.pdf', xaxis_steps=2),
+        plot_target(1000, './plots/data_received_1000ms.pdf', xaxis_steps=2),
+        plot_target(2000, './plots/data_received_2000ms.pdf', xaxis_steps=2),
+
+        plot_target(72, './plots/data_received_72ms_zoom.pdf', timespan=1.5, xaxis_steps=0.1),
+        plot_target(220, './plots/data_received_220ms_zoom.pdf', start_time=0.6, timespan=2, xaxis_steps=0.2),
+        plot_target(500, './plots/data_received_500ms_zoom.pdf', start_time=1.4, timespan=2, xaxis_steps=0.2),
+        plot_target(1000, './plots/data_received_1000ms_zoom.pdf', start_time=3, timespan=3.4, xaxis_steps=0.2),
+        plot_target(2000, './plots/data_received_2000ms_zoom.pdf', start_time=6, timespan=5, xaxis_steps=0.5, ymax=2_000_000),
+
+        report_intercept_target(72, './results/data_received_intercept_72ms.txt'),
+        report_intercept_target(220, './results/data_received_intercept_220ms.txt'),
+        report_intercept_target(500, './results/data_received_intercept_500ms.txt'),
+        report_intercept_target(1000, './results/data_received_intercept_1000ms.txt'),
+        report_intercept_target(2000, './results/data_received_intercept_2000ms.txt'),
+    ]
 
-plot(72, './plots/data_received_72ms_zoom.pdf', timespan=1.5, xaxis_steps=0.1)
-plot(220, './plots/data_received_220ms_zoom.pdf', start_time=0.6, timespan=2, xaxis_steps=0.2)
-plot(500, './plots/data_received_500ms_zoom.pdf', start_time=1.4, timespan=2, xaxis_steps=0.2)
-plot(1000, './plots/data_received_1000ms_zoom.pdf', start_time=3, timespan=3.4, xaxis_steps=0.2)
-plot(2000, './plots/data_received_2000ms_zoom.pdf', start_time=6, timespan=5, xaxis_steps=0.5, ymax=2_000_000)
 
-report_intercept(72, './results/data_received_intercept_72ms.txt')
-report_intercept(220, './results/data_received_intercept_220ms.txt')
-report_intercept(500, './results/data_received_intercept_500ms.txt')
-report_intercept(1000, './results/data_received_intercept_1000ms.txt')
-report_intercept(2000, './results/data_received_intercept_2000ms.txt')
+if __name__ == '__main__':
+    for t in targets():
+        t.run()
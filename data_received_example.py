@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 import os
+from typing import List
 
 import matplotlib
 from matplotlib import pyplot as plt
@@ -8,6 +9,11 @@ from qvis.connection import Connection, read_qlog
 from qvis.plot import QvisByteAxisFormatter, QvisTimeAxisFormatter, plot_stream_data_received, \
     plot_local_stream_flow_limit, plot_time_to_first_byte
 
+from qvis_qperf.catalog import NO_PEP, CLIENT_SIDE_PEP, DISTRIBUTED_PEP, DISTRIBUTED_PEP_STATIC_CC, scenario_dir
+from qvis_qperf.pipeline import Target
+from qvis_qperf.plot import save_figure
+from qvis_qperf.render import rc_params
+
 
 def plot(rtt_ms: int, client_side_proxy_handover_ms: int, output_path: str, max_ms: int = 40000, xmin: float = 0, ymax = None, xaxis_steps: int = 2):
     conn: Connection = read_qlog(f'./data/{rtt_ms}ms/qlog/client.qlog.gz', max_ms=max_ms)
@@ -20,11 +26,11 @@ def plot(rtt_ms: int, client_side_proxy_handover_ms: int, output_path: str, max_
         max_ms=max_ms, shift_ms=client_side_proxy_handover_ms)
 
     # %% plot
-    plt.rcParams.update({
+    plt.rcParams.update(rc_params({
         "font.family": "serif",
         "text.usetex": True,
         "pgf.rcfonts": False,
-    })
+    }))
     fig, ax = plt.subplots()
     ax.axline((0, 0), (1, 100_000_000 / 8), color='gray', linestyle=(0, (1, 10)))
 
@@ -58,15 +64,29 @@ def plot(rtt_ms: int, client_side_proxy_handover_ms: int, output_path: str, max_
     ax.yaxis.set_major_formatter(QvisByteAxisFormatter)
     ax.xaxis.set_label_text('Time (s)')
     ax.yaxis.set_label_text('Data (bytes)')
-    fig.savefig(output_path, bbox_inches='tight', dpi=600)
+    output_path = save_figure(fig, output_path, bbox_inches='tight', dpi=600)
     print(f'saved plot as {output_path}')
     plt.plot()
 
 
-plot(72, 216, './plots/data_received_example_72ms.pdf')
-plot(220, 660, './plots/data_received_example_220ms.pdf')
-plot(500, 1500, './plots/data_received_example_500ms.pdf')
-plot(500, 1500, './plots/data_received_example_500ms_zoom.pdf', max_ms=4000, xmin=1, ymax=600000, xaxis_steps=1)
-plot(1000, 3000, './plots/data_received_example_1000ms.pdf')
-plot(1000, 3000, './plots/data_received_example_1000ms_zoom.pdf', max_ms=8000, xmin=2, ymax=600000, xaxis_steps=1)
-plot(2000, 6000, './plots/data_received_example_2000ms.pdf')
+def plot_target(rtt_ms: int, handover_ms: int, output_path: str, **kwargs) -> Target:
+    inputs = [scenario_dir(rtt_ms, variant, 'qlog') for variant in
+              [NO_PEP, CLIENT_SIDE_PEP, DISTRIBUTED_PEP, DISTRIBUTED_PEP_STATIC_CC]]
+    return Target(output_path, plot, rtt_ms, handover_ms, output_path, inputs=inputs, **kwargs)
+
+
+def targets() -> List[Target]:
+    return [
+        plot_target(72, 216, './plots/data_received_example_72ms.pdf'),
+        plot_target(220, 660, './plots/data_received_example_220ms.pdf'),
+        plot_target(500, 1500, './plots/data_received_example_500ms.pdf'),
+        plot_target(500, 1500, './plots/data_received_example_500ms_zoom.pdf', max_ms=4000, xmin=1, ymax=600000, xaxis_steps=1),
+        plot_target(1000, 3000, './plots/data_received_example_1000ms.pdf'),
+        plot_target(1000, 3000, './plots/data_received_example_1000ms_zoom.pdf', max_ms=8000, xmin=2, ymax=600000, xaxis_steps=1),
+        plot_target(2000, 6000, './plots/data_received_example_2000ms.pdf'),
+    ]
+
+
+if __name__ == '__main__':
+    for t in targets():
+        t.run()
@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+from typing import List
 
 import matplotlib
 from matplotlib import pyplot as plt
@@ -7,6 +8,11 @@ from qvis.connection import Connection, read_qlog
 from qvis.plot import QvisByteAxisFormatter, QvisTimeAxisFormatter, plot_available_congestion_window_of_stream, \
     plot_remote_stream_flow_limit, plot_stream_data_sent
 
+from qvis_qperf.catalog import NO_PEP, CLIENT_SIDE_PEP, DISTRIBUTED_PEP, DISTRIBUTED_PEP_STATIC_CC, scenario_dir
+from qvis_qperf.pipeline import Target
+from qvis_qperf.plot import save_figure
+from qvis_qperf.render import rc_params
+
 
 def plot(rtt_ms: int, server_side_proxy_handover_ms: int, output_path: str, max_ms: int = 40000, ymax=None,
          xaxis_steps: float = 2, plot_width: float = 8, plot_height: float = 6, legend_anchor_x: float = 0.5, legend_anchor_y: float = -0.1):
@@ -20,11 +26,11 @@ def plot(rtt_ms: int, server_side_proxy_handover_ms: int, output_path: str, max_
         shift_ms=server_side_proxy_handover_ms,
         max_ms=max_ms)
 
-    plt.rcParams.update({
+    plt.rcParams.update(rc_params({
         "font.family": "serif",
         "text.usetex": True,
         "pgf.rcfonts": False,
-    })
+    }))
     fig, ax = plt.subplots()
     ax.axline((0, 0), (1, 100_000_000 / 8), color='gray', linestyle=(0, (1, 10)))
 
@@ -60,19 +66,33 @@ def plot(rtt_ms: int, server_side_proxy_handover_ms: int, output_path: str, max_
     ax.yaxis.set_major_formatter(QvisByteAxisFormatter)
     ax.xaxis.set_label_text('Time (s)')
     ax.yaxis.set_label_text('Data (bytes)')
-    fig.savefig(output_path, bbox_inches='tight', dpi=600)
+    output_path = save_figure(fig, output_path, bbox_inches='tight', dpi=600)
     print(f'saved plot as {output_path}')
     plt.plot()
 
 
-plot(72, 144, './plots/data_sent_example_72ms.pdf')
-plot(220, 440, './plots/data_sent_example_220ms.pdf')
-plot(500, 1000, './plots/data_sent_example_500ms.pdf')
-plot(1000, 2000, './plots/data_sent_example_1000ms.pdf')
-plot(2000, 4000, './plots/data_sent_example_2000ms.pdf')
+def plot_target(rtt_ms: int, handover_ms: int, output_path: str, **kwargs) -> Target:
+    inputs = [scenario_dir(rtt_ms, variant, 'qlog') for variant in
+              [NO_PEP, CLIENT_SIDE_PEP, DISTRIBUTED_PEP, DISTRIBUTED_PEP_STATIC_CC]]
+    return Target(output_path, plot, rtt_ms, handover_ms, output_path, inputs=inputs, **kwargs)
+
+
+def targets() -> List[Target]:
+    return [
+        plot_target(72, 144, './plots/data_sent_example_72ms.pdf'),
+        plot_target(220, 440, './plots/data_sent_example_220ms.pdf'),
+        plot_target(500, 1000, './plots/data_sent_example_500ms.pdf'),
+        plot_target(1000, 2000, './plots/data_sent_example_1000ms.pdf'),
+        plot_target(2000, 4000, './plots/data_sent_example_2000ms.pdf'),
+
+        plot_target(72, 144, './plots/data_sent_example_72ms_zoom.pdf', max_ms=500, ymax=1000000, xaxis_steps=0.1, plot_width=6, plot_height=4, legend_anchor_x=0.45, legend_anchor_y=-0.13),
+        plot_target(220, 440, './plots/data_sent_example_220ms_zoom.pdf', max_ms=1500, ymax=1000000, xaxis_steps=0.2, plot_width=6, plot_height=4, legend_anchor_x=0.45, legend_anchor_y=-0.13),
+        plot_target(500, 1000, './plots/data_sent_example_500ms_zoom.pdf', max_ms=3500, ymax=1000000, xaxis_steps=0.5, plot_width=6, plot_height=4, legend_anchor_x=0.45, legend_anchor_y=-0.13),
+        plot_target(1000, 2000, './plots/data_sent_example_1000ms_zoom.pdf', max_ms=7000, ymax=1000000, xaxis_steps=1, plot_width=6, plot_height=4, legend_anchor_x=0.45, legend_anchor_y=-0.13),
+        plot_target(2000, 4000, './plots/data_sent_example_2000ms_zoom.pdf', max_ms=14000, ymax=1000000, xaxis_steps=1, plot_width=6, plot_height=4, legend_anchor_x=0.45, legend_anchor_y=-0.13),
+    ]
+
 
-plot(72, 144, './plots/data_sent_example_72ms_zoom.pdf', max_ms=500, ymax=1000000, xaxis_steps=0.1, plot_width=6, plot_height=4, legend_anchor_x=0.45, legend_anchor_y=-0.13)
-plot(220, 440, './plots/data_sent_example_220ms_zoom.pdf', max_ms=1500, ymax=1000000, xaxis_steps=0.2, plot_width=6, plot_height=4, legend_anchor_x=0.45, legend_anchor_y=-0.13)
-plot(500, 1000, './plots/data_sent_example_500ms_zoom.pdf', max_ms=3500, ymax=1000000, xaxis_steps=0.5, plot_width=6, plot_height=4, legend_anchor_x=0.45, legend_anchor_y=-0.13)
-plot(1000, 2000, './plots/data_sent_example_1000ms_zoom.pdf', max_ms=7000, ymax=1000000, xaxis_steps=1, plot_width=6, plot_height=4, legend_anchor_x=0.45, legend_anchor_y=-0.13)
-plot(2000, 4000, './plots/data_sent_example_2000ms_zoom.pdf', max_ms=14000, ymax=1000000, xaxis_steps=1, plot_width=6, plot_height=4, legend_anchor_x=0.45, legend_anchor_y=-0.13)
+if __name__ == '__main__':
+    for t in targets():
+        t.run()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+import argparse
+import sys
+import time
+
+from matplotlib import pyplot as plt
+from qvis.plot import QvisByteAxisFormatter
+
+from qvis_qperf.stream import ConnectionStream, OnlineAggregatedConnection, follow, replay
+from qvis_qperf.plot import plot_time_to_first_byte, plot_rate, save_figure
+
+
+def plot(aggregate: OnlineAggregatedConnection, output_path: str, timespan: float = 40):
+    fig, ax = plt.subplots()
+    ax.axline((0, 100_000_000), (1, 100_000_000), color='gray', linestyle=(0, (1, 10)))
+    mean = aggregate.mean('download_rates')
+    std = aggregate.std('download_rates')
+    ax.fill_between(aggregate.mean('times'), mean - std, mean + std, color='blue', alpha=0.2, linewidth=0,
+                    label='Standard deviation')
+    plot_rate(ax, aggregate, label=f'Average rate of {aggregate.num_runs} runs', color='blue')
+    plot_time_to_first_byte(ax, aggregate, color='blue')
+    ax.xaxis.set_label_text('Time (s)')
+    ax.yaxis.set_label_text('Rate (bit/s)')
+    ax.set_axisbelow(True)
+    ax.grid(True)
+    ax.set_ylim(ymin=0, ymax=120000000)
+    ax.set_xlim(xmin=0, xmax=timespan)
+    ax.legend(fancybox=False, shadow=False, loc='lower center', bbox_to_anchor=(0.47, -0.35), ncol=3, frameon=False)
+    ax.yaxis.set_major_formatter(QvisByteAxisFormatter)
+    fig.set_size_inches(8, 4)
+    save_figure(fig, output_path, bbox_inches='tight', dpi=150)
+    plt.close(fig)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='aggregate qperf client output while it is written and re-render the average rate')
+    parser.add_argument('input', nargs='?', default='-', help='file to follow, - for stdin')
+    parser.add_argument('-o', '--output', default='./plots/live_rate.png')
+    parser.add_argument('-i', '--interval', type=float, default=5, help='seconds between renders')
+    parser.add_argument('--idle-timeout', type=float, default=None,
+                        help='stop following a file after this many seconds without new output')
+    parser.add_argument('--replay', nargs='+', metavar='LOG',
+                        help='instead, write these logs to stdout at the pace they were recorded')
+    parser.add_argument('--speed', type=float, default=1, help='replay speed factor')
+    args = parser.parse_args()
+
+    if args.replay:
+        replay(args.replay, sys.stdout, speed=args.speed)
+        sys.exit(0)
+
+    stream = ConnectionStream(on_run_complete=lambda c: print(f'run {stream.aggregate.num_runs} complete',
+                                                              file=sys.stderr))
+    last_render = time.monotonic()
+    try:
+        for line in follow(args.input, idle_timeout=args.idle_timeout):
+            stream.feed_line(line)
+            if time.monotonic() - last_render >= args.interval and stream.aggregate.num_runs > 0:
+                plot(stream.aggregate, args.output)
+                last_render = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    stream.finish_run()
+    if stream.aggregate.num_runs > 0:
+        plot(stream.aggregate, args.output)
+        print(f'saved plot as {args.output}')
@@ -1,18 +1,79 @@
 from __future__ import annotations
 import logging
 import statistics
-from typing import List, Iterator
+from typing import Dict, List, Iterator, Optional
+
+import numpy as np
 
 from qvis_qperf.aggregated_report import AggregatedReport
+from qvis_qperf.changepoint import start_times, steady_state_rates, steady_state_starts
 from qvis_qperf.connection import Connection
 from qvis_qperf.interception import BytesReceivedInterception
+from qvis_qperf.profiling import span
+from qvis_qperf.resample import DEFAULT_RESOLUTION, resample
+
+COLUMNS = ['times', 'download_rates', 'bytes_received', 'packets_received', 'cumulative_bytes_received']
+"""Connection columns that can be stacked"""
 
 
 class AggregatedConnection:
     connections: List[Connection]
+    _matrices: Dict[str, np.ndarray]
 
     def __init__(self, connections: List[Connection]):
         self.connections = connections
+        self._matrices = {}
+
+    @property
+    def num_samples(self) -> int:
+        """number of report indices, defined by the first connection"""
+        return len(self.connections[0].times)
+
+    @property
+    def mask(self) -> np.ndarray:
+        """runs x samples, True where the run has a report at that index"""
+        if 'mask' not in self._matrices:
+            lengths = np.fromiter(map(lambda c: len(c.times), self.connections), dtype=np.intp,
+                                  count=len(self.connections))
+            num_short = np.count_nonzero(lengths < self.num_samples)
+            if num_short > 0:
+                logging.warning(
+                    f'{num_short} of {len(self.connections)} runs have fewer than {self.num_samples} reports')
+            self._matrices['mask'] = np.arange(self.num_samples)[np.newaxis, :] < lengths[:, np.newaxis]
+        return self._matrices['mask']
+
+    def matrix(self, column: str) -> np.ndarray:
+        """column of all connections stacked to runs x samples,
+        missing reports are NaN"""
+        if column not in COLUMNS:
+            raise ValueError(f'unknown column {column}')
+        if column not in self._matrices:
+            with span('aggregate_matrix', column=column) as s:
+                matrix = np.full((len(self.connections), self.num_samples), np.nan)
+                for row, connection in zip(matrix, self.connections):
+                    values = getattr(connection, column)[:self.num_samples]
+                    row[:len(values)] = values
+                self._matrices[column] = matrix
+                s.count(runs=len(self.connections), reports=matrix.size)
+        return self._matrices[column]
+
+    @property
+    def counts(self) -> np.ndarray:
+        """number of runs with a report at each index"""
+        return np.count_nonzero(self.mask, axis=0)
+
+    def sum(self, column: str) -> np.ndarray:
+        """per index sum over all runs"""
+        return np.nansum(self.matrix(column), axis=0)
+
+    def mean(self, column: str) -> np.ndarray:
+        """per index mean over all runs"""
+        return self.sum(column) / self.counts
+
+    def percentile(self, q, column: str = 'download_rates') -> np.ndarray:
+        """per index percentile over all runs,
+        q in 0..100, an array of q gives one row per q"""
+        return np.nanpercentile(self.matrix(column), q, axis=0)
 
     @property
     def time_to_first_byte(self) -> float:
@@ -29,6 +90,16 @@ class AggregatedConnection:
         """in bytes"""
         return statistics.mean(map(lambda c: c.total_received_bytes_at(time), self.connections))
 
+    def total_bytes_at_times(self, times) -> np.ndarray:
+        """per run total received bytes at each time, runs x times\n
+        times: array in seconds"""
+        return np.stack(list(map(lambda c: c.total_received_bytes_at_times(times), self.connections)))
+
+    def times_to_received_bytes(self, bytes) -> np.ndarray:
+        """per run time in seconds until each byte threshold is received, runs x thresholds,
+        NaN where a run never receives that many bytes"""
+        return np.stack(list(map(lambda c: c.times_to_received_bytes(bytes), self.connections)))
+
     def mean_rate(self, exclude_zero_report: bool = True, start_time: float = 0) -> float:
         """in bit per second"""
         return statistics.mean(
@@ -59,24 +130,77 @@ class AggregatedConnection:
             map(lambda c: c.mean_rate_after_ramp_up,
                 self.connections))
 
+    @property
+    def _times_to_first_byte(self) -> np.ndarray:
+        """per run, in seconds"""
+        return np.fromiter(map(lambda c: c.time_to_first_byte, self.connections), dtype=np.float64,
+                           count=len(self.connections))
+
+    @property
+    def steady_state_starts(self) -> np.ndarray:
+        """per run index of the first steady state report, -1 for too short runs,
+        all runs at once, see qvis_qperf.changepoint"""
+        if 'steady_state_starts' not in self._matrices:
+            self._matrices['steady_state_starts'] = steady_state_starts(
+                self.matrix('times'), self.matrix('download_rates'),
+                earliest=self._times_to_first_byte)
+        return self._matrices['steady_state_starts']
+
+    @property
+    def ramp_up_times_from_start(self) -> np.ndarray:
+        """per run end of the ramp up, NaN for too short runs
+        in seconds"""
+        return start_times(self.matrix('times'), self.steady_state_starts)
+
+    @property
+    def ramp_up_times_from_ttfb(self) -> np.ndarray:
+        """per run end of the ramp up after the time to first byte, NaN for too short runs
+        in seconds"""
+        return self.ramp_up_times_from_start - self._times_to_first_byte
+
+    @property
+    def steady_state_rates(self) -> np.ndarray:
+        """per run mean rate after the ramp up, NaN for too short runs
+        in bit per second"""
+        return steady_state_rates(self.matrix('download_rates'), self.steady_state_starts)
+
     @property
     def reports(self) -> Iterator[AggregatedReport]:
-        num_reports = len(self.connections[0].reports)
-        for index in range(num_reports):
-            reports = []
-            for connection in self.connections:
-                try:
-                    reports.append(connection.reports[index])
-                except:
-                    logging.warning(f'no report at index {index}')
-            yield AggregatedReport(reports)
+        """compatibility view, prefer matrix and the reductions"""
+        mask = self.mask
+        for index in range(self.num_samples):
+            yield AggregatedReport(
+                [connection.reports[index] for connection, present in zip(self.connections, mask[:, index]) if
+                 present])
+
+    def _floor_mean(self, column: str) -> np.ndarray:
+        """integer part of the mean of an integer column, like int(AggregatedReport.avg_...)"""
+        return self.sum(column).astype(np.int64) // self.counts
 
     def to_avg_connection(self) -> Connection:
-        connection = Connection.__new__(Connection)
-        connection.establishment_time = self.establishment_time
-        connection.time_to_first_byte = self.time_to_first_byte
-        connection.reports = list(map(lambda r: r.to_avg_report(), self.reports))
-        return connection
+        """connection of the per index mean of all runs"""
+        with span('to_avg_connection') as s:
+            s.count(runs=len(self.connections))
+            return Connection.from_arrays(
+                self.mean('times'),
+                self.mean('download_rates'),
+                self._floor_mean('bytes_received'),
+                self._floor_mean('packets_received'),
+                establishment_time=self.establishment_time,
+                time_to_first_byte=self.time_to_first_byte,
+            )
+
+    def to_sum_connection(self) -> Connection:
+        """connection of the per index sum of bytes and packets of all runs,
+        with the latest time and the mean rate of each index"""
+        return Connection.from_arrays(
+            np.nanmax(self.matrix('times'), axis=0),
+            self.mean('download_rates'),
+            self.sum('bytes_received').astype(np.int64),
+            self.sum('packets_received').astype(np.int64),
+            establishment_time=self.establishment_time,
+            time_to_first_byte=self.time_to_first_byte,
+        )
 
     def interceptions(self, other: Connection | AggregatedConnection) -> Iterator[BytesReceivedInterception]:
         if isinstance(other, AggregatedConnection):
@@ -86,5 +210,11 @@ class AggregatedConnection:
         else:
             raise "unsupported type"
 
+    def resample(self, resolution: float = DEFAULT_RESOLUTION, start: float = 0,
+                 end: Optional[float] = None) -> AggregatedConnection:
+        """align all runs on a shared time grid instead of the report index,
+        see qvis_qperf.resample"""
+        return AggregatedConnection(resample(self.connections, resolution=resolution, start=start, end=end))
+
     def reduce_steps(self, n:int) -> AggregatedConnection:
         return AggregatedConnection(list(map(lambda c: c.reduce_steps(n), self.connections)))
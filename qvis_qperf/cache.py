@@ -0,0 +1,127 @@
+import logging
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+from qvis_qperf.parser import QperfHeader
+
+CACHE_DIR_NAME = '.qperf_cache'
+"""name of the cache directory created next to the parsed log files"""
+
+CACHE_VERSION = 3
+"""increase when the parser or the cached columns change"""
+
+COLUMNS = ['times', 'download_rates', 'bytes_received', 'packets_received']
+
+HEADER_FIELDS = {
+    'bandwidth': float,
+    'rtt': float,
+    'bdp': int,
+    'max_in_flight_packets': int,
+    'server_cc': str,
+    'server_iw': int,
+}
+"""QperfHeader attributes and their types"""
+
+
+class CacheStats:
+    hits: int
+    misses: int
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self) -> str:
+        return f'{self.hits} cache hits, {self.misses} cache misses'
+
+
+cache_stats = CacheStats()
+"""hit and miss counts of all cache lookups in this process"""
+
+
+def cache_path(file: str, add_zero_report: bool, max_s: float) -> str:
+    dir, name = os.path.split(os.path.abspath(file))
+    return os.path.join(dir, CACHE_DIR_NAME, f'{name}-{max_s!r}-{int(add_zero_report)}.npz')
+
+
+def _file_key(file: str) -> Dict[str, object]:
+    stat = os.stat(file)
+    return {
+        'version': CACHE_VERSION,
+        'path': os.path.abspath(file),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+
+
+def load_cached_columns(file: str, add_zero_report: bool, max_s: float) -> Optional[Dict[str, object]]:
+    """returns the cached parse result of file,
+    or None if there is no valid cache entry"""
+    path = cache_path(file, add_zero_report, max_s)
+    try:
+        with np.load(path, allow_pickle=False) as entry:
+            for key, value in _file_key(file).items():
+                if entry[key].item() != value:
+                    cache_stats.misses += 1
+                    return None
+            columns = {column: entry[column] for column in COLUMNS}
+            columns['establishment_time'] = \
+                entry['establishment_time'].item() if entry['has_establishment_time'].item() else None
+            columns['time_to_first_byte'] = \
+                entry['time_to_first_byte'].item() if entry['has_time_to_first_byte'].item() else None
+            columns['internal_error'] = entry['internal_error'].item() if entry['has_internal_error'].item() else None
+            columns['header'] = _load_header(entry) if entry['has_header'].item() else None
+    except (OSError, KeyError, ValueError):
+        cache_stats.misses += 1
+        return None
+    cache_stats.hits += 1
+    return columns
+
+
+def store_cached_columns(file: str, add_zero_report: bool, max_s: float, columns: Dict[str, object]):
+    """columns: report columns and connection attributes as passed to Connection.from_arrays,
+    None for times the log does not contain"""
+    path = cache_path(file, add_zero_report, max_s)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                **_file_key(file),
+                **{column: columns[column] for column in COLUMNS},
+                has_establishment_time=columns['establishment_time'] is not None,
+                establishment_time=columns['establishment_time'] or 0.0,
+                has_time_to_first_byte=columns['time_to_first_byte'] is not None,
+                time_to_first_byte=columns['time_to_first_byte'] or 0.0,
+                has_internal_error=columns['internal_error'] is not None,
+                internal_error=columns['internal_error'] or '',
+                has_header=columns['header'] is not None,
+                **_header_entries(columns['header']),
+            )
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f'failed to write cache {path}: {e}')
+
+
+def _header_entries(header: Optional[QperfHeader]) -> Dict[str, object]:
+    """missing header values are stored as empty arrays"""
+    entries = {}
+    for field, type in HEADER_FIELDS.items():
+        value = getattr(header, field, None)
+        entries[f'header_{field}'] = np.array([] if value is None else [value], dtype=type)
+    return entries
+
+
+def _load_header(entry) -> QperfHeader:
+    header = QperfHeader()
+    for field, type in HEADER_FIELDS.items():
+        value = entry[f'header_{field}']
+        setattr(header, field, type(value[0]) if len(value) > 0 else None)
+    return header
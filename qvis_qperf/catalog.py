@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import List, Optional, Tuple, TYPE_CHECKING
+
+from qvis_qperf.connection import Connection, load_all_connections
+
+if TYPE_CHECKING:
+    from qvis_qperf.store import RunStore
+
+SCENARIO_DIR_REGEX = r'^(?P<rtt>\d+)ms(_(?P<variant>.+))?$'
+"""e.g. 72ms, 500ms_client_side_proxy, 1000ms_two_proxies_simple_xse"""
+
+ARTIFACTS = ['qperf', 'qlog']
+
+NO_PEP = ''
+CLIENT_SIDE_PEP = 'client_side_proxy'
+DISTRIBUTED_PEP = 'two_proxies_simple'
+DISTRIBUTED_PEP_STATIC_CC = 'two_proxies'
+DISTRIBUTED_PEP_XSE = 'two_proxies_simple_xse'
+
+
+def scenario_dir(rtt_ms: int, variant: str = NO_PEP, artifact: str = 'qperf', root: str = './data') -> str:
+    """path of a scenario directory, the inverse of SCENARIO_DIR_REGEX"""
+    name = f'{rtt_ms}ms_{variant}' if variant else f'{rtt_ms}ms'
+    return os.path.join(root, name, artifact)
+
+
+class Scenario:
+    rtt_ms: int
+    variant: str
+    """directory name suffix after the rtt, empty for no PEP"""
+    artifact: str
+    """qperf or qlog"""
+    path: str
+
+    def __init__(self, rtt_ms: int, variant: str, artifact: str, path: str):
+        self.rtt_ms = rtt_ms
+        self.variant = variant
+        self.artifact = artifact
+        self.path = path
+
+    @property
+    def files(self) -> List[str]:
+        """paths of all files of this scenario, sorted by name"""
+        return [os.path.join(self.path, file) for file in sorted(os.listdir(self.path))
+                if os.path.isfile(os.path.join(self.path, file))]
+
+    def __repr__(self) -> str:
+        return f'Scenario({self.rtt_ms}ms, {self.variant!r}, {self.artifact})'
+
+
+class Catalog:
+    """scenarios of a data directory, qperf runs are loaded on first access
+    and kept in a LRU cache of at most cache_size scenarios"""
+    root: str
+    scenarios: List[Scenario]
+    cache_size: int
+    workers: Optional[int]
+    """passed to load_all_connections"""
+    store: Optional[RunStore]
+    """runs of this store are memory mapped instead of loaded, see qvis_qperf.store,
+    None if it was exported from another root or the qperf logs changed since"""
+    _cache: OrderedDict[Tuple[str, bool], List[Connection]]
+
+    def __init__(self, root: str = './data', cache_size: int = 32, workers: Optional[int] = 1,
+                 store: Optional[RunStore] = None):
+        self.root = root
+        self.cache_size = cache_size
+        self.workers = workers
+        self.store = store
+        self._cache = OrderedDict()
+        self.scenarios = []
+        for entry in sorted(os.scandir(root), key=lambda e: e.name):
+            match = re.match(SCENARIO_DIR_REGEX, entry.name)
+            if not entry.is_dir() or not match:
+                continue
+            for artifact in ARTIFACTS:
+                path = os.path.join(entry.path, artifact)
+                if os.path.isdir(path):
+                    self.scenarios.append(Scenario(int(match.group('rtt')), match.group('variant') or NO_PEP,
+                                                   artifact, path))
+        if store is not None and not self._is_valid_store(store):
+            self.store = None
+
+    def _is_valid_store(self, store: RunStore) -> bool:
+        """whether store holds the current qperf runs of root"""
+        from qvis_qperf.store import files_fingerprint
+
+        if os.path.abspath(store.root) != os.path.abspath(self.root):
+            logging.warning(f'ignored store {store.path} of {store.root}, not of {self.root}')
+            return False
+        if files_fingerprint(self) != store.fingerprint:
+            logging.warning(f'ignored outdated store {store.path}, qperf logs of {self.root} changed since the export')
+            return False
+        return True
+
+    def select(self, rtt: Optional[int] = None, variant: Optional[str] = None,
+               artifact: Optional[str] = 'qperf') -> List[Scenario]:
+        """scenarios matching all given arguments, None matches any"""
+        return [s for s in self.scenarios if
+                (rtt is None or s.rtt_ms == rtt) and
+                (variant is None or s.variant == variant) and
+                (artifact is None or s.artifact == artifact)]
+
+    def scenario(self, rtt: int, variant: str = NO_PEP, artifact: str = 'qperf') -> Scenario:
+        scenarios = self.select(rtt=rtt, variant=variant, artifact=artifact)
+        if len(scenarios) != 1:
+            raise KeyError(f'no {artifact} scenario for {rtt}ms {variant!r}')
+        return scenarios[0]
+
+    @property
+    def rtts(self) -> List[int]:
+        return sorted(set(map(lambda s: s.rtt_ms, self.scenarios)))
+
+    @property
+    def variants(self) -> List[str]:
+        return sorted(set(map(lambda s: s.variant, self.scenarios)))
+
+    def connections(self, rtt: int | Scenario, variant: str = NO_PEP, max_s: float = float('inf'),
+                    add_zero_report: bool = True) -> List[Connection]:
+        """all qperf runs of a scenario\n
+        max_s is applied to the cached runs, so it does not cause a re-parse"""
+        scenario = rtt if isinstance(rtt, Scenario) else self.scenario(rtt, variant)
+        if self.store is not None and self.store.add_zero_report == add_zero_report and \
+                self.store.contains(scenario.rtt_ms, scenario.variant):
+            connections = self.store.connections(scenario.rtt_ms, scenario.variant)
+        else:
+            connections = self._load(scenario, add_zero_report)
+        if max_s != float('inf'):
+            return list(map(lambda c: c.truncate(max_s), connections))
+        return list(connections)
+
+    def _load(self, scenario: Scenario, add_zero_report: bool) -> List[Connection]:
+        key = (scenario.path, add_zero_report)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+        else:
+            self._cache[key] = load_all_connections(scenario.path, add_zero_report=add_zero_report,
+                                                    workers=self.workers)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return self._cache[key]
+
+    def clear(self):
+        self._cache.clear()
@@ -0,0 +1,85 @@
+"""end of the ramp up of runs x samples rate matrices, without a loop over runs or samples.\n
+each run is split into a linear ramp up followed by a constant steady state rate, the split with the least
+squared error of both least squares fits wins. all fits are evaluated at once from cumulative sums,
+so noise and single rate drops do not need to be smoothed away beforehand"""
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+MIN_SAMPLES = 3
+"""minimum number of reports of the ramp up and of the steady state"""
+
+
+def _prefix_sums(values: np.ndarray) -> np.ndarray:
+    """runs x (samples + 1), sums of the first 0..samples values of each run"""
+    sums = np.zeros((values.shape[0], values.shape[1] + 1))
+    np.cumsum(values, axis=1, out=sums[:, 1:])
+    return sums
+
+
+def _lengths(times: np.ndarray) -> np.ndarray:
+    """number of reports of each run, runs are padded with NaN at the end"""
+    return np.count_nonzero(~np.isnan(times), axis=1)
+
+
+def steady_state_starts(times: np.ndarray, rates: np.ndarray, min_samples: int = MIN_SAMPLES,
+                        earliest: Optional[np.ndarray] = None) -> np.ndarray:
+    """per run index of the first report of the steady state, -1 for runs with fewer than 2 * min_samples reports.\n
+    times, rates: runs x samples, missing reports at the end of a run are NaN, see AggregatedConnection.matrix
+    earliest: per run time in seconds before which the steady state cannot start, e.g. the time to first byte"""
+    times = np.atleast_2d(np.asarray(times, dtype=np.float64))
+    rates = np.atleast_2d(np.asarray(rates, dtype=np.float64))
+    lengths = _lengths(times)
+    valid = ~np.isnan(times)
+    t = np.where(valid, times, 0)
+    # scaled per run so that the squared sums of 100 Mbit/s rates stay well within float precision
+    scale = np.nanmax(np.where(valid, np.abs(rates), np.nan), axis=1, initial=0)
+    scale[scale == 0] = 1
+    y = np.where(valid, rates, 0) / scale[:, np.newaxis]
+
+    n = np.arange(times.shape[1] + 1, dtype=np.float64)[np.newaxis, :]
+    st, stt, sy, syy, sty = map(_prefix_sums, (t, t * t, y, y * y, t * y))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # linear fit of the ramp up, reports 0..k-1
+        sxx = stt - st * st / n
+        sxy = sty - st * sy / n
+        ramp_up_error = syy - sy * sy / n - np.where(sxx > 0, sxy * sxy / sxx, 0)
+        # constant fit of the steady state, reports k..length-1
+        rows = np.arange(times.shape[0])
+        m = lengths[:, np.newaxis] - n
+        right_sy = sy[rows, lengths][:, np.newaxis] - sy
+        right_syy = syy[rows, lengths][:, np.newaxis] - syy
+        steady_state_error = right_syy - right_sy * right_sy / m
+
+    candidates = (n >= min_samples) & (m >= min_samples)
+    if earliest is not None:
+        start_times = np.concatenate((t, np.full((t.shape[0], 1), np.inf)), axis=1)
+        candidates &= start_times >= np.asarray(earliest, dtype=np.float64).reshape(-1, 1)
+    errors = np.where(candidates, ramp_up_error + steady_state_error, np.inf)
+    starts = np.argmin(errors, axis=1)
+    starts[~candidates.any(axis=1)] = -1
+    return starts
+
+
+def start_times(times: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """per run time of the first steady state report in seconds, NaN where there is none"""
+    times = np.atleast_2d(np.asarray(times, dtype=np.float64))
+    found = starts >= 0
+    result = np.full(len(starts), np.nan)
+    result[found] = times[np.flatnonzero(found), starts[found]]
+    return result
+
+
+def steady_state_rates(rates: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """per run mean rate of the steady state reports, NaN where there is none"""
+    rates = np.atleast_2d(np.asarray(rates, dtype=np.float64))
+    sums = _prefix_sums(np.nan_to_num(rates))
+    lengths = _lengths(rates)
+    rows = np.arange(rates.shape[0])
+    found = starts >= 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = (sums[rows, lengths] - sums[rows, np.maximum(starts, 0)]) / (lengths - starts)
+    return np.where(found, means, np.nan)
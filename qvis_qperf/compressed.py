@@ -0,0 +1,78 @@
+"""transparent reading of gzip and zstd compressed logs, picked by file extension.\n
+files are decompressed while they are read, never to disk. zstd needs the zstandard package,
+or Python 3.14 which ships it as compression.zstd"""
+from __future__ import annotations
+
+import gzip
+import io
+import os
+from typing import IO, Iterator, List
+
+GZIP_EXTENSION = '.gz'
+ZSTD_EXTENSION = '.zst'
+COMPRESSION_EXTENSIONS: List[str] = [GZIP_EXTENSION, ZSTD_EXTENSION]
+
+CHUNK_SIZE = 1 << 20
+"""in bytes of decompressed data, see read_lines"""
+
+
+def compression_extension(file: str) -> str:
+    """'.gz' or '.zst' for compressed files, '' otherwise"""
+    extension = os.path.splitext(file)[1]
+    return extension if extension in COMPRESSION_EXTENSIONS else ''
+
+
+def strip_compression_extension(file: str) -> str:
+    """1.log for 1.log.gz and 1.log.zst"""
+    extension = compression_extension(file)
+    return file[:-len(extension)] if extension else file
+
+
+def _open_zstd(file: str) -> IO[bytes]:
+    try:
+        from compression import zstd
+        return zstd.open(file, 'rb')
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(f'reading {file} requires the zstandard package') from None
+    return zstandard.open(file, 'rb')
+
+
+def open_binary(file: str) -> IO[bytes]:
+    """decompressed content of file, depending on its extension"""
+    extension = compression_extension(file)
+    if extension == GZIP_EXTENSION:
+        return gzip.open(file, 'rb')
+    if extension == ZSTD_EXTENSION:
+        return _open_zstd(file)
+    return open(file, 'rb')
+
+
+def open_text(file: str) -> IO[str]:
+    """like open(file), decompressed depending on the extension of file"""
+    if not compression_extension(file):
+        return open(file)
+    return io.TextIOWrapper(open_binary(file))
+
+
+def read_lines(file: str) -> Iterator[str]:
+    """lines of file without line breaks, decompressed depending on its extension.\n
+    reads CHUNK_SIZE bytes at a time, which is faster than iterating a decompressing text stream"""
+    with open_binary(file) as f:
+        partial = b''
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            end = chunk.rfind(b'\n')
+            if end < 0:
+                partial += chunk
+                continue
+            # only complete lines are decoded, a multi byte character may span two chunks
+            yield from (partial + chunk[:end]).decode().split('\n')
+            partial = chunk[end + 1:]
+        if partial:
+            yield partial.decode()
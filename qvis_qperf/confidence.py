@@ -0,0 +1,107 @@
+"""confidence intervals of the mean with NumPy only.\n
+Student's t quantiles are computed from the regularized incomplete beta function,
+so data only consumers do not need to import scipy.stats, which takes about a second"""
+from __future__ import annotations
+
+import math
+from statistics import NormalDist
+from typing import Tuple
+
+import numpy as np
+
+_EPSILON = 1e-15
+_TINY = 1e-300
+
+
+def _beta_continued_fraction(a: float, b: float, x: float) -> float:
+    """continued fraction of the incomplete beta function, modified Lentz's method"""
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > _TINY else _TINY)
+    result = d
+    for m in range(1, 1000):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > _TINY else _TINY)
+            c = 1 + numerator / c
+            c = c if abs(c) > _TINY else _TINY
+            result *= d * c
+        if abs(d * c - 1) < _EPSILON:
+            break
+    return result
+
+
+def regularized_incomplete_beta(a: float, b: float, x: float) -> float:
+    """I_x(a, b) for a, b > 0 and x in [0, 1]"""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    # the continued fraction converges fast below the mean of the beta distribution
+    if x < (a + 1) / (a + b + 2):
+        return math.exp(log_front) * _beta_continued_fraction(a, b, x) / a
+    return 1 - math.exp(log_front) * _beta_continued_fraction(b, a, 1 - x) / b
+
+
+def t_pdf(t: float, df: float) -> float:
+    """density of Student's t distribution with df degrees of freedom"""
+    return math.exp(math.lgamma((df + 1) / 2) - math.lgamma(df / 2) - (df + 1) / 2 * math.log1p(t * t / df)) / \
+        math.sqrt(df * math.pi)
+
+
+def t_sf(t: float, df: float) -> float:
+    """P(T > t) of Student's t distribution with df degrees of freedom"""
+    tail = regularized_incomplete_beta(df / 2, 0.5, df / (df + t * t)) / 2
+    return tail if t >= 0 else 1 - tail
+
+
+def _t_isf(tail: float, df: float) -> float:
+    """t with P(T > t) = tail, for tail in (0, 0.5)"""
+    if df == 1:
+        return 1 / math.tan(math.pi * tail)
+    if df == 2:
+        return (1 - 2 * tail) / math.sqrt(2 * tail * (1 - tail))
+    # the t distribution has heavier tails, so the normal quantile is below the t quantile.
+    # the tail is convex above 0, newton iterations from below approach the quantile monotonically
+    t = -NormalDist().inv_cdf(tail)
+    for _ in range(100):
+        step = (t_sf(t, df) - tail) / t_pdf(t, df)
+        t += step
+        if abs(step) <= 1e-14 * max(1.0, abs(t)):
+            break
+    return t
+
+
+def t_ppf(q: float, df: float) -> float:
+    """quantile of Student's t distribution with df degrees of freedom, like scipy.stats.t.ppf,
+    NaN for df <= 0"""
+    if not df > 0 or not 0 <= q <= 1:
+        return math.nan
+    if q == 0.5:
+        return 0.0
+    if q == 0:
+        return -math.inf
+    if q == 1:
+        return math.inf
+    if q < 0.5:
+        return -_t_isf(q, df)
+    return _t_isf(1 - q, df)
+
+
+def sem(data) -> float:
+    """standard error of the mean, like scipy.stats.sem"""
+    a = np.asarray(data, dtype=np.float64)
+    if len(a) < 2:
+        return math.nan
+    return float(np.std(a, ddof=1) / math.sqrt(len(a)))
+
+
+def mean_confidence_interval(data, confidence: float = 0.95) -> Tuple[float, float, float]:
+    """mean and the lower and upper bound of its confidence interval, based on Student's t distribution"""
+    a = 1.0 * np.array(data)
+    n = len(a)
+    m, se = np.mean(a), sem(a)
+    h = se * t_ppf((1 + confidence) / 2., n-1)
+    return m, m-h, m+h
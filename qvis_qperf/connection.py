@@ -1,73 +1,101 @@
 from __future__ import annotations
 
+import functools
 import itertools
 import os
-import re
-import statistics
-from typing import List, Iterator, Optional
+from typing import List, Iterator, Optional, Tuple
 
 import numpy as np
 
-from qvis_qperf.aggregated_report import AggregatedReport
-from qvis_qperf.geometry import Point, Line, segments_intersection
+from qvis_qperf.cache import cache_stats, load_cached_columns, store_cached_columns
+from qvis_qperf.changepoint import steady_state_rates, steady_state_starts
+from qvis_qperf.compressed import compression_extension, strip_compression_extension
+from qvis_qperf.downsample import bin_last, bin_mean, bin_sum, fixed_bins
+from qvis_qperf.geometry import polylines_intersections
 from qvis_qperf.interception import BytesReceivedInterception
-from qvis_qperf.report import Report
-
-CLIENT_REPORT_REGEX = r'^[^\d\.]+(?P<time>\d+\.?\d*)[^\d\.]+(?P<rate>\d+\.?\d*)[^\d\.]+(?P<bytes>\d+)[^\d\.]+(?P<packets>\d+)$'
-
-TIME_TO_FIRST_BYTE_REGEX = r'^[^\d\.]+time to first byte[^\d\.]+(?P<time>\d+\.?\d*)[^\d\.]+s$'
-
-ESTABLISHMENT_TIME_REGEX = r'^[^\d\.]+connection establishment time[^\d\.]+(?P<time>\d+\.?\d*)[^\d\.]+s$'
-
-INTERNAL_ERROR_REGEX = r'^.*INTERNAL_ERROR: (?P<text>.*)$'
+from qvis_qperf.profiling import profiler, span
+from qvis_qperf.parser import QperfHeader, parse_qperf_log, CLIENT_REPORT_REGEX, TIME_TO_FIRST_BYTE_REGEX, \
+    ESTABLISHMENT_TIME_REGEX, INTERNAL_ERROR_REGEX
+from qvis_qperf.report import Report, ReportsView
 
 
 class Connection:
     establishment_time: float
     time_to_first_byte: float
-    reports: List[Report]
     internal_error: Optional[str]
+    header: Optional[QperfHeader]
+    """None for connections that are not parsed from a file"""
+    times: np.ndarray
+    """in seconds"""
+    download_rates: np.ndarray
+    """in bits per second"""
+    bytes_received: np.ndarray
+    packets_received: np.ndarray
+    cumulative_bytes_received: np.ndarray
+    """total bytes received up to and including each report"""
 
     def __init__(self, file: str, add_zero_report: bool = True, max_s: float = float('inf')):
-        """parse qvis_qperf output file"""
-        self.reports = []
-        self.internal_error = None
-        with open(file) as file:
-            for line in file:
-                match = re.match(CLIENT_REPORT_REGEX, line)
-                if match:
-                    time = float(match.group('time')) + self.time_to_first_byte
-                    if time <= max_s:
-                        self.reports.append(Report(
-                            time,
-                            float(match.group('rate')),
-                            int(match.group('bytes')),
-                            int(match.group('packets')),
-                        ))
-                    continue
-                match = re.match(ESTABLISHMENT_TIME_REGEX, line)
-                if match:
-                    self.establishment_time = float(match.group('time'))
-                    continue
-                match = re.match(TIME_TO_FIRST_BYTE_REGEX, line)
-                if match:
-                    self.time_to_first_byte = float(match.group('time'))
-                    if add_zero_report:
-                        self.reports.append(Report(self.time_to_first_byte, 0, 0, 0))
-                    continue
-                match = re.match(INTERNAL_ERROR_REGEX, line)
-                if match:
-                    self.internal_error = str(match.group('text'))
+        """parse qvis_qperf output file, gzip or zstd compressed if it ends with .gz or .zst"""
+        log = parse_qperf_log(file, add_zero_report=add_zero_report, max_s=max_s)
+        self.header = log.header
+        self.internal_error = log.internal_error
+        if log.establishment_time is not None:
+            self.establishment_time = log.establishment_time
+        if log.time_to_first_byte is not None:
+            self.time_to_first_byte = log.time_to_first_byte
+        self._set_columns(log.times, log.download_rates, log.bytes_received, log.packets_received)
+
+    @classmethod
+    def from_arrays(cls, times, download_rates, bytes_received, packets_received, establishment_time: float,
+                    time_to_first_byte: float, internal_error: Optional[str] = None,
+                    header: Optional[QperfHeader] = None, cumulative_bytes_received=None) -> Connection:
+        """create connection from report columns,
+        arrays of the right dtype are used without a copy, e.g. memory mapped ones, see qvis_qperf.store\n
+        cumulative_bytes_received: computed from bytes_received if None"""
+        connection = cls.__new__(cls)
+        connection.establishment_time = establishment_time
+        connection.time_to_first_byte = time_to_first_byte
+        connection.internal_error = internal_error
+        connection.header = header
+        connection._set_columns(times, download_rates, bytes_received, packets_received, cumulative_bytes_received)
+        return connection
+
+    @classmethod
+    def from_reports(cls, reports: List[Report], establishment_time: float, time_to_first_byte: float,
+                     internal_error: Optional[str] = None) -> Connection:
+        return cls.from_arrays(
+            list(map(lambda r: r.time, reports)),
+            list(map(lambda r: r.download_rate, reports)),
+            list(map(lambda r: r.bytes_received, reports)),
+            list(map(lambda r: r.packets_received, reports)),
+            establishment_time=establishment_time,
+            time_to_first_byte=time_to_first_byte,
+            internal_error=internal_error,
+        )
+
+    def _set_columns(self, times, download_rates, bytes_received, packets_received, cumulative_bytes_received=None):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.download_rates = np.asarray(download_rates, dtype=np.float64)
+        self.bytes_received = np.asarray(bytes_received, dtype=np.int64)
+        self.packets_received = np.asarray(packets_received, dtype=np.int64)
+        if cumulative_bytes_received is None:
+            self.cumulative_bytes_received = np.cumsum(self.bytes_received)
+        else:
+            self.cumulative_bytes_received = np.asarray(cumulative_bytes_received, dtype=np.int64)
+
+    @property
+    def reports(self) -> ReportsView:
+        """compatibility view, prefer the column arrays"""
+        return ReportsView(self.times, self.download_rates, self.bytes_received, self.packets_received)
 
     def mean_rate(self, exclude_zero_report: bool = True, start_time: float = 0) -> float:
         """starting from time to first byte\n
         start_time in seconds
         in bit per second"""
-        reports = self.reports
-        reports = map(lambda e: e[1], filter(lambda e: e[0] != 0 or not exclude_zero_report or e[1].bytes_received != 0,
-                                             enumerate(self.reports)))
-        reports = filter(lambda r: r.time >= start_time, reports)
-        return statistics.mean(map(lambda r: r.download_rate, reports))
+        mask = self.times >= start_time
+        if exclude_zero_report and len(mask) > 0 and self.bytes_received[0] == 0:
+            mask[0] = False
+        return float(np.mean(self.download_rates[mask]))
 
     @property
     def mean_rate_after_ramp_up(self) -> float:
@@ -76,16 +104,17 @@ class Connection:
         return self.mean_rate(start_time=self.ramp_up_time_from_start)
 
     @property
-    def ramp_up_time_from_start(self) -> float:
+    def ramp_up_time_from_start(self) -> Optional[float]:
         """!!! very inaccurate, searches for first rate drop
         in seconds"""
-        max_report = self.reports[0]
-        for report in self.reports[1:]:
-            if report.time < self.time_to_first_byte:
-                continue
-            if report.download_rate < max_report.download_rate:
-                return max_report.time
-            max_report = report
+        # the first report is always a candidate, later ones only from time to first byte on
+        indices = np.flatnonzero(self.times >= self.time_to_first_byte)
+        indices = np.concatenate(([0], indices[indices > 0]))
+        rates = self.download_rates[indices]
+        drops = np.flatnonzero(rates[1:] < rates[:-1])
+        if len(drops) == 0:
+            return None
+        return float(self.times[indices[drops[0]]])
 
     @property
     def ramp_up_time_from_ttfb(self) -> float:
@@ -93,81 +122,239 @@ class Connection:
         in seconds"""
         return self.ramp_up_time_from_start - self.time_to_first_byte
 
+    @property
+    def _steady_state_start(self) -> int:
+        """index of the first steady state report, -1 if the run is too short"""
+        return int(steady_state_starts(self.times, self.download_rates, earliest=[self.time_to_first_byte])[0])
+
+    @property
+    def steady_state_start(self) -> Optional[float]:
+        """end of the ramp up, time of the first report of the steady state, see qvis_qperf.changepoint
+        in seconds"""
+        start = self._steady_state_start
+        if start < 0:
+            return None
+        return float(self.times[start])
+
+    @property
+    def steady_state_rate(self) -> Optional[float]:
+        """mean rate from the end of the ramp up on, see qvis_qperf.changepoint
+        in bit per second"""
+        start = self._steady_state_start
+        if start < 0:
+            return None
+        return float(steady_state_rates(self.download_rates, np.array([start]))[0])
+
     @property
     def max_time(self) -> float:
         """in seconds"""
-        return self.reports[-1].time
+        return float(self.times[-1])
+
+    def truncate(self, max_s: float) -> Connection:
+        """connection with only the reports up to max_s, like parsing with max_s\n
+        the columns are views of this connection's columns if possible"""
+        end = len(self.times)
+        if end > 0 and self.times[-1] > max_s:
+            end = np.searchsorted(self.times, max_s, side='right')
+            # the parser adds the zero report at the time to first byte regardless of max_s
+            if end == 0 and self.times[0] == self.time_to_first_byte and self.bytes_received[0] == 0:
+                end = 1
+        return Connection.from_arrays(
+            self.times[:end],
+            self.download_rates[:end],
+            self.bytes_received[:end],
+            self.packets_received[:end],
+            establishment_time=self.establishment_time,
+            time_to_first_byte=self.time_to_first_byte,
+            internal_error=self.internal_error,
+            header=self.header,
+            cumulative_bytes_received=self.cumulative_bytes_received[:end],
+        )
 
     def reports_in_interval(self, start: float, end: float) -> List[Report]:
-        reports = []
-        for report in self.reports:
-            if report.time >= end:
-                break
-            if start > report.time:
-                continue
-            reports.append(report)
-        return reports
+        start_index, end_index = np.searchsorted(self.times, [start, end], side='left')
+        return self.reports[start_index:end_index]
 
     def total_received_bytes_at(self, time: float) -> float:
         """time: in seconds\n
         returns bytes"""
-        total = 0
-        for report in self.reports:
-            if report.time > time:
-                break
-            total += report.bytes_received
-        return total
+        index = np.searchsorted(self.times, time, side='right')
+        if index == 0:
+            return 0
+        return int(self.cumulative_bytes_received[index - 1])
+
+    def total_received_bytes_at_times(self, times) -> np.ndarray:
+        """batch version of total_received_bytes_at\n
+        times: array in seconds"""
+        indices = np.searchsorted(self.times, times, side='right')
+        cumulative = np.concatenate(([0], self.cumulative_bytes_received))
+        return cumulative[indices]
 
     def time_to_received_bytes(self, bytes: int) -> Optional[float]:
         """return time in seconds, or None if that many bytes are never received"""
-        total_bytes = 0
-        for report in self.reports:
-            total_bytes += report.bytes_received
-            if total_bytes >= bytes:
-                return report.time
-        return None
+        index = np.searchsorted(self.cumulative_bytes_received, bytes, side='left')
+        if index == len(self.times):
+            return None
+        return float(self.times[index])
+
+    def times_to_received_bytes(self, bytes) -> np.ndarray:
+        """batch version of time_to_received_bytes\n
+        bytes: array of byte thresholds\n
+        returns seconds, NaN where that many bytes are never received"""
+        indices = np.searchsorted(self.cumulative_bytes_received, bytes, side='left')
+        times = np.concatenate((self.times, [np.nan]))
+        return times[indices]
 
     def intersections(self, other: Connection) -> Iterator[BytesReceivedInterception]:
-        self_times = list(map(lambda r: r.time, self.reports))
-        self_data = np.cumsum(list(map(lambda r: r.bytes_received, self.reports)))
-        other_times = list(map(lambda r: r.time, other.reports))
-        other_data = np.cumsum(list(map(lambda r: r.bytes_received, other.reports)))
-        for self_index in range(0, len(self_times) - 1):
-            for other_index in range(0, len(other_times) - 1):
-                l1 = Line(Point(self_times[self_index], self_data[self_index]),
-                          Point(self_times[self_index + 1], self_data[self_index + 1]))
-                l2 = Line(Point(other_times[other_index], other_data[other_index]),
-                          Point(other_times[other_index + 1], other_data[other_index + 1]))
-                intersection = segments_intersection(l1, l2)
-                if intersection is not None:
-                    if intersection.positive:
-                        yield BytesReceivedInterception(intersection.point.x, int(intersection.point.y), upper=self,
-                                                        lower=other)
-                    else:
-                        yield BytesReceivedInterception(intersection.point.x, int(intersection.point.y), upper=other,
-                                                        lower=self)
+        """intersections of the received bytes curves,
+        ordered by the report index of self and then other"""
+        with span('intersections') as s:
+            _, _, x, y, positive = polylines_intersections(self.times, self.cumulative_bytes_received,
+                                                           other.times, other.cumulative_bytes_received)
+            s.count(reports=len(self.times) + len(other.times), intersections=len(x))
+        for time, bytes_received, positive in zip(x.tolist(), y.tolist(), positive.tolist()):
+            if positive:
+                yield BytesReceivedInterception(time, int(bytes_received), upper=self, lower=other)
+            else:
+                yield BytesReceivedInterception(time, int(bytes_received), upper=other, lower=self)
 
     def reduce_steps(self, n: int, keep_zero: bool = True) -> Connection:
-        new_connection = Connection.__new__(Connection)
-        new_connection.establishment_time = self.establishment_time
-        new_connection.time_to_first_byte = self.time_to_first_byte
-        new_connection.reports = []
-        new_connection.internal_error = self.internal_error
-        if keep_zero:
-            new_connection.reports.append(self.reports[0])
-        for i in range(1 if keep_zero else 0, len(self.reports), n):
-            new_connection.reports.append(AggregatedReport(self.reports[i:i + n]).to_sum_report())
-        return new_connection
-
-def load_all_connections(dir: str, file_extension: str = '.log', max_s: float = float('inf')) -> List[Connection]:
+        """sum up every n reports,
+        the time of the last report and the mean rate of each group is used"""
+        first = min(1 if keep_zero else 0, len(self.times))
+        starts = fixed_bins(len(self.times), n, first)
+        times = bin_last(self.times, starts)
+        download_rates = bin_mean(self.download_rates, starts)
+        bytes_received = bin_sum(self.bytes_received, starts)
+        packets_received = bin_sum(self.packets_received, starts)
+        return Connection.from_arrays(
+            np.concatenate((self.times[:first], times)),
+            np.concatenate((self.download_rates[:first], download_rates)),
+            np.concatenate((self.bytes_received[:first], bytes_received)),
+            np.concatenate((self.packets_received[:first], packets_received)),
+            establishment_time=self.establishment_time,
+            time_to_first_byte=self.time_to_first_byte,
+            internal_error=self.internal_error,
+            header=self.header,
+        )
+
+
+def load_connection(file: str, add_zero_report: bool = True, max_s: float = float('inf'),
+                    use_cache: bool = True) -> Connection:
+    """parse qvis_qperf output file,
+    the parse result is cached on disk next to the file if use_cache is set"""
+    with span('load_connection', file=file) as s:
+        hits = cache_stats.hits
+        connection = _load_connection(file, add_zero_report, max_s, use_cache)
+        s.set(cache='off' if not use_cache else 'hit' if cache_stats.hits > hits else 'miss')
+        s.count(reports=len(connection.times))
+        return connection
+
+
+def _load_connection(file: str, add_zero_report: bool, max_s: float, use_cache: bool) -> Connection:
+    if not use_cache:
+        return Connection(file, add_zero_report=add_zero_report, max_s=max_s)
+    columns = load_cached_columns(file, add_zero_report, max_s)
+    if columns is not None:
+        connection = Connection.from_arrays(**columns)
+        # like a parsed connection, times missing in the log are not set
+        for name in ('establishment_time', 'time_to_first_byte'):
+            if columns[name] is None:
+                delattr(connection, name)
+        return connection
+    connection = Connection(file, add_zero_report=add_zero_report, max_s=max_s)
+    store_cached_columns(file, add_zero_report, max_s, {
+        'times': connection.times,
+        'download_rates': connection.download_rates,
+        'bytes_received': connection.bytes_received,
+        'packets_received': connection.packets_received,
+        'establishment_time': getattr(connection, 'establishment_time', None),
+        'time_to_first_byte': getattr(connection, 'time_to_first_byte', None),
+        'internal_error': connection.internal_error,
+        'header': connection.header,
+    })
+    return connection
+
+
+def _load_connection_counting(file: str, add_zero_report: bool, max_s: float,
+                              use_cache: bool) -> Tuple[Connection, int, int, List[dict]]:
+    """load_connection for worker processes,
+    additionally returns the cache hits and misses and the profiling spans of this call"""
+    profiler.reset()
+    hits, misses = cache_stats.hits, cache_stats.misses
+    connection = load_connection(file, add_zero_report=add_zero_report, max_s=max_s, use_cache=use_cache)
+    return connection, cache_stats.hits - hits, cache_stats.misses - misses, profiler.to_json()
+
+
+def load_connections(files: List[str], add_zero_report: bool = True, max_s: float = float('inf'),
+                     use_cache: bool = True, workers: Optional[int] = 1) -> List[Connection]:
+    """load files in the given order\n
+    workers: number of processes, None for one per CPU, 1 to load in this process"""
+    with span('load_connections', workers=workers) as s:
+        s.count(runs=len(files))
+        return _load_connections(files, add_zero_report, max_s, use_cache, workers)
+
+
+def _load_connections(files: List[str], add_zero_report: bool, max_s: float, use_cache: bool,
+                      workers: Optional[int]) -> List[Connection]:
+    if workers == 1 or len(files) <= 1:
+        return list(map(lambda f: load_connection(f, add_zero_report=add_zero_report, max_s=max_s,
+                                                  use_cache=use_cache), files))
+    # multiprocessing takes a share of the start up time of short scripts, most load in this process
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    load = functools.partial(_load_connection_counting, add_zero_report=add_zero_report, max_s=max_s,
+                             use_cache=use_cache)
+    with ProcessPoolExecutor(max_workers=min(workers, len(files))) as executor:
+        results = list(executor.map(load, files, chunksize=max(1, len(files) // (workers * 4))))
     connections: List[Connection] = []
-    for file in os.listdir(dir):
-        fe = os.path.splitext(file)[1]
-        if fe == file_extension:
-            connections.append(Connection(os.path.join(dir, file), max_s=max_s))
+    for connection, hits, misses, spans in results:
+        connections.append(connection)
+        cache_stats.hits += hits
+        cache_stats.misses += misses
+        profiler.add(spans)
     return connections
 
 
+def connection_files(dir: str, file_extension: str = '.log') -> List[str]:
+    """paths of all files in dir with the given extension, sorted by name.
+    gzip and zstd compressed files like 1.log.gz and 1.log.zst are included, see qvis_qperf.compressed,
+    an uncompressed file is preferred over a compressed copy of it"""
+    files = {}
+    for file in sorted(os.listdir(dir), key=lambda f: (strip_compression_extension(f), compression_extension(f))):
+        name = file if os.path.splitext(file)[1] == file_extension else strip_compression_extension(file)
+        if os.path.splitext(name)[1] == file_extension and name not in files:
+            files[name] = os.path.join(dir, file)
+    return list(files.values())
+
+
+def load_all_connections(dir: str, file_extension: str = '.log', max_s: float = float('inf'),
+                         add_zero_report: bool = True, use_cache: bool = True,
+                         workers: Optional[int] = 1) -> List[Connection]:
+    """connections are returned sorted by file name,
+    compressed files are decompressed while they are parsed, see connection_files\n
+    use_cache: keep parsed files in a binary cache, see qvis_qperf.cache\n
+    workers: number of processes, None for one per CPU, 1 to load in this process"""
+    return load_connections(connection_files(dir, file_extension), add_zero_report=add_zero_report, max_s=max_s,
+                            use_cache=use_cache, workers=workers)
+
+
+def load_all_connections_of_dirs(dirs: List[str], file_extension: str = '.log', max_s: float = float('inf'),
+                                 add_zero_report: bool = True, use_cache: bool = True,
+                                 workers: Optional[int] = None) -> List[List[Connection]]:
+    """like load_all_connections for multiple directories,
+    the files of all directories share one process pool"""
+    files = list(map(lambda d: connection_files(d, file_extension), dirs))
+    connections = load_connections(list(itertools.chain.from_iterable(files)), add_zero_report=add_zero_report,
+                                   max_s=max_s, use_cache=use_cache, workers=workers)
+    result: List[List[Connection]] = []
+    for dir_files in files:
+        result.append(connections[:len(dir_files)])
+        connections = connections[len(dir_files):]
+    return result
+
+
 def reduce_steps(connection: Connection | List[Connection], n=10, keep_zero=True) -> Connection | List[Connection]:
     if isinstance(connection, List):
         connections = connection
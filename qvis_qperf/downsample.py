@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+
+def fixed_bins(length: int, n: int, first: int = 0) -> np.ndarray:
+    """start indices of groups of n samples, starting at index first,
+    the last group may be shorter"""
+    return np.arange(min(first, length), length, n)
+
+
+def bin_sum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """sum of each group, see fixed_bins"""
+    if len(starts) == 0:
+        return values[:0]
+    return np.add.reduceat(values, starts)
+
+
+def bin_mean(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """mean of each group, see fixed_bins"""
+    if len(starts) == 0:
+        return values[:0].astype(np.float64)
+    return np.add.reduceat(values, starts) / np.diff(starts, append=len(values))
+
+
+def bin_last(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """last value of each group, see fixed_bins"""
+    return values[np.diff(starts, append=len(values)) + starts - 1]
+
+
+def _buckets(length: int, max_points: int) -> np.ndarray:
+    """boundaries of max_points - 2 buckets between the first and the last sample"""
+    return np.linspace(1, length - 1, max_points - 1).astype(np.intp)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """indices of at most max_points samples selected by Largest-Triangle-Three-Buckets,
+    keeps the first and the last sample and the visual shape of the curve.\n
+    x has to be sorted"""
+    if max_points < 3:
+        raise ValueError('lttb needs at least 3 points')
+    length = len(x)
+    if max_points >= length:
+        return np.arange(length)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = _buckets(length, max_points)
+    # the third triangle point is the mean of the next bucket, the last sample for the last bucket
+    next_x = np.append(np.add.reduceat(x[:-1], edges[:-1])[1:] / np.diff(edges)[1:], x[-1])
+    next_y = np.append(np.add.reduceat(y[:-1], edges[:-1])[1:] / np.diff(edges)[1:], y[-1])
+    indices = np.empty(max_points, dtype=np.intp)
+    indices[0] = 0
+    indices[-1] = length - 1
+    selected = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # twice the triangle area, the constant factor does not change the maximum
+        areas = np.abs((x[selected] - next_x[bucket]) * (y[start:end] - y[selected]) -
+                       (x[selected] - x[start:end]) * (next_y[bucket] - y[selected]))
+        selected = start + int(np.argmax(areas))
+        indices[bucket + 1] = selected
+    return indices
+
+
+def min_max(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """indices of the minimum and maximum of each of max_points / 2 buckets,
+    plus the first and the last sample, in sample order.
+    keeps all spikes, unlike lttb"""
+    if max_points < 4:
+        raise ValueError('min_max needs at least 4 points')
+    length = len(x)
+    if max_points >= length:
+        return np.arange(length)
+    edges = _buckets(length, (max_points - 2) // 2 + 2)
+    bucket = np.searchsorted(edges, np.arange(1, length - 1), side='right') - 1
+    order = np.lexsort((y[1:-1], bucket)) + 1
+    counts = np.bincount(bucket, minlength=len(edges) - 1)
+    ends = np.cumsum(counts)
+    non_empty = counts > 0
+    minima = order[(ends - counts)[non_empty]]
+    maxima = order[ends[non_empty] - 1]
+    return np.unique(np.concatenate(([0, length - 1], minima, maxima)))
+
+
+METHODS: Dict[str, Callable[[np.ndarray, np.ndarray, int], np.ndarray]] = {
+    'lttb': lttb,
+    'min_max': min_max,
+}
+"""shape preserving downsampling methods by name"""
+
+
+def downsample(x: np.ndarray, y: np.ndarray, max_points: int, method: str = 'lttb') -> Tuple[np.ndarray, np.ndarray]:
+    """at most max_points samples of the curve x, y for plotting"""
+    if method not in METHODS:
+        raise ValueError(f'unknown downsampling method {method}')
+    indices = METHODS[method](x, y, max_points)
+    return x[indices], y[indices]
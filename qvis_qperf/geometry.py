@@ -1,4 +1,6 @@
-from typing import Optional
+from typing import Optional, Tuple
+
+import numpy as np
 
 
 class Point:
@@ -61,3 +63,55 @@ def segments_intersection(l1: Line, l2: Line) -> Optional[Interception]:
     if not do_segments_intersect(l1, l2):
         return
     return line_intersection(l1, l2)
+
+
+def polylines_intersections(x1: np.ndarray, y1: np.ndarray, x2: np.ndarray, y2: np.ndarray) \
+        -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """intersections of all segments of two polylines,
+    same result as segments_intersection for every pair of segments.\n
+    only segments with overlapping x ranges are tested, so x1 and x2 should be sorted.\n
+    returns segment indices of the first and second polyline, x, y and positive of each intersection,
+    ordered by the segment indices"""
+    x1, y1, x2, y2 = map(np.asarray, (x1, y1, x2, y2))
+    n = len(x1) - 1
+    m = len(x2) - 1
+    if n < 1 or m < 1:
+        empty_index = np.empty(0, dtype=np.intp)
+        empty = np.empty(0, dtype=np.float64)
+        return empty_index, empty_index, empty, empty, np.empty(0, dtype=bool)
+    if np.all(np.diff(x1) >= 0) and np.all(np.diff(x2) >= 0):
+        # merge sweep: first and last segment of polyline 2 that overlaps each segment of polyline 1
+        starts = np.maximum(np.searchsorted(x2, x1[:-1], side='left') - 1, 0)
+        ends = np.minimum(np.searchsorted(x2, x1[1:], side='right'), m)
+    else:
+        starts = np.zeros(n, dtype=np.intp)
+        ends = np.full(n, m, dtype=np.intp)
+    counts = np.maximum(ends - starts, 0)
+    i = np.repeat(np.arange(n), counts)
+    j = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+
+    ax, ay, bx, by = x1[i], y1[i], x1[i + 1], y1[i + 1]
+    cx, cy, dx, dy = x2[j], y2[j], x2[j + 1], y2[j + 1]
+
+    def ccw_(px, py, qx, qy, rx, ry):
+        return (ry - py) * (qx - px) > (qy - py) * (rx - px)
+
+    intersect = (ccw_(ax, ay, cx, cy, dx, dy) != ccw_(bx, by, cx, cy, dx, dy)) \
+        & (ccw_(ax, ay, bx, by, cx, cy) != ccw_(ax, ay, bx, by, dx, dy))
+    i, j = i[intersect], j[intersect]
+    ax, ay, bx, by = ax[intersect], ay[intersect], bx[intersect], by[intersect]
+    cx, cy, dx, dy = cx[intersect], cy[intersect], dx[intersect], dy[intersect]
+
+    # line_intersection
+    xd1 = ax - bx
+    xd2 = cx - dx
+    yd1 = ay - by
+    yd2 = cy - dy
+    div = det(xd1, xd2, yd1, yd2)
+    valid = div != 0
+    d1 = det(ax, ay, bx, by)
+    d2 = det(cx, cy, dx, dy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = det(d1, d2, xd1, xd2) / div
+        y = det(d1, d2, yd1, yd2) / div
+    return i[valid], j[valid], x[valid], y[valid], div[valid] < 0
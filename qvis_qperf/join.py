@@ -0,0 +1,281 @@
+"""join the qlog traces of the vantage points of a scenario on packet number and connection id.\n
+a packet sent in one trace and received in another is found with a sort-merge join of the packet tables,
+keyed by packet number and packet number space, packets with different destination connection ids are dropped.
+two traces are the ends of a hop if they have opposite vantage points, the same original destination connection id
+and packets joined in both directions. the minimum delays of both directions give the one-way delay of the hop
+and the clock offset between the two traces, assuming the minimum delays are symmetric, like NTP.
+
+a trace with the same vantage point and connection as a trace that starts earlier took the connection over
+from the latest of them, its handover is its start relative to the start of that trace, the shift_ms of the scripts.
+
+report with: python -m qvis_qperf.join ./data/2000ms_two_proxies/qlog"""
+from __future__ import annotations
+
+import argparse
+import os
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from qvis_qperf.compressed import strip_compression_extension
+from qvis_qperf.profiling import span
+from qvis_qperf.qlog import PACKET_TYPES, QlogTable, QlogTrace, load_qlog
+
+QLOG_EXTENSION = '.qlog'
+
+VANTAGE_POINT_TRACES = ['client', 'client_side_proxy_client_facing', 'client_side_proxy_server_facing',
+                        'server_side_proxy_client_facing', 'server_side_proxy_server_facing', 'server']
+"""trace names of a scenario from the client to the server, other names are sorted after them"""
+
+MIN_MATCHES = 10
+"""packets joined in each direction of a hop"""
+
+
+class PacketJoin:
+    """packets sent in the sender trace and received in the receiver trace"""
+    sender: str
+    receiver: str
+    sent: np.ndarray
+    """row indices into the packets_sent table of the sender"""
+    received: np.ndarray
+    """row indices into the packets_received table of the receiver"""
+    sent_times: np.ndarray
+    received_times: np.ndarray
+    """in ms since the unix epoch, by the clock of the sender and the receiver"""
+
+    def __init__(self, sender: str, receiver: str, sent: np.ndarray, received: np.ndarray, sent_times: np.ndarray,
+                 received_times: np.ndarray):
+        self.sender = sender
+        self.receiver = receiver
+        self.sent = sent
+        self.received = received
+        self.sent_times = sent_times
+        self.received_times = received_times
+
+    def __len__(self) -> int:
+        return len(self.sent)
+
+    def __repr__(self) -> str:
+        return f'PacketJoin({self.sender} -> {self.receiver}, {len(self)} packets)'
+
+    @property
+    def delays(self) -> np.ndarray:
+        """one-way delay plus the clock offset of the receiver, in ms"""
+        return self.received_times - self.sent_times
+
+
+class Hop:
+    """two traces that exchange packets, see estimate_hop"""
+    forward: PacketJoin
+    backward: PacketJoin
+    one_way_delay: float
+    """minimum, in ms"""
+    clock_offset: float
+    """clock of the receiver of forward minus the clock of its sender, in ms"""
+
+    def __init__(self, forward: PacketJoin, backward: PacketJoin, one_way_delay: float, clock_offset: float):
+        self.forward = forward
+        self.backward = backward
+        self.one_way_delay = one_way_delay
+        self.clock_offset = clock_offset
+
+    def __repr__(self) -> str:
+        return f'Hop({self.forward.sender} <-> {self.forward.receiver}, {self.one_way_delay:.3f} ms)'
+
+    @property
+    def forward_delays(self) -> np.ndarray:
+        """one-way delays of the packets of forward, in ms"""
+        return self.forward.delays - self.clock_offset
+
+    @property
+    def backward_delays(self) -> np.ndarray:
+        return self.backward.delays + self.clock_offset
+
+
+class ScenarioJoin:
+    """hops, clock offsets and handovers of the traces of a scenario, see join_scenario"""
+    traces: Dict[str, QlogTrace]
+    """by name, ordered like VANTAGE_POINT_TRACES"""
+    hops: List[Hop]
+    clock_offsets: Dict[str, float]
+    """clock of each trace minus the clock of the first trace in ms, 0 if no hops connect them"""
+    starts: Dict[str, float]
+    """start of each trace on the timeline of the first trace, in ms"""
+    handovers: Dict[str, float]
+    """of the traces that took a connection over, their start relative to the start of the trace
+    they took it over from, in ms"""
+
+    def __init__(self, traces: Dict[str, QlogTrace], hops: List[Hop], clock_offsets: Dict[str, float],
+                 starts: Dict[str, float], handovers: Dict[str, float]):
+        self.traces = traces
+        self.hops = hops
+        self.clock_offsets = clock_offsets
+        self.starts = starts
+        self.handovers = handovers
+
+    def __repr__(self) -> str:
+        return f'ScenarioJoin({list(self.traces)}, {len(self.hops)} hops)'
+
+    def hop(self, a: str, b: str) -> Optional[Hop]:
+        """the hop between the traces a and b, in either direction"""
+        for hop in self.hops:
+            if {hop.forward.sender, hop.forward.receiver} == {a, b}:
+                return hop
+        return None
+
+
+def packet_keys(table: QlogTable) -> np.ndarray:
+    """packet number and packet number space of each packet as one integer, -1 for packets without number"""
+    numbers = np.asarray(table['packet_number'], dtype=np.int64)
+    keys = numbers * len(PACKET_TYPES) + np.asarray(table['packet_type'], dtype=np.int64)
+    return np.where(numbers >= 0, keys, -1)
+
+
+def _first_rows(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """sorted unique keys >= 0 and the row of the first occurrence of each"""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    first = np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])) & (sorted_keys >= 0)
+    return sorted_keys[first], order[first]
+
+
+def _connection_ids(trace: QlogTrace, table: QlogTable, codes: Dict[str, int]) -> np.ndarray:
+    """dcid of each packet as a code shared by all traces, -1 if not logged"""
+    for value in trace.strings:
+        codes.setdefault(value, len(codes))
+    lookup = np.array([codes[value] for value in trace.strings] + [-1], dtype=np.int64)
+    # code -1 selects the last entry of lookup
+    return lookup[np.asarray(table['dcid'], dtype=np.int64)]
+
+
+def _absolute_times(trace: QlogTrace, times: np.ndarray) -> np.ndarray:
+    return np.asarray(times, dtype=np.float64) + (trace.reference_time or 0)
+
+
+def join_packets(sender: QlogTrace, receiver: QlogTrace, sender_name: str = '',
+                 receiver_name: str = '') -> PacketJoin:
+    """packets sent in sender and received in receiver"""
+    sent, received = sender.packets_sent, receiver.packets_received
+    sent_keys, sent_rows = _first_rows(packet_keys(sent))
+    received_keys, received_rows = _first_rows(packet_keys(received))
+    if len(received_keys) == 0:
+        sent_keys, sent_rows = sent_keys[:0], sent_rows[:0]
+    positions = np.minimum(np.searchsorted(received_keys, sent_keys), max(len(received_keys) - 1, 0))
+    matched = received_keys[positions] == sent_keys
+    sent_rows, received_rows = sent_rows[matched], received_rows[positions[matched]]
+
+    codes: Dict[str, int] = {}
+    sent_ids = _connection_ids(sender, sent, codes)[sent_rows]
+    received_ids = _connection_ids(receiver, received, codes)[received_rows]
+    same_connection = (sent_ids < 0) | (received_ids < 0) | (sent_ids == received_ids)
+    sent_rows, received_rows = sent_rows[same_connection], received_rows[same_connection]
+
+    # in the order the packets were sent
+    order = np.argsort(sent_rows, kind='stable')
+    sent_rows, received_rows = sent_rows[order], received_rows[order]
+    return PacketJoin(sender_name or sender.file, receiver_name or receiver.file, sent_rows, received_rows,
+                      _absolute_times(sender, sent['time'][sent_rows]),
+                      _absolute_times(receiver, received['time'][received_rows]))
+
+
+def estimate_hop(forward: PacketJoin, backward: PacketJoin, min_matches: int = MIN_MATCHES) -> Optional[Hop]:
+    """one-way delay and clock offset from the minimum delays of both directions,
+    None if there are too few packets or the joined packets are not a hop"""
+    if len(forward) < min_matches or len(backward) < min_matches:
+        return None
+    forward_min, backward_min = float(forward.delays.min()), float(backward.delays.min())
+    one_way_delay = (forward_min + backward_min) / 2
+    if one_way_delay < 0:
+        # packets of two different connections with the same numbers
+        return None
+    return Hop(forward, backward, one_way_delay, (forward_min - backward_min) / 2)
+
+
+def _order(name: str) -> Tuple[int, str]:
+    return (VANTAGE_POINT_TRACES.index(name) if name in VANTAGE_POINT_TRACES else len(VANTAGE_POINT_TRACES), name)
+
+
+def scenario_traces(dir: str) -> Dict[str, str]:
+    """qlog files of a scenario by trace name, e.g. client for client.qlog.gz"""
+    files = {}
+    for file in sorted(os.listdir(dir)):
+        name = strip_compression_extension(file)
+        path = os.path.join(dir, file)
+        if name.endswith(QLOG_EXTENSION) and os.path.isfile(path):
+            files.setdefault(name[:-len(QLOG_EXTENSION)], path)
+    return {name: files[name] for name in sorted(files, key=_order)}
+
+
+def _clock_offsets(names: List[str], hops: List[Hop]) -> Dict[str, float]:
+    """breadth first over the hops from the first trace"""
+    offsets = {names[0]: 0.0} if names else {}
+    queue = deque(offsets)
+    while queue:
+        name = queue.popleft()
+        for hop in hops:
+            a, b = hop.forward.sender, hop.forward.receiver
+            if a == name and b not in offsets:
+                offsets[b] = offsets[a] + hop.clock_offset
+                queue.append(b)
+            elif b == name and a not in offsets:
+                offsets[a] = offsets[b] - hop.clock_offset
+                queue.append(a)
+    return {name: offsets.get(name, 0.0) for name in names}
+
+
+def join_traces(traces: Dict[str, QlogTrace], min_matches: int = MIN_MATCHES) -> ScenarioJoin:
+    """hops between all pairs of traces, clock offsets and handovers"""
+    names = list(traces)
+    hops = []
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            ta, tb = traces[a], traces[b]
+            if ta.vantage_point == tb.vantage_point or (ta.odcid and tb.odcid and ta.odcid != tb.odcid):
+                continue
+            hop = estimate_hop(join_packets(ta, tb, a, b), join_packets(tb, ta, b, a), min_matches)
+            if hop is not None:
+                hops.append(hop)
+    clock_offsets = _clock_offsets(names, hops)
+    reference = (traces[names[0]].reference_time or 0) if names else 0
+    starts = {name: (trace.reference_time or 0) - clock_offsets[name] - reference for name, trace in traces.items()}
+    handovers = {}
+    for name, trace in traces.items():
+        earlier = [other for other in names if other != name and starts[other] < starts[name]
+                   and traces[other].vantage_point == trace.vantage_point and traces[other].odcid == trace.odcid]
+        if earlier:
+            # the immediate predecessor
+            handovers[name] = starts[name] - starts[max(earlier, key=lambda other: starts[other])]
+    return ScenarioJoin(traces, hops, clock_offsets, starts, handovers)
+
+
+def join_scenario(dir: str, min_matches: int = MIN_MATCHES) -> ScenarioJoin:
+    """join_traces of all qlog files of a scenario directory"""
+    with span('join_scenario', dir=dir) as s:
+        traces = {name: load_qlog(file) for name, file in scenario_traces(dir).items()}
+        scenario = join_traces(traces, min_matches)
+        s.count(traces=len(traces), hops=len(scenario.hops),
+                packets=sum(len(t.packets_sent) + len(t.packets_received) for t in traces.values()))
+        return scenario
+
+
+def _report(scenario: ScenarioJoin) -> str:
+    lines = []
+    for hop in scenario.hops:
+        lines.append(f'{hop.forward.sender} <-> {hop.forward.receiver}: one-way delay {hop.one_way_delay:.3f} ms, '
+                     f'clock offset {hop.clock_offset:.3f} ms, {len(hop.forward)} + {len(hop.backward)} packets, '
+                     f'median delays {np.median(hop.forward_delays):.3f} / {np.median(hop.backward_delays):.3f} ms')
+    for name, start in scenario.starts.items():
+        handover = scenario.handovers.get(name)
+        lines.append(f'{name}: starts at {start:.3f} ms, clock offset {scenario.clock_offsets[name]:.3f} ms' +
+                     (f', handover at {handover:.3f} ms' if handover is not None else ''))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='join the qlog traces of scenarios on packet number')
+    parser.add_argument('dirs', nargs='+', help='qlog directories of scenarios')
+    parser.add_argument('--min-matches', type=int, default=MIN_MATCHES, help='packets per direction of a hop')
+    args = parser.parse_args()
+    for dir in args.dirs:
+        print(f'{dir}:\n{_report(join_scenario(dir, args.min_matches))}')
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import re
+from typing import Iterable, List, Optional
+
+from qvis_qperf.compressed import read_lines
+from qvis_qperf.profiling import span
+
+CLIENT_REPORT_REGEX = r'^[^\d\.]+(?P<time>\d+\.?\d*)[^\d\.]+(?P<rate>\d+\.?\d*)[^\d\.]+(?P<bytes>\d+)[^\d\.]+(?P<packets>\d+)$'
+
+TIME_TO_FIRST_BYTE_REGEX = r'^[^\d\.]+time to first byte[^\d\.]+(?P<time>\d+\.?\d*)[^\d\.]+s$'
+
+ESTABLISHMENT_TIME_REGEX = r'^[^\d\.]+connection establishment time[^\d\.]+(?P<time>\d+\.?\d*)[^\d\.]+s$'
+
+INTERNAL_ERROR_REGEX = r'^.*INTERNAL_ERROR: (?P<text>.*)$'
+
+_CLIENT_REPORT_PATTERN = re.compile(CLIENT_REPORT_REGEX)
+
+CLIENT_REPORT_PREFIX = '[client] second '
+TIME_TO_FIRST_BYTE_PREFIX = '[client] time to first byte: '
+ESTABLISHMENT_TIME_PREFIX = '[client] connection establishment time: '
+SERVER_START_PREFIX = '[server] starting server with '
+BANDWIDTH_PREFIX = 'Bandwidth: '
+RTT_PREFIX = 'RTT: '
+BDP_PREFIX = 'BDP: '
+MAX_IN_FLIGHT_PACKETS_PREFIX = 'Max In-Flight Packets: '
+INTERNAL_ERROR_MARKER = 'INTERNAL_ERROR: '
+
+
+class QperfHeader:
+    """measurement setup printed at the top of a qperf log"""
+    bandwidth: Optional[float]
+    """in bit per second"""
+    rtt: Optional[float]
+    """in seconds"""
+    bdp: Optional[int]
+    """in bytes"""
+    max_in_flight_packets: Optional[int]
+    server_cc: Optional[str]
+    """congestion control algorithm of the server"""
+    server_iw: Optional[int]
+    """initial congestion window of the server in packets"""
+
+    def __init__(self, bandwidth: Optional[float] = None, rtt: Optional[float] = None, bdp: Optional[int] = None,
+                 max_in_flight_packets: Optional[int] = None, server_cc: Optional[str] = None,
+                 server_iw: Optional[int] = None):
+        self.bandwidth = bandwidth
+        self.rtt = rtt
+        self.bdp = bdp
+        self.max_in_flight_packets = max_in_flight_packets
+        self.server_cc = server_cc
+        self.server_iw = server_iw
+
+
+class QperfLogParser:
+    """line by line parser for qperf client output"""
+    add_zero_report: bool
+    max_s: float
+    header: QperfHeader
+    establishment_time: Optional[float]
+    """in seconds"""
+    time_to_first_byte: Optional[float]
+    """in seconds"""
+    internal_error: Optional[str]
+    times: List[float]
+    """in seconds, shifted by time to first byte"""
+    download_rates: List[float]
+    """in bits per second"""
+    bytes_received: List[int]
+    packets_received: List[int]
+    num_lines: int
+
+    def __init__(self, add_zero_report: bool = True, max_s: float = float('inf')):
+        self.add_zero_report = add_zero_report
+        self.max_s = max_s
+        self.header = QperfHeader()
+        self.establishment_time = None
+        self.time_to_first_byte = None
+        self.internal_error = None
+        self.times = []
+        self.download_rates = []
+        self.bytes_received = []
+        self.packets_received = []
+        self.num_lines = 0
+
+    def feed(self, lines: Iterable[str]) -> QperfLogParser:
+        num_lines = 0
+        for line in lines:
+            self.feed_line(line)
+            num_lines += 1
+        self.num_lines += num_lines
+        return self
+
+    def feed_line(self, line: str):
+        if line.startswith(CLIENT_REPORT_PREFIX):
+            self._parse_report(line)
+        elif line.startswith(TIME_TO_FIRST_BYTE_PREFIX):
+            self.time_to_first_byte = _parse_value(line, TIME_TO_FIRST_BYTE_PREFIX, float)
+            if self.add_zero_report:
+                self._append_report(self.time_to_first_byte, 0, 0, 0)
+        elif line.startswith(ESTABLISHMENT_TIME_PREFIX):
+            self.establishment_time = _parse_value(line, ESTABLISHMENT_TIME_PREFIX, float)
+        elif line.startswith(SERVER_START_PREFIX):
+            for field in line[len(SERVER_START_PREFIX):].split(','):
+                key, _, value = field.strip().partition(' ')
+                if key == 'cc':
+                    self.header.server_cc = value
+                elif key == 'iw':
+                    self.header.server_iw = int(value)
+        elif line.startswith(BANDWIDTH_PREFIX):
+            self.header.bandwidth = _parse_value(line, BANDWIDTH_PREFIX, float) * 1_000_000
+        elif line.startswith(RTT_PREFIX):
+            self.header.rtt = _parse_value(line, RTT_PREFIX, float) / 1000
+        elif line.startswith(BDP_PREFIX):
+            self.header.bdp = _parse_value(line, BDP_PREFIX, int)
+        elif line.startswith(MAX_IN_FLIGHT_PACKETS_PREFIX):
+            self.header.max_in_flight_packets = _parse_value(line, MAX_IN_FLIGHT_PACKETS_PREFIX, int)
+        elif INTERNAL_ERROR_MARKER in line:
+            self.internal_error = line.rstrip('\r\n').rpartition(INTERNAL_ERROR_MARKER)[2]
+
+    def _parse_report(self, line: str):
+        # [client] second 0.100272: 1176812.438756 bit/s, bytes received: 14750 B, packets received: 20
+        fields = line.split()
+        try:
+            if len(fields) != 12:
+                raise ValueError('unexpected report format')
+            time = float(fields[2].rstrip(':'))
+            rate = float(fields[3])
+            bytes_received = int(fields[7])
+            packets_received = int(fields[11])
+        except ValueError:
+            match = _CLIENT_REPORT_PATTERN.match(line)
+            if not match:
+                return
+            time = float(match.group('time'))
+            rate = float(match.group('rate'))
+            bytes_received = int(match.group('bytes'))
+            packets_received = int(match.group('packets'))
+        if self.time_to_first_byte is None:
+            raise ValueError('report before time to first byte')
+        time += self.time_to_first_byte
+        if time <= self.max_s:
+            self._append_report(time, rate, bytes_received, packets_received)
+
+    def _append_report(self, time: float, download_rate: float, bytes_received: int, packets_received: int):
+        self.times.append(time)
+        self.download_rates.append(download_rate)
+        self.bytes_received.append(bytes_received)
+        self.packets_received.append(packets_received)
+
+
+def _parse_value(line: str, prefix: str, type):
+    """parse the first word after prefix"""
+    return type(line[len(prefix):].split(maxsplit=1)[0])
+
+
+def parse_qperf_log(file: str, add_zero_report: bool = True, max_s: float = float('inf')) -> QperfLogParser:
+    """file: qperf client output, gzip or zstd compressed if it ends with .gz or .zst"""
+    with span('parse_qperf_log', file=file) as s:
+        parser = QperfLogParser(add_zero_report=add_zero_report, max_s=max_s).feed(read_lines(file))
+        s.count(lines=parser.num_lines, reports=len(parser.times))
+        return parser
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+
+from qvis_qperf import render
+from qvis_qperf.profiling import profiler, span
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+STATE_FILE = './.pipeline_state.json'
+"""fingerprints of the last successful build of each target"""
+
+COMMON_INPUTS = ['./qvis_qperf']
+"""inputs of every target"""
+
+
+class Target:
+    """an output file and the function call that creates it"""
+    output: str
+    """figures are moved to the path of the render profile, see qvis_qperf.render"""
+    function: Callable
+    args: tuple
+    kwargs: dict
+    inputs: List[str]
+    """files and directories the output is created from,
+    the source file of function is added automatically"""
+
+    def __init__(self, output: str, function: Callable, *args, inputs: List[str] = (), **kwargs):
+        self.output = os.path.normpath(render.output_path(output))
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.inputs = list(map(os.path.normpath, inputs))
+        source = inspect.getsourcefile(function)
+        if source is not None:
+            self.inputs.append(os.path.relpath(source))
+
+    def run(self):
+        with span('target', output=self.output):
+            self.function(*self.args, **self.kwargs)
+        if 'matplotlib.pyplot' in sys.modules:
+            # workers render many figures
+            sys.modules['matplotlib.pyplot'].close('all')
+
+    def fingerprint(self, common_inputs: List[str] = COMMON_INPUTS) -> str:
+        """hash of the call parameters and the size and modification time of all inputs"""
+        digest = hashlib.sha256()
+        digest.update(f'{self.function.__module__}.{self.function.__qualname__}'.encode())
+        digest.update(repr((self.args, sorted(self.kwargs.items()))).encode())
+        for input in sorted(set(self.inputs + list(map(os.path.normpath, common_inputs)))):
+            for path, stat in _walk(input):
+                digest.update(f'{path}:{stat}'.encode())
+        return digest.hexdigest()
+
+    def __repr__(self) -> str:
+        return f'Target({self.output})'
+
+
+def _walk(path: str):
+    """(path, size and mtime) of path and all files below it,
+    hidden files and directories like caches are skipped"""
+    if not os.path.exists(path):
+        yield path, 'missing'
+        return
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        yield path, f'{stat.st_size}:{stat.st_mtime_ns}'
+        return
+    for dir, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d != '__pycache__')
+        for file in sorted(files):
+            if not file.startswith('.'):
+                yield from _walk(os.path.join(dir, file))
+
+
+def _run(target: Target) -> Tuple[float, List[dict]]:
+    """build time and the profiling spans of the build, runs in a worker process"""
+    profiler.reset()
+    start = time.time()
+    target.run()
+    return time.time() - start, profiler.to_json()
+
+
+class Pipeline:
+    targets: List[Target]
+    state_file: str
+    common_inputs: List[str]
+
+    def __init__(self, targets: List[Target] = (), state_file: str = STATE_FILE,
+                 common_inputs: List[str] = COMMON_INPUTS):
+        self.targets = []
+        self.state_file = state_file
+        self.common_inputs = common_inputs
+        for target in targets:
+            self.add(target)
+
+    def add(self, target: Target):
+        if any(map(lambda t: t.output == target.output, self.targets)):
+            raise ValueError(f'duplicate target {target.output}')
+        self.targets.append(target)
+
+    def dependencies(self, target: Target) -> List[Target]:
+        """targets that create an input of target"""
+        return [t for t in self.targets if t is not target and any(
+            map(lambda input: t.output == input or t.output.startswith(input + os.sep), target.inputs))]
+
+    def _load_state(self) -> Dict[str, str]:
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _store_state(self, state: Dict[str, str]):
+        with open(self.state_file, 'w') as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+
+    def is_up_to_date(self, target: Target, state: Dict[str, str]) -> bool:
+        return os.path.exists(target.output) and state.get(target.output) == target.fingerprint(self.common_inputs)
+
+    def build(self, workers: Optional[int] = None, force: bool = False, outputs: Optional[List[str]] = None) -> bool:
+        """build all targets whose inputs or parameters changed since their last build,
+        independent targets are built in parallel by workers processes\n
+        outputs: only build these targets, figures by the path of the script or of the render profile\n
+        returns False if a target failed"""
+        # scripts import this module for Target only
+        from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+        state = self._load_state()
+        targets = self.targets
+        if outputs is not None:
+            outputs = set(map(os.path.normpath, list(outputs) + list(map(render.output_path, outputs))))
+            targets = [t for t in targets if t.output in outputs]
+        dependencies = {t: [d for d in self.dependencies(t) if d in targets] for t in targets}
+        pending: Set[Target] = set(targets)
+        running: Dict[Future, Target] = {}
+        failed: Set[Target] = set()
+        fingerprints: Dict[Target, str] = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                for target in [t for t in targets if t in pending]:
+                    if any(map(lambda d: d in pending or d in running.values(), dependencies[target])):
+                        continue
+                    pending.remove(target)
+                    if any(map(lambda d: d in failed, dependencies[target])):
+                        failed.add(target)
+                        logging.error(f'skipped {target.output}, a dependency failed')
+                        continue
+                    fingerprints[target] = target.fingerprint(self.common_inputs)
+                    if not force and self.is_up_to_date(target, state):
+                        logging.info(f'up to date: {target.output}')
+                        continue
+                    running[executor.submit(_run, target)] = target
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    target = running.pop(future)
+                    try:
+                        elapsed, spans = future.result()
+                        profiler.add(spans)
+                        logging.info(f'built {target.output} in {elapsed:.1f}s')
+                        state[target.output] = fingerprints[target]
+                        self._store_state(state)
+                    except Exception as e:
+                        failed.add(target)
+                        logging.error(f'failed to build {target.output}: {e!r}')
+        return len(failed) == 0
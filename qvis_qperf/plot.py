@@ -1,58 +1,71 @@
-import time
-from typing import List, Optional
+"""plots of connections on matplotlib axes.\n
+matplotlib is imported by the plot functions on first use, importing this module only needs NumPy"""
+from __future__ import annotations
 
-import matplotlib
-import numpy as np
-from scipy import stats
+import logging
+import os
+import time
+from typing import List, Optional, TYPE_CHECKING
 
 from .aggregated_connection import AggregatedConnection
-from matplotlib.axes import Axes
-import matplotlib.transforms as transforms
-
+from .confidence import mean_confidence_interval
 from .connection import Connection, all_intersections
+from .downsample import downsample
+from .profiling import profiled, span
+from . import render
+from .stream import OnlineAggregatedConnection
 
-
-def mean_confidence_interval(data, confidence=0.95):
-    a = 1.0 * np.array(data)
-    n = len(a)
-    m, se = np.mean(a), stats.sem(a)
-    h = se * stats.t.ppf((1 + confidence) / 2., n-1)
-    return m, m-h, m+h
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
 
 
-def plot_rate(ax: Axes, connection: Connection | AggregatedConnection | List[Connection], color: str = '#0000ff',
+@profiled()
+def plot_rate(ax: Axes, connection: Connection | AggregatedConnection | OnlineAggregatedConnection | List[Connection],
+              color: str = '#0000ff',
               label: str | None = 'Rate', marker: str | None = None, linewidth: float = 1, alpha: float = 1,
-              markersize: float = 5, linestyle: str | None = 'solid'):
-    """chunk_interval in seconds"""
+              markersize: float = 5, linestyle: str | None = 'solid', max_points: Optional[int] = None,
+              downsampling: str = 'lttb'):
+    """chunk_interval in seconds\n
+    max_points: plot at most this many points of each connection, selected by the downsampling method,
+    see qvis_qperf.downsample"""
     start = time.time()
     if isinstance(connection, Connection):
-        seconds: List[int] = list(map(lambda r: r.time, connection.reports))
-        download_rates: List[float] = list(map(lambda r: r.download_rate, connection.reports))
-        ax.plot(seconds, download_rates, rasterized=True, label=label, color=color, marker=marker, linewidth=linewidth,
-                alpha=alpha, markersize=markersize, linestyle=linestyle)
-    elif isinstance(connection, AggregatedConnection):
+        times, download_rates = connection.times, connection.download_rates
+        if max_points is not None:
+            times, download_rates = downsample(times, download_rates, max_points, method=downsampling)
+        ax.plot(times, download_rates, rasterized=render.rasterized(len(times), True), label=label, color=color,
+                marker=marker, linewidth=linewidth, alpha=alpha, markersize=markersize, linestyle=linestyle)
+    elif isinstance(connection, (AggregatedConnection, OnlineAggregatedConnection)):
         plot_rate(ax, connection.to_avg_connection(), color=color, label=label, marker=marker, linewidth=linewidth,
-                  alpha=alpha, markersize=markersize, linestyle=linestyle)
+                  alpha=alpha, markersize=markersize, linestyle=linestyle, max_points=max_points,
+                  downsampling=downsampling)
     elif isinstance(connection, List):
         connections = connection
         for index, connection in enumerate(connections):
             if index == 0:
                 plot_rate(ax, connection, color=color, label=label, marker=marker, linewidth=linewidth, alpha=alpha,
-                          markersize=markersize, linestyle=linestyle)
+                          markersize=markersize, linestyle=linestyle, max_points=max_points,
+                          downsampling=downsampling)
             else:
                 plot_rate(ax, connection, color=color, label=None, marker=marker, linewidth=linewidth, alpha=alpha,
-                          markersize=markersize, linestyle=linestyle)
+                          markersize=markersize, linestyle=linestyle, max_points=max_points,
+                          downsampling=downsampling)
     else:
         raise "unsupported type"
-    print(f'plotted in {time.time() - start}s')
+    logging.debug(f'plotted in {time.time() - start}s')
 
 
-def plot_time_to_first_byte(ax: Axes, connection: Connection | AggregatedConnection, color: str = 'black',
+@profiled()
+def plot_time_to_first_byte(ax: Axes, connection: Connection | AggregatedConnection | OnlineAggregatedConnection,
+                            color: str = 'black',
                             label: Optional[str] = 'Time to first byte'):
+    import matplotlib.transforms as transforms
+
     ttfb: float  # in seconds
     if isinstance(connection, Connection):
         ttfb = connection.time_to_first_byte
-    elif isinstance(connection, AggregatedConnection):
+    elif isinstance(connection, (AggregatedConnection, OnlineAggregatedConnection)):
         ttfb = connection.time_to_first_byte
     else:
         raise "unsupported type"
@@ -60,25 +73,33 @@ def plot_time_to_first_byte(ax: Axes, connection: Connection | AggregatedConnect
                transform=transforms.offset_copy(ax.transData, fig=ax.figure, x=0, y=-2.5, units='points'))
 
 
-def plot_data_received(ax: Axes, connection: Connection | AggregatedConnection, color: Optional[str] = None,
+@profiled()
+def plot_data_received(ax: Axes, connection: Connection | AggregatedConnection | OnlineAggregatedConnection,
+                       color: Optional[str] = None,
                        label: Optional[str] = None, rasterized: bool = False, marker: Optional[str] = None,
-                       linewidth: float = 1, markersize: float = 5, linestyle: Optional[str] = 'solid'):
+                       linewidth: float = 1, markersize: float = 5, linestyle: Optional[str] = 'solid',
+                       max_points: Optional[int] = None, downsampling: str = 'lttb'):
+    """max_points: plot at most this many points, see plot_rate"""
     start = time.time()
     if isinstance(connection, Connection):
-        seconds: List[int] = list(map(lambda r: r.time, connection.reports))
-        bytes_received: List[float] = list(map(lambda r: r.bytes_received, connection.reports))
-        bytes_received = np.cumsum(bytes_received)
-        ax.plot(seconds, bytes_received, rasterized=rasterized, label=label, color=color, marker=marker,
-                linewidth=linewidth, markersize=markersize, linestyle=linestyle)
-    elif isinstance(connection, AggregatedConnection):
+        times, bytes_received = connection.times, connection.cumulative_bytes_received
+        if max_points is not None:
+            times, bytes_received = downsample(times, bytes_received, max_points, method=downsampling)
+        ax.plot(times, bytes_received, rasterized=render.rasterized(len(times), rasterized), label=label,
+                color=color, marker=marker, linewidth=linewidth, markersize=markersize, linestyle=linestyle)
+    elif isinstance(connection, (AggregatedConnection, OnlineAggregatedConnection)):
         plot_data_received(ax, connection.to_avg_connection(), rasterized=rasterized, label=label, color=color,
-                           marker=marker, linewidth=linewidth, markersize=markersize, linestyle=linestyle)
+                           marker=marker, linewidth=linewidth, markersize=markersize, linestyle=linestyle,
+                           max_points=max_points, downsampling=downsampling)
     else:
         raise "unsupported type"
-    print(f'plotted in {time.time() - start}s')
+    logging.debug(f'plotted in {time.time() - start}s')
 
 
+@profiled()
 def plot_data_received_intersection(ax: Axes, connections: List[Connection], colors: [str], label: str = 'Intersections', markersize=None):
+    import matplotlib.markers
+
     up_marker = matplotlib.markers.MarkerStyle(marker='|')
     up_marker._transform = up_marker.get_transform().rotate_deg(-20)
     down_marker = matplotlib.markers.MarkerStyle(marker='|')
@@ -95,13 +116,28 @@ def plot_data_received_intersection(ax: Axes, connections: List[Connection], col
         ax.plot(interception.time, interception.bytes_received, marker=up_marker, color = upper_color, markersize=markersize)
         ax.plot(interception.time, interception.bytes_received, marker=down_marker, color = lower_color, markersize=markersize)
 
+@profiled()
 def plot_bytes_at_second(ax: Axes, connections: List[List[Connection]], time: float, confidence: float = 0.95, x:List[str] = 'bytes', label:str='Received', color='black', transform=None):
     means = []
     lerrs = []
     uerrs = []
     for connections in connections:
-        mean, cil, ciu, = mean_confidence_interval(list(map(lambda c: c.total_received_bytes_at(time), connections)), confidence=confidence)
+        mean, cil, ciu, = mean_confidence_interval(AggregatedConnection(connections).total_bytes_at_times([time])[:, 0],
+                                                   confidence=confidence)
         means.append(mean)
         lerrs.append(abs(cil-mean))
         uerrs.append(abs(ciu-mean))
     ax.errorbar(x=x, y=means, yerr=[lerrs, uerrs], color=color, fmt='o', capsize=5, label=label, transform=transform)
+
+
+def save_figure(fig: Figure, output_path: str, **kwargs) -> str:
+    """fig.savefig with the format and dpi of the render profile, timed as a profiling span,
+    see qvis_qperf.render\n
+    returns the path the figure was saved to"""
+    output_path = render.output_path(output_path)
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with span('savefig', file=output_path):
+        fig.savefig(output_path, **render.savefig_kwargs(**kwargs))
+    return output_path
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+PROFILE_ENV = 'QVIS_QPERF_PROFILE'
+"""file to write the spans to at exit, enables profiling when set.
+files ending with .trace.json are written in Chrome trace event format, others as JSON"""
+
+PROFILE_MEMORY_ENV = 'QVIS_QPERF_PROFILE_MEMORY'
+"""set to 1 to record the tracemalloc peak of each span, slows everything down"""
+
+CHROME_TRACE_SUFFIX = '.trace.json'
+
+
+class Span:
+    """a timed stage, see span"""
+    name: str
+    start: float
+    """unix time in seconds"""
+    wall_s: float
+    cpu_s: float
+    """process time, includes other threads"""
+    counts: Dict[str, int]
+    """e.g. lines, reports, runs"""
+    attributes: Dict[str, str]
+    memory_peak: Optional[int]
+    """in bytes above the traced memory at the start of the span, None if memory is not traced"""
+    depth: int
+    recursive: bool
+    """a span of the same name encloses this one, e.g. plot_rate of a list of runs"""
+    pid: int
+    tid: int
+    _start_counter: float
+    _start_cpu: float
+    _start_memory: int
+    _peak: int
+    """highest traced memory seen before the last tracemalloc.reset_peak"""
+
+    def __init__(self, name: str, depth: int = 0, **attributes):
+        self.name = name
+        self.depth = depth
+        self.recursive = False
+        self.counts = {}
+        self.attributes = {key: str(value) for key, value in attributes.items()}
+        self.wall_s = 0
+        self.cpu_s = 0
+        self.memory_peak = None
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+
+    def count(self, **counts: int):
+        """add to the item counts of this span"""
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + int(value)
+
+    def set(self, **attributes):
+        for key, value in attributes.items():
+            self.attributes[key] = str(value)
+
+    def to_json(self) -> dict:
+        return {
+            'name': self.name,
+            'start': self.start,
+            'wall_s': self.wall_s,
+            'cpu_s': self.cpu_s,
+            'counts': self.counts,
+            'attributes': self.attributes,
+            'memory_peak': self.memory_peak,
+            'depth': self.depth,
+            'recursive': self.recursive,
+            'pid': self.pid,
+            'tid': self.tid,
+        }
+
+
+class _NoSpan:
+    """returned by span when profiling is disabled"""
+
+    def count(self, **counts: int):
+        pass
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self) -> _NoSpan:
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _ActiveSpan:
+    profiler: Profiler
+    span: Span
+
+    def __init__(self, profiler: Profiler, span: Span):
+        self.profiler = profiler
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.profiler._start(self.span)
+        return self.span
+
+    def __exit__(self, *exc):
+        self.profiler._end(self.span)
+        return False
+
+
+class Profiler:
+    enabled: bool
+    memory: bool
+    spans: List[Span]
+    """finished spans in the order they ended"""
+    _local: threading.local
+    _lock: threading.Lock
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.spans = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def enable(self, memory: bool = False):
+        self.enabled = True
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.memory = False
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+
+    def _stack(self) -> List[Span]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def span(self, name: str, **attributes) -> _ActiveSpan | _NoSpan:
+        if not self.enabled:
+            return _NO_SPAN
+        return _ActiveSpan(self, Span(name, depth=len(self._stack()), **attributes))
+
+    def _start(self, span: Span):
+        stack = self._stack()
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]._peak = max(stack[-1]._peak, peak)
+            tracemalloc.reset_peak()
+            span._start_memory = current
+            span._peak = current
+        span.recursive = any(map(lambda s: s.name == span.name, stack))
+        stack.append(span)
+        span.start = time.time()
+        span._start_cpu = time.process_time()
+        span._start_counter = time.perf_counter()
+
+    def _end(self, span: Span):
+        span.wall_s = time.perf_counter() - span._start_counter
+        span.cpu_s = time.process_time() - span._start_cpu
+        stack = self._stack()
+        stack.pop()
+        if self.memory:
+            peak = max(span._peak, tracemalloc.get_traced_memory()[1])
+            span.memory_peak = peak - span._start_memory
+            if stack:
+                stack[-1]._peak = max(stack[-1]._peak, peak)
+        with self._lock:
+            self.spans.append(span)
+
+    def add(self, spans: List[dict]):
+        """add spans exported by to_json of another profiler, e.g. of a worker process"""
+        for data in spans:
+            span = Span(data['name'], depth=data['depth'])
+            for key, value in data.items():
+                setattr(span, key, value)
+            with self._lock:
+                self.spans.append(span)
+
+    def to_json(self) -> List[dict]:
+        return list(map(lambda s: s.to_json(), self.spans))
+
+    def to_chrome_trace(self) -> dict:
+        """trace event format, open in chrome://tracing or ui.perfetto.dev"""
+        origin = min(map(lambda s: s.start, self.spans), default=0)
+        events = []
+        for span in sorted(self.spans, key=lambda s: s.start):
+            args = {'cpu_s': span.cpu_s, **span.counts, **span.attributes}
+            if span.memory_peak is not None:
+                args['memory_peak'] = span.memory_peak
+            events.append({
+                'name': span.name,
+                'cat': 'qvis_qperf',
+                'ph': 'X',
+                'ts': (span.start - origin) * 1_000_000,
+                'dur': span.wall_s * 1_000_000,
+                'pid': span.pid,
+                'tid': span.tid,
+                'args': args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, file: str):
+        """JSON, or Chrome trace event format if file ends with .trace.json"""
+        with open(file, 'w') as f:
+            if file.endswith(CHROME_TRACE_SUFFIX):
+                json.dump(self.to_chrome_trace(), f)
+            else:
+                json.dump({'spans': self.to_json()}, f, indent=1)
+
+    def summary(self) -> str:
+        """calls, wall and CPU time and counts per span name, slowest first,
+        recursive spans are counted as calls only"""
+        totals: Dict[str, dict] = {}
+        for span in self.spans:
+            total = totals.setdefault(span.name, {'calls': 0, 'wall_s': 0, 'cpu_s': 0, 'counts': {}})
+            total['calls'] += 1
+            if span.recursive:
+                continue
+            total['wall_s'] += span.wall_s
+            total['cpu_s'] += span.cpu_s
+            for key, value in span.counts.items():
+                total['counts'][key] = total['counts'].get(key, 0) + value
+        lines = []
+        for name, total in sorted(totals.items(), key=lambda t: -t[1]['wall_s']):
+            counts = ', '.join(f'{key}: {value}' for key, value in total['counts'].items())
+            lines.append(f'{name}: {total["calls"]} calls, {total["wall_s"]:.3f}s wall, {total["cpu_s"]:.3f}s cpu'
+                         + (f', {counts}' if counts else ''))
+        return '\n'.join(lines)
+
+
+profiler = Profiler()
+
+
+def span(name: str, **attributes) -> _ActiveSpan | _NoSpan:
+    """context manager timing a stage of the global profiler, a no-op unless profiling is enabled:\n
+    with span('parse_qperf_log', file=file) as s:
+        ...
+        s.count(lines=lines)"""
+    return profiler.span(name, **attributes)
+
+
+def profiled(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """decorator running each call of a function in a span, named like the function by default"""
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name or function.__name__):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _write_at_exit(file: str, pid: int):
+    # forked worker processes inherit the handler
+    if os.getpid() != pid or not profiler.spans:
+        return
+    profiler.write(file)
+    print(profiler.summary(), file=sys.stderr)
+    print(f'saved profile as {file}', file=sys.stderr)
+
+
+if os.environ.get(PROFILE_ENV):
+    profiler.enable(memory=os.environ.get(PROFILE_MEMORY_ENV, '') not in ('', '0'))
+    atexit.register(_write_at_exit, os.environ[PROFILE_ENV], os.getpid())
@@ -0,0 +1,518 @@
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+from typing import Callable, Dict, IO, Iterator, List, Optional
+
+import numpy as np
+
+from qvis_qperf.compressed import CHUNK_SIZE, open_binary, open_text
+from qvis_qperf.profiling import span
+
+QLOG_CACHE_DIR_NAME = '.qlog_cache'
+"""name of the directory created next to the qlog files for the columnar tables"""
+
+QLOG_CACHE_VERSION = 1
+"""increase when the table layout changes"""
+
+QLOG_INDEX_SPAN = 1 << 18
+"""uncompressed bytes of whole lines between two access points of a qlog index"""
+
+METRICS_UPDATED = 'recovery:metrics_updated'
+PACKET_SENT = 'transport:packet_sent'
+PACKET_RECEIVED = 'transport:packet_received'
+PACKET_LOST = 'recovery:packet_lost'
+STREAM_FRAMES = 'stream_frames'
+"""not a qlog event, one row per frame with stream_id, offset and length of sent and received packets"""
+
+METRICS_COLUMNS = ['min_rtt', 'smoothed_rtt', 'latest_rtt', 'rtt_variance', 'congestion_window', 'bytes_in_flight',
+                   'packets_in_flight']
+"""recovery:metrics_updated fields, NaN if an event does not update the field"""
+
+PACKET_TYPES = ['unknown', 'initial', 'handshake', '0RTT', '1RTT', 'retry', 'version_negotiation', 'stateless_reset']
+"""values of the packet_type column are indices into this list"""
+
+
+class QlogTable:
+    """columns of one event type, the time column is in milliseconds"""
+    name: str
+    columns: Dict[str, np.ndarray]
+
+    def __init__(self, name: str, columns: Dict[str, np.ndarray]):
+        self.name = name
+        self.columns = columns
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def __len__(self) -> int:
+        return len(self.columns['time'])
+
+    def __repr__(self) -> str:
+        return f'QlogTable({self.name}, {len(self)} rows, {list(self.columns)})'
+
+
+class QlogTrace:
+    """columnar tables of a qlog trace, see load_qlog"""
+    file: str
+    vantage_point: Optional[str]
+    reference_time: Optional[float]
+    """unix time in milliseconds of time 0"""
+    odcid: Optional[str]
+    strings: List[str]
+    """values of the connection id and frame type columns are indices into this list"""
+    tables: Dict[str, QlogTable]
+
+    def __init__(self, file: str, vantage_point: Optional[str], reference_time: Optional[float], odcid: Optional[str],
+                 strings: List[str], tables: Dict[str, QlogTable]):
+        self.file = file
+        self.vantage_point = vantage_point
+        self.reference_time = reference_time
+        self.odcid = odcid
+        self.strings = strings
+        self.tables = tables
+
+    def __getitem__(self, name: str) -> QlogTable:
+        return self.tables[name]
+
+    @property
+    def metrics_updated(self) -> QlogTable:
+        return self.tables[METRICS_UPDATED]
+
+    @property
+    def packets_sent(self) -> QlogTable:
+        return self.tables[PACKET_SENT]
+
+    @property
+    def packets_received(self) -> QlogTable:
+        return self.tables[PACKET_RECEIVED]
+
+    @property
+    def packets_lost(self) -> QlogTable:
+        return self.tables[PACKET_LOST]
+
+    @property
+    def stream_frames(self) -> QlogTable:
+        return self.tables[STREAM_FRAMES]
+
+    def string_code(self, value: str) -> int:
+        """code of value in the string columns, -1 if it does not occur in the trace"""
+        try:
+            return self.strings.index(value)
+        except ValueError:
+            return -1
+
+    def window(self, max_ms: float = float('inf'), shift_ms: float = 0, min_ms: float = float('-inf')) -> QlogTrace:
+        """trace with all times shifted by shift_ms, and only events between min_ms and max_ms after shifting\n
+        all columns except time are views of this trace's columns"""
+        tables = {}
+        for name, table in self.tables.items():
+            times = table['time']
+            start = np.searchsorted(times, min_ms - shift_ms, side='left')
+            end = np.searchsorted(times, max_ms - shift_ms, side='right')
+            columns = {column: values[start:end] for column, values in table.columns.items()}
+            if shift_ms != 0:
+                columns['time'] = columns['time'] + shift_ms
+            tables[name] = QlogTable(name, columns)
+        return QlogTrace(self.file, self.vantage_point, self.reference_time, self.odcid, self.strings, tables)
+
+
+class _TableBuilder:
+    dtypes: Dict[str, type]
+    values: Dict[str, list]
+
+    def __init__(self, dtypes: Dict[str, type]):
+        self.dtypes = dtypes
+        self.values = {column: [] for column in dtypes}
+
+    def append(self, *row):
+        for values, value in zip(self.values.values(), row):
+            values.append(value)
+
+    def build(self) -> Dict[str, np.ndarray]:
+        return {column: np.array(self.values[column], dtype=dtype) for column, dtype in self.dtypes.items()}
+
+
+_PACKET_DTYPES = {
+    'time': np.float64,
+    'packet_number': np.int64,
+    'packet_type': np.int8,
+    'dcid': np.int32,
+    'scid': np.int32,
+    'length': np.int64,
+    'payload_length': np.int64,
+    'stream_length': np.int64,
+}
+
+
+class _QlogParser:
+    strings: List[str]
+    _string_codes: Dict[str, int]
+    header: dict
+    tables: Dict[str, _TableBuilder]
+    handlers: Dict[str, Callable[[float, dict], None]]
+    errors: int
+
+    def __init__(self):
+        self.strings = []
+        self._string_codes = {}
+        self.header = {}
+        self.errors = 0
+        self.tables = {
+            METRICS_UPDATED: _TableBuilder({'time': np.float64, **{c: np.float64 for c in METRICS_COLUMNS}}),
+            PACKET_SENT: _TableBuilder(_PACKET_DTYPES),
+            PACKET_RECEIVED: _TableBuilder(_PACKET_DTYPES),
+            PACKET_LOST: _TableBuilder({'time': np.float64, 'packet_number': np.int64, 'packet_type': np.int8}),
+            STREAM_FRAMES: _TableBuilder({
+                'time': np.float64,
+                'sent': bool,
+                'packet_number': np.int64,
+                'frame_type': np.int32,
+                'stream_id': np.int64,
+                'offset': np.int64,
+                'length': np.int64,
+            }),
+        }
+        self.handlers = {
+            METRICS_UPDATED: self._metrics_updated,
+            PACKET_SENT: lambda time, data: self._packet(time, data, sent=True),
+            PACKET_RECEIVED: lambda time, data: self._packet(time, data, sent=False),
+            PACKET_LOST: self._packet_lost,
+        }
+
+    def _intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code = self._string_codes.get(value)
+        if code is None:
+            code = self._string_codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def feed(self, lines: Iterator[str]):
+        for line in lines:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # e.g. the last line of a trace that was not closed properly
+                if line.strip():
+                    self.errors += 1
+                continue
+            if 'qlog_format' in event:
+                self.header = event
+                continue
+            handler = self.handlers.get(event.get('name'))
+            if handler is not None:
+                handler(event['time'], event.get('data', {}))
+
+    def _metrics_updated(self, time: float, data: dict):
+        self.tables[METRICS_UPDATED].append(time, *map(lambda c: data.get(c, np.nan), METRICS_COLUMNS))
+
+    def _packet_type(self, header: dict) -> int:
+        try:
+            return PACKET_TYPES.index(header.get('packet_type'))
+        except ValueError:
+            return 0
+
+    def _packet(self, time: float, data: dict, sent: bool):
+        header = data.get('header', {})
+        raw = data.get('raw', {})
+        packet_number = header.get('packet_number', -1)
+        stream_length = 0
+        for frame in data.get('frames') or []:
+            if 'stream_id' in frame and 'offset' in frame and 'length' in frame:
+                self.tables[STREAM_FRAMES].append(time, sent, packet_number, self._intern(frame['frame_type']),
+                                                  frame['stream_id'], frame['offset'], frame['length'])
+                stream_length += frame['length']
+        self.tables[PACKET_SENT if sent else PACKET_RECEIVED].append(
+            time,
+            packet_number,
+            self._packet_type(header),
+            self._intern(header.get('dcid')),
+            self._intern(header.get('scid')),
+            raw.get('length', -1),
+            raw.get('payload_length', -1),
+            stream_length,
+        )
+
+    def _packet_lost(self, time: float, data: dict):
+        header = data.get('header', {})
+        self.tables[PACKET_LOST].append(time, header.get('packet_number', -1), self._packet_type(header))
+
+    def build(self, file: str) -> QlogTrace:
+        trace = self.header.get('trace', {})
+        common_fields = trace.get('common_fields', {})
+        tables = {}
+        for name, builder in self.tables.items():
+            columns = builder.build()
+            if np.any(np.diff(columns['time']) < 0):
+                order = np.argsort(columns['time'], kind='stable')
+                columns = {column: values[order] for column, values in columns.items()}
+            tables[name] = QlogTable(name, columns)
+        return QlogTrace(file, trace.get('vantage_point', {}).get('type'), common_fields.get('reference_time'),
+                         common_fields.get('ODCID'), self.strings, tables)
+
+
+def open_qlog(file: str) -> IO[str]:
+    """open a NDJSON qlog file for reading, gzip or zstd compressed if it ends with .gz or .zst"""
+    return open_text(file)
+
+
+def parse_qlog(file: str) -> QlogTrace:
+    """read a NDJSON qlog file into columnar tables"""
+    with span('parse_qlog', file=file) as s:
+        parser = _QlogParser()
+        with open_qlog(file) as f:
+            parser.feed(f)
+        if parser.errors > 0:
+            logging.warning(f'skipped {parser.errors} invalid lines in {file}')
+        trace = parser.build(file)
+        s.count(**{name.split(':')[-1]: len(table) for name, table in trace.tables.items()})
+        return trace
+
+
+def qlog_cache_path(file: str) -> str:
+    dir, name = os.path.split(os.path.abspath(file))
+    return os.path.join(dir, QLOG_CACHE_DIR_NAME, name)
+
+
+def _file_key(file: str) -> dict:
+    stat = os.stat(file)
+    return {
+        'version': QLOG_CACHE_VERSION,
+        'path': os.path.abspath(file),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+    }
+
+
+def _table_file_name(table: str, column: str) -> str:
+    return f'{table.replace(":", "_")}.{column}.npy'
+
+
+def store_qlog_tables(trace: QlogTrace):
+    path = qlog_cache_path(trace.file)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name, table in trace.tables.items():
+            for column, values in table.columns.items():
+                np.save(os.path.join(tmp_path, _table_file_name(name, column)), values)
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({
+                'key': _file_key(trace.file),
+                'vantage_point': trace.vantage_point,
+                'reference_time': trace.reference_time,
+                'odcid': trace.odcid,
+                'strings': trace.strings,
+                'tables': {name: list(table.columns) for name, table in trace.tables.items()},
+            }, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f'failed to write qlog tables {path}: {e}')
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def load_qlog_tables(file: str) -> Optional[QlogTrace]:
+    """memory map the stored tables of file,
+    or None if there are none or file changed since"""
+    path = qlog_cache_path(file)
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['key'] != _file_key(file):
+            return None
+        tables = {}
+        for name, columns in meta['tables'].items():
+            tables[name] = QlogTable(name, {
+                column: np.load(os.path.join(path, _table_file_name(name, column)), mmap_mode='r')
+                for column in columns
+            })
+    except (OSError, KeyError, ValueError):
+        return None
+    return QlogTrace(file, meta['vantage_point'], meta['reference_time'], meta['odcid'], meta['strings'], tables)
+
+
+# the first "time" field of each line, the event time. nested fields come after it in quic-go qlogs
+_TIME_PATTERN = re.compile(rb'^[^\n]*?"time":\s*(-?[0-9][0-9.eE+-]*)', re.MULTILINE)
+
+
+class QlogIndex:
+    """access points of a seekable copy of a qlog file, see build_qlog_index.\n
+    the copy is a gzip file of independently compressed members of QLOG_INDEX_SPAN bytes of whole lines each,
+    so a member can be inflated without the ones before it"""
+    file: str
+    path: str
+    """of the seekable copy"""
+    header: str
+    """first line of the trace, with the vantage point and reference time"""
+    offsets: np.ndarray
+    """members + 1, member i is at offsets[i]:offsets[i + 1] of path"""
+    min_times: np.ndarray
+    max_times: np.ndarray
+    """per member, event times in ms, NaN for members without events"""
+
+    def __init__(self, file: str, path: str, header: str, offsets: np.ndarray, min_times: np.ndarray,
+                 max_times: np.ndarray):
+        self.file = file
+        self.path = path
+        self.header = header
+        self.offsets = offsets
+        self.min_times = min_times
+        self.max_times = max_times
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __repr__(self) -> str:
+        return f'QlogIndex({self.file}, {len(self)} members)'
+
+    def members(self, min_ms: float = float('-inf'), max_ms: float = float('inf')) -> np.ndarray:
+        """indices of the members with events between min_ms and max_ms.\n
+        times are compared per member, so events slightly out of order are not missed"""
+        return np.flatnonzero((self.max_times >= min_ms) & (self.min_times <= max_ms))
+
+    def lines(self, min_ms: float = float('-inf'), max_ms: float = float('inf')) -> Iterator[str]:
+        """the header and all lines of the members with events between min_ms and max_ms,
+        the members before and after them are neither read nor inflated"""
+        yield self.header
+        members = self.members(min_ms, max_ms)
+        if len(members) == 0:
+            return
+        # consecutive members are read at once, gzip.decompress inflates concatenated members
+        breaks = np.flatnonzero(np.diff(members) != 1) + 1
+        with open(self.path, 'rb') as f:
+            for run in np.split(members, breaks):
+                start, end = self.offsets[run[0]], self.offsets[run[-1] + 1]
+                f.seek(start)
+                data = gzip.decompress(f.read(end - start))
+                yield from data.decode().split('\n')
+
+
+def qlog_index_path(file: str) -> str:
+    """of the seekable copy, the access points are stored in the same path with .json appended"""
+    return f'{qlog_cache_path(file)}.seekable.gz'
+
+
+def _member_times(data: bytes) -> tuple:
+    times = np.array(_TIME_PATTERN.findall(data), dtype=np.float64)
+    if len(times) == 0:
+        return float('nan'), float('nan')
+    return float(times.min()), float(times.max())
+
+
+def build_qlog_index(file: str, span_bytes: int = QLOG_INDEX_SPAN) -> QlogIndex:
+    """inflate file once and write a seekable copy with an access point every span_bytes next to it.\n
+    zlib in Python cannot resume inflating at the bit offset of a deflate block, like zran does in C,
+    so each access point starts a new gzip member instead, the copy is about as large as file"""
+    path = qlog_index_path(file)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    offsets, min_times, max_times = [0], [], []
+    with span('build_qlog_index', file=file) as s:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with open_binary(file) as source, open(tmp_path, 'wb') as target:
+                header = source.readline().decode().rstrip('\n')
+                member = b''
+                while True:
+                    chunk = source.read(CHUNK_SIZE)
+                    member += chunk
+                    while len(member) >= span_bytes or (not chunk and member):
+                        # members end with a line break, so lines never span two members
+                        split = member.rfind(b'\n', 0, span_bytes) + 1 or member.find(b'\n', span_bytes) + 1
+                        if split == 0:
+                            if chunk:
+                                # a line longer than span_bytes, it ends in a later chunk
+                                break
+                            split = len(member)
+                        data, member = member[:split], member[split:]
+                        target.write(gzip.compress(data, mtime=0))
+                        offsets.append(target.tell())
+                        min_time, max_time = _member_times(data)
+                        min_times.append(min_time)
+                        max_times.append(max_time)
+                    if not chunk:
+                        break
+            with open(f'{tmp_path}.json', 'w') as f:
+                json.dump({
+                    'key': _file_key(file),
+                    'header': header,
+                    'offsets': offsets,
+                    'min_times': min_times,
+                    'max_times': max_times,
+                }, f)
+            os.replace(tmp_path, path)
+            os.replace(f'{tmp_path}.json', f'{path}.json')
+        finally:
+            for tmp in (tmp_path, f'{tmp_path}.json'):
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        s.count(members=len(min_times), bytes=offsets[-1])
+    return QlogIndex(file, path, header, np.array(offsets, dtype=np.int64), np.array(min_times), np.array(max_times))
+
+
+def load_qlog_index(file: str, build: bool = True) -> Optional[QlogIndex]:
+    """the index of file, built if there is none or file changed since and build is set, None otherwise"""
+    path = qlog_index_path(file)
+    try:
+        with open(f'{path}.json') as f:
+            meta = json.load(f)
+        if meta['key'] == _file_key(file) and os.path.exists(path):
+            return QlogIndex(file, path, meta['header'], np.array(meta['offsets'], dtype=np.int64),
+                             np.array(meta['min_times'], dtype=np.float64),
+                             np.array(meta['max_times'], dtype=np.float64))
+    except (OSError, KeyError, ValueError):
+        pass
+    if not build:
+        return None
+    try:
+        return build_qlog_index(file)
+    except OSError as e:
+        logging.warning(f'failed to write qlog index {path}: {e}')
+        return None
+
+
+def read_qlog_window(file: str, min_ms: float = float('-inf'), max_ms: float = float('inf')) -> QlogTrace:
+    """columnar tables of the events of file between min_ms and max_ms,
+    inflating and parsing only the members of its index that overlap the window"""
+    index = load_qlog_index(file)
+    if index is None:
+        return parse_qlog(file).window(max_ms=max_ms, min_ms=min_ms)
+    with span('read_qlog_window', file=file) as s:
+        parser = _QlogParser()
+        parser.feed(index.lines(min_ms, max_ms))
+        if parser.errors > 0:
+            logging.warning(f'skipped {parser.errors} invalid lines in {file}')
+        trace = parser.build(file).window(max_ms=max_ms, min_ms=min_ms)
+        s.count(members=len(index.members(min_ms, max_ms)), total_members=len(index))
+        return trace
+
+
+def load_qlog(file: str, max_ms: float = float('inf'), shift_ms: float = 0, use_cache: bool = True,
+              min_ms: float = float('-inf'), use_index: bool = True) -> QlogTrace:
+    """columnar tables of a qlog file\n
+    the tables are stored next to the file on first load and memory mapped afterwards if use_cache is set.
+    if they are not stored, a window limited by max_ms or min_ms is read with the qlog index if use_index is set,
+    see read_qlog_window. shift_ms and max_ms are applied like in qvis read_qlog"""
+    trace = None
+    bounded = max_ms != float('inf') or min_ms != float('-inf')
+    with span('load_qlog', file=file) as s:
+        if use_cache:
+            trace = load_qlog_tables(file)
+        s.set(cache='hit' if trace is not None else 'miss' if use_cache else 'off')
+        if trace is None and bounded and use_index:
+            s.set(cache='index')
+            return read_qlog_window(file, min_ms - shift_ms, max_ms - shift_ms).window(shift_ms=shift_ms)
+        if trace is None:
+            trace = parse_qlog(file)
+            if use_cache:
+                store_qlog_tables(trace)
+    if not bounded and shift_ms == 0:
+        return trace
+    return trace.window(max_ms=max_ms, shift_ms=shift_ms, min_ms=min_ms)
@@ -0,0 +1,101 @@
+"""render profiles, how figures are typeset and saved.\n
+the publication profile keeps the LaTeX typeset PDFs of the scripts, the draft profile renders
+with mathtext to low resolution PNGs next to them in a draft directory, which takes seconds instead of minutes.
+matplotlib caches the LaTeX output of each text in its texcache directory on disk, so the labels repeated across
+figures and builds are typeset once"""
+from __future__ import annotations
+
+import os
+from typing import Dict, Optional
+
+RENDER_PROFILE_ENV = 'QVIS_QPERF_RENDER_PROFILE'
+"""name of the render profile, publication if not set"""
+
+FIGURE_EXTENSIONS = ['.pdf', '.png', '.svg', '.pgf', '.eps']
+"""outputs with these extensions are figures, the render profile decides their format"""
+
+
+class RenderProfile:
+    name: str
+    usetex: bool
+    """typeset text with LaTeX instead of mathtext"""
+    dpi: Optional[int]
+    """None keeps the dpi of the script"""
+    format: Optional[str]
+    """file extension of figures, None keeps the one of the script"""
+    directory: Optional[str]
+    """subdirectory of the output directory figures are saved to, None saves them in place"""
+    rasterize_points: Optional[int]
+    """series with at least this many points are rasterized, None keeps the choice of the script"""
+
+    def __init__(self, name: str, usetex: bool, dpi: Optional[int] = None, format: Optional[str] = None,
+                 directory: Optional[str] = None, rasterize_points: Optional[int] = None):
+        self.name = name
+        self.usetex = usetex
+        self.dpi = dpi
+        self.format = format
+        self.directory = directory
+        self.rasterize_points = rasterize_points
+
+    def __repr__(self) -> str:
+        return f'RenderProfile({self.name})'
+
+
+PUBLICATION = RenderProfile('publication', usetex=True)
+DRAFT = RenderProfile('draft', usetex=False, dpi=100, format='.png', directory='draft', rasterize_points=1000)
+
+PROFILES: Dict[str, RenderProfile] = {
+    PUBLICATION.name: PUBLICATION,
+    DRAFT.name: DRAFT,
+}
+
+
+def profile() -> RenderProfile:
+    """the render profile selected by RENDER_PROFILE_ENV"""
+    name = os.environ.get(RENDER_PROFILE_ENV, PUBLICATION.name)
+    if name not in PROFILES:
+        raise ValueError(f'unknown render profile {name}, one of {", ".join(PROFILES)}')
+    return PROFILES[name]
+
+
+def set_profile(name: str):
+    """select a render profile for this process and the worker processes it starts"""
+    if name not in PROFILES:
+        raise ValueError(f'unknown render profile {name}, one of {", ".join(PROFILES)}')
+    os.environ[RENDER_PROFILE_ENV] = name
+
+
+def output_path(path: str) -> str:
+    """path a figure is saved to with the current profile, other outputs are not moved"""
+    current = profile()
+    base, extension = os.path.splitext(path)
+    if extension not in FIGURE_EXTENSIONS:
+        return path
+    if current.directory is not None:
+        base = os.path.join(os.path.dirname(base), current.directory, os.path.basename(base))
+    return base + (current.format or extension)
+
+
+def rc_params(params: dict) -> dict:
+    """matplotlib rcParams of a script adapted to the current profile,
+    use as plt.rcParams.update(rc_params({...}))"""
+    current = profile()
+    params = dict(params)
+    params['text.usetex'] = current.usetex
+    return params
+
+
+def rasterized(num_points: int, default: bool) -> bool:
+    """whether a series of num_points points is rasterized, default is the choice of the caller"""
+    threshold = profile().rasterize_points
+    if threshold is None:
+        return default
+    return default or num_points >= threshold
+
+
+def savefig_kwargs(**kwargs) -> dict:
+    """keyword arguments of Figure.savefig adapted to the current profile"""
+    current = profile()
+    if current.dpi is not None:
+        kwargs['dpi'] = current.dpi
+    return kwargs
@@ -1,3 +1,10 @@
+from __future__ import annotations
+
+from typing import Iterator, List, Sequence, overload
+
+import numpy as np
+
+
 class Report:
     time: float
     """in seconds"""
@@ -11,3 +18,44 @@ class Report:
         self.download_rate = download_rate
         self.bytes_received = bytes_received
         self.packets_received = packets_received
+
+
+class ReportsView(Sequence[Report]):
+    """read-only list-like view over report columns,
+    Report objects are only created when accessed"""
+    times: np.ndarray
+    download_rates: np.ndarray
+    bytes_received: np.ndarray
+    packets_received: np.ndarray
+
+    def __init__(self, times: np.ndarray, download_rates: np.ndarray, bytes_received: np.ndarray,
+                 packets_received: np.ndarray):
+        self.times = times
+        self.download_rates = download_rates
+        self.bytes_received = bytes_received
+        self.packets_received = packets_received
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @overload
+    def __getitem__(self, index: int) -> Report:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Report]:
+        ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return Report(
+            float(self.times[index]),
+            float(self.download_rates[index]),
+            int(self.bytes_received[index]),
+            int(self.packets_received[index]),
+        )
+
+    def __iter__(self) -> Iterator[Report]:
+        for index in range(len(self)):
+            yield self[index]
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from typing import List, Optional
+
+import numpy as np
+
+from qvis_qperf.connection import Connection
+
+DEFAULT_RESOLUTION = 0.1
+"""in seconds, the report interval of qperf"""
+
+
+def time_grid(connections: Connection | List[Connection], resolution: float = DEFAULT_RESOLUTION,
+              start: float = 0, end: Optional[float] = None) -> np.ndarray:
+    """evenly spaced times in seconds from start to end,
+    end defaults to the last report of all connections"""
+    if isinstance(connections, Connection):
+        connections = [connections]
+    if end is None:
+        end = max(map(lambda c: c.max_time, connections))
+    return start + np.arange(int(np.floor((end - start) / resolution + 1e-9)) + 1) * resolution
+
+
+def resample_rates(connections: List[Connection], grid: np.ndarray) -> np.ndarray:
+    """download rates of all connections at the grid times, runs x grid\n
+    step semantics: each report's rate holds for the interval it was measured over,
+    which ends at the report time. the rate is 0 after the last report"""
+    matrix = np.zeros((len(connections), len(grid)))
+    for row, connection in zip(matrix, connections):
+        indices = np.searchsorted(connection.times, grid, side='left')
+        valid = indices < len(connection.times)
+        row[valid] = connection.download_rates[indices[valid]]
+    return matrix
+
+
+def _resample_cumulative(times: np.ndarray, cumulative: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """linear interpolation, 0 before the first and the total after the last report"""
+    if len(times) == 0:
+        return np.zeros(len(grid))
+    return np.interp(grid, times, cumulative, left=0, right=cumulative[-1])
+
+
+def resample_cumulative_bytes(connections: List[Connection], grid: np.ndarray) -> np.ndarray:
+    """total received bytes of all connections at the grid times, linearly interpolated, runs x grid"""
+    matrix = np.empty((len(connections), len(grid)))
+    for row, connection in zip(matrix, connections):
+        row[:] = _resample_cumulative(connection.times, connection.cumulative_bytes_received, grid)
+    return matrix
+
+
+def resample_cumulative_packets(connections: List[Connection], grid: np.ndarray) -> np.ndarray:
+    """total received packets of all connections at the grid times, linearly interpolated, runs x grid"""
+    matrix = np.empty((len(connections), len(grid)))
+    for row, connection in zip(matrix, connections):
+        row[:] = _resample_cumulative(connection.times, np.cumsum(connection.packets_received), grid)
+    return matrix
+
+
+def _to_connections(connections: List[Connection], grid: np.ndarray) -> List[Connection]:
+    rates = resample_rates(connections, grid)
+    total_bytes = np.rint(resample_cumulative_bytes(connections, grid)).astype(np.int64)
+    total_packets = np.rint(resample_cumulative_packets(connections, grid)).astype(np.int64)
+    return [Connection.from_arrays(
+        grid,
+        rates[index],
+        np.diff(total_bytes[index], prepend=0),
+        np.diff(total_packets[index], prepend=0),
+        establishment_time=connection.establishment_time,
+        time_to_first_byte=connection.time_to_first_byte,
+        internal_error=connection.internal_error,
+        header=connection.header,
+    ) for index, connection in enumerate(connections)]
+
+
+def resample(connection: Connection | List[Connection], resolution: float = DEFAULT_RESOLUTION, start: float = 0,
+             end: Optional[float] = None, grid: Optional[np.ndarray] = None) -> Connection | List[Connection]:
+    """project connections onto a shared time grid,
+    see resample_rates and resample_cumulative_bytes for the semantics.\n
+    grid defaults to time_grid(connection, resolution, start, end)"""
+    if grid is None:
+        grid = time_grid(connection, resolution=resolution, start=start, end=end)
+    if isinstance(connection, List):
+        return _to_connections(connection, grid)
+    return _to_connections([connection], grid)[0]
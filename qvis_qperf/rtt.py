@@ -0,0 +1,274 @@
+"""RTT statistics of qlog traces per time window and vantage point, with mergeable quantile sketches.\n
+the recovery:metrics_updated samples of a trace are consumed in chunks, from the stored qlog tables
+if there are any, otherwise from the lines of the file, so memory does not grow with the length of a trace.
+the sketches of the same window and vantage point of several runs merge exactly"""
+from __future__ import annotations
+
+import json
+import math
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from qvis_qperf.compressed import read_lines
+from qvis_qperf.profiling import span
+from qvis_qperf.qlog import METRICS_UPDATED, load_qlog_tables
+
+RTT_METRICS = ['latest_rtt', 'smoothed_rtt', 'rtt_variance']
+"""recovery:metrics_updated fields, in ms"""
+
+POSITIVE_METRICS = ['latest_rtt', 'smoothed_rtt']
+"""values <= 0 of these metrics are logged before the first RTT sample and skipped"""
+
+QUANTILES = [0.5, 0.9, 0.99]
+
+RELATIVE_ACCURACY = 0.01
+"""of the quantiles of QuantileSketch"""
+
+WINDOW_MS = 1000
+
+CHUNK_SIZE = 1 << 14
+"""samples per chunk, see metrics_chunks"""
+
+
+class QuantileSketch:
+    """quantiles with a relative error of at most relative_accuracy, like DDSketch.\n
+    values are counted in buckets of exponentially growing width, so the size depends on the range of the values
+    and not on their number, and two sketches with the same relative_accuracy merge by adding their counts"""
+    relative_accuracy: float
+    count: int
+    zero_count: int
+    """values <= 0"""
+    min: float
+    max: float
+    _gamma: float
+    _offset: int
+    """bucket index of _counts[0]"""
+    _counts: np.ndarray
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.count = 0
+        self.zero_count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._offset = 0
+        self._counts = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __repr__(self) -> str:
+        return f'QuantileSketch({self.count} values, {len(self._counts)} buckets)'
+
+    def _grow(self, first: int, last: int):
+        """make room for the bucket indices first to last"""
+        if len(self._counts) == 0:
+            self._offset = first
+            self._counts = np.zeros(last - first + 1, dtype=np.int64)
+            return
+        start = min(first, self._offset)
+        end = max(last, self._offset + len(self._counts) - 1)
+        if start == self._offset and end == self._offset + len(self._counts) - 1:
+            return
+        counts = np.zeros(end - start + 1, dtype=np.int64)
+        counts[self._offset - start:self._offset - start + len(self._counts)] = self._counts
+        self._offset = start
+        self._counts = counts
+
+    def add(self, values: np.ndarray):
+        """add all values, NaN values are skipped"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values[values > 0]
+        self.zero_count += len(values) - len(positive)
+        if len(positive) == 0:
+            return
+        indices = np.ceil(np.log(positive) / math.log(self._gamma)).astype(np.int64)
+        first, last = int(indices.min()), int(indices.max())
+        self._grow(first, last)
+        self._counts[first - self._offset:last - self._offset + 1] += np.bincount(indices - first)
+
+    def merge(self, other: QuantileSketch):
+        """add the values of other, which must have the same relative_accuracy"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError(f'cannot merge sketches with relative accuracy {other.relative_accuracy} '
+                             f'and {self.relative_accuracy}')
+        if other.count == 0:
+            return
+        self.count += other.count
+        self.zero_count += other.zero_count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(other._counts) == 0:
+            return
+        first, last = other._offset, other._offset + len(other._counts) - 1
+        self._grow(first, last)
+        self._counts[first - self._offset:last - self._offset + 1] += other._counts
+
+    def quantile(self, q: float) -> float:
+        """value at quantile q in [0, 1], NaN if the sketch is empty"""
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0 if self.min <= 0 else self.min
+        index = int(np.searchsorted(np.cumsum(self._counts), rank - self.zero_count, side='right'))
+        index = min(index, len(self._counts) - 1)
+        # midpoint of the bucket in relative terms
+        value = 2 * self._gamma ** (index + self._offset) / (self._gamma + 1)
+        return min(max(value, self.min), self.max)
+
+    def summary(self) -> Dict[str, float]:
+        """p50, p90, p99 and max"""
+        return {**{f'p{round(q * 100)}': self.quantile(q) for q in QUANTILES},
+                'max': self.max if self.count > 0 else math.nan}
+
+
+class RttStatistics:
+    """a QuantileSketch per vantage point, RTT metric and time window, see add_file"""
+    window_ms: float
+    relative_accuracy: float
+    sketches: Dict[str, Dict[str, Dict[int, QuantileSketch]]]
+    """vantage point, metric, index of the window"""
+
+    def __init__(self, window_ms: float = WINDOW_MS, relative_accuracy: float = RELATIVE_ACCURACY):
+        self.window_ms = window_ms
+        self.relative_accuracy = relative_accuracy
+        self.sketches = {}
+
+    def __repr__(self) -> str:
+        return f'RttStatistics({self.window_ms} ms windows, vantage points {self.vantage_points})'
+
+    @property
+    def vantage_points(self) -> List[str]:
+        return sorted(self.sketches)
+
+    def _sketch(self, vantage_point: str, metric: str, window: int) -> QuantileSketch:
+        windows = self.sketches.setdefault(vantage_point, {}).setdefault(metric, {})
+        sketch = windows.get(window)
+        if sketch is None:
+            sketch = windows[window] = QuantileSketch(self.relative_accuracy)
+        return sketch
+
+    def add(self, vantage_point: str, times: np.ndarray, metrics: Dict[str, np.ndarray]):
+        """add samples at times in ms, metrics maps RTT_METRICS to values in ms, NaN for missing values"""
+        windows = np.floor(np.asarray(times) / self.window_ms).astype(np.int64)
+        order = np.argsort(windows, kind='stable')
+        windows = windows[order]
+        starts = np.flatnonzero(np.diff(windows, prepend=windows[:1] - 1))
+        ends = np.append(starts[1:], len(windows))
+        for metric, values in metrics.items():
+            values = np.asarray(values, dtype=np.float64)[order]
+            if metric in POSITIVE_METRICS:
+                values = np.where(values > 0, values, np.nan)
+            for start, end in zip(starts, ends):
+                if not np.all(np.isnan(values[start:end])):
+                    self._sketch(vantage_point, metric, int(windows[start])).add(values[start:end])
+
+    def add_file(self, file: str, shift_ms: float = 0, chunk_size: int = CHUNK_SIZE):
+        """add the RTT samples of a qlog file, with times shifted by shift_ms"""
+        with span('rtt_statistics', file=file) as s:
+            samples = 0
+            for vantage_point, times, metrics in metrics_chunks(file, chunk_size):
+                self.add(vantage_point, times + shift_ms, metrics)
+                samples += len(times)
+            s.count(samples=samples)
+
+    def merge(self, other: RttStatistics):
+        """add the sketches of other, e.g. of another run, which must have the same window_ms"""
+        if other.window_ms != self.window_ms:
+            raise ValueError(f'cannot merge windows of {other.window_ms} ms and {self.window_ms} ms')
+        for vantage_point, metrics in other.sketches.items():
+            for metric, windows in metrics.items():
+                for window, sketch in windows.items():
+                    self._sketch(vantage_point, metric, window).merge(sketch)
+
+    def overall(self, vantage_point: str, metric: str = 'latest_rtt') -> QuantileSketch:
+        """the sketches of all windows merged"""
+        sketch = QuantileSketch(self.relative_accuracy)
+        for window in self.sketches.get(vantage_point, {}).get(metric, {}).values():
+            sketch.merge(window)
+        return sketch
+
+    def series(self, vantage_point: str, metric: str = 'smoothed_rtt',
+               q: Optional[float] = 0.5) -> Tuple[np.ndarray, np.ndarray]:
+        """start of each window with samples in s and the quantile q of metric in it, the maximum if q is None"""
+        windows = self.sketches.get(vantage_point, {}).get(metric, {})
+        indices = np.array(sorted(windows), dtype=np.int64)
+        values = np.array(list(map(lambda i: windows[i].max if q is None else windows[i].quantile(q), indices)),
+                          dtype=np.float64)
+        return indices * self.window_ms / 1000, values
+
+    def base_rtt(self, vantage_point: str) -> float:
+        """smallest latest_rtt of vantage_point in ms, NaN if there is none"""
+        sketch = self.overall(vantage_point, 'latest_rtt')
+        return sketch.min if sketch.count > 0 else math.nan
+
+    def inflation(self, vantage_point: str, metric: str = 'smoothed_rtt', q: Optional[float] = 0.5,
+                  base_rtt_ms: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """series of metric divided by base_rtt_ms, the base_rtt of vantage_point if None"""
+        times, values = self.series(vantage_point, metric, q)
+        return times, values / (self.base_rtt(vantage_point) if base_rtt_ms is None else base_rtt_ms)
+
+
+def _table_chunks(table, chunk_size: int) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+    for start in range(0, len(table), chunk_size):
+        yield np.asarray(table['time'][start:start + chunk_size]), {
+            metric: np.asarray(table[metric][start:start + chunk_size]) for metric in RTT_METRICS}
+
+
+def _line_chunks(lines: Iterator[str], chunk_size: int) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+    times: List[float] = []
+    values: Dict[str, List[float]] = {metric: [] for metric in RTT_METRICS}
+    for line in lines:
+        # most lines are packets, the event name is checked before the line is decoded
+        if METRICS_UPDATED not in line:
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        if event.get('name') != METRICS_UPDATED:
+            continue
+        data = event.get('data', {})
+        times.append(event['time'])
+        for metric in RTT_METRICS:
+            values[metric].append(data.get(metric, np.nan))
+        if len(times) >= chunk_size:
+            yield np.array(times), {metric: np.array(v, dtype=np.float64) for metric, v in values.items()}
+            times = []
+            values = {metric: [] for metric in RTT_METRICS}
+    if times:
+        yield np.array(times), {metric: np.array(v, dtype=np.float64) for metric, v in values.items()}
+
+
+def metrics_chunks(file: str, chunk_size: int = CHUNK_SIZE) \
+        -> Iterator[Tuple[str, np.ndarray, Dict[str, np.ndarray]]]:
+    """vantage point, times in ms and RTT_METRICS of at most chunk_size recovery:metrics_updated events at a time"""
+    trace = load_qlog_tables(file)
+    if trace is not None:
+        vantage_point = trace.vantage_point or 'unknown'
+        for times, metrics in _table_chunks(trace.metrics_updated, chunk_size):
+            yield vantage_point, times, metrics
+        return
+    lines = read_lines(file)
+    header = json.loads(next(lines, '{}') or '{}')
+    vantage_point = header.get('trace', {}).get('vantage_point', {}).get('type') or 'unknown'
+    for times, metrics in _line_chunks(lines, chunk_size):
+        yield vantage_point, times, metrics
+
+
+def rtt_statistics(files: List[str], window_ms: float = WINDOW_MS,
+                   relative_accuracy: float = RELATIVE_ACCURACY) -> RttStatistics:
+    """RTT statistics of several runs, merged per vantage point and window"""
+    statistics = RttStatistics(window_ms, relative_accuracy)
+    for file in files:
+        statistics.add_file(file)
+    return statistics
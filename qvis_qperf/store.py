@@ -0,0 +1,243 @@
+"""all parsed qperf runs of a data directory in one columnar store.\n
+the report columns of all runs are concatenated to flat arrays, offsets holds the first report of each run,
+and a metadata table holds one row per run. readers memory map the arrays,
+connections are views into them, so processes share the page cache and nothing is parsed or copied.
+
+export with: python -m qvis_qperf.store [--root ./data] [--output ./data/.qperf_store]"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from qvis_qperf.aggregated_connection import AggregatedConnection
+from qvis_qperf.cache import HEADER_FIELDS
+from qvis_qperf.catalog import Catalog, NO_PEP
+from qvis_qperf.connection import Connection, connection_files
+from qvis_qperf.parser import QperfHeader
+from qvis_qperf.profiling import span
+
+STORE_PATH = './data/.qperf_store'
+
+STORE_VERSION = 1
+"""increase when the layout changes"""
+
+COLUMNS = ['times', 'download_rates', 'bytes_received', 'packets_received', 'cumulative_bytes_received']
+"""flat report columns"""
+
+RUN_COLUMNS = ['rtt_ms', 'run_id', 'time_to_first_byte', 'establishment_time']
+"""numeric metadata columns, one row per run, missing values are NaN or -1"""
+
+
+class RunStore:
+    """memory mapped runs, see export_store and load_store"""
+    path: str
+    root: str
+    """data directory the runs were exported from"""
+    add_zero_report: bool
+    columns: Dict[str, np.ndarray]
+    offsets: np.ndarray
+    """runs + 1, reports of run i are offsets[i]:offsets[i + 1]"""
+    runs: Dict[str, np.ndarray]
+    """RUN_COLUMNS"""
+    variants: List[str]
+    """per run"""
+    files: List[str]
+    """per run, relative to root"""
+    internal_errors: List[Optional[str]]
+    headers: List[Optional[dict]]
+    fingerprint: str
+    """of the files the runs were parsed from, see files_fingerprint"""
+
+    def __init__(self, path: str, root: str, add_zero_report: bool, columns: Dict[str, np.ndarray],
+                 offsets: np.ndarray, runs: Dict[str, np.ndarray], variants: List[str], files: List[str],
+                 internal_errors: List[Optional[str]], headers: List[Optional[dict]], fingerprint: str):
+        self.path = path
+        self.root = root
+        self.add_zero_report = add_zero_report
+        self.columns = columns
+        self.offsets = offsets
+        self.runs = runs
+        self.variants = variants
+        self.files = files
+        self.internal_errors = internal_errors
+        self.headers = headers
+        self.fingerprint = fingerprint
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __repr__(self) -> str:
+        return f'RunStore({self.path}, {len(self)} runs, {len(self.columns["times"])} reports)'
+
+    def select(self, rtt_ms: Optional[int] = None, variant: Optional[str] = None) -> np.ndarray:
+        """indices of the runs matching all given arguments, None matches any, in file name order"""
+        mask = np.ones(len(self), dtype=bool)
+        if rtt_ms is not None:
+            mask &= self.runs['rtt_ms'] == rtt_ms
+        if variant is not None:
+            mask &= np.array(list(map(lambda v: v == variant, self.variants)), dtype=bool)
+        return np.flatnonzero(mask)
+
+    def connection(self, index: int) -> Connection:
+        """run index, its columns are views of the memory mapped arrays"""
+        window = slice(self.offsets[index], self.offsets[index + 1])
+        establishment_time = float(self.runs['establishment_time'][index])
+        return Connection.from_arrays(
+            *(self.columns[column][window] for column in COLUMNS[:4]),
+            establishment_time=None if np.isnan(establishment_time) else establishment_time,
+            time_to_first_byte=float(self.runs['time_to_first_byte'][index]),
+            internal_error=self.internal_errors[index],
+            header=_header(self.headers[index]),
+            cumulative_bytes_received=self.columns['cumulative_bytes_received'][window],
+        )
+
+    def connections(self, rtt_ms: Optional[int] = None, variant: Optional[str] = NO_PEP) -> List[Connection]:
+        """runs of a scenario, like load_all_connections of its qperf directory"""
+        return list(map(self.connection, self.select(rtt_ms, variant)))
+
+    def aggregated(self, rtt_ms: int, variant: str = NO_PEP) -> AggregatedConnection:
+        return AggregatedConnection(self.connections(rtt_ms, variant))
+
+    def contains(self, rtt_ms: int, variant: str = NO_PEP) -> bool:
+        return len(self.select(rtt_ms, variant)) > 0
+
+    def is_up_to_date(self) -> bool:
+        """False if a qperf log was added, removed or changed since the export"""
+        return files_fingerprint(Catalog(self.root)) == self.fingerprint
+
+
+def _header(entry: Optional[dict]) -> Optional[QperfHeader]:
+    if entry is None:
+        return None
+    return QperfHeader(**entry)
+
+
+def _header_entry(header: Optional[QperfHeader]) -> Optional[dict]:
+    if header is None:
+        return None
+    return {field: getattr(header, field) for field in HEADER_FIELDS}
+
+
+def _run_id(file: str) -> int:
+    """17 for 17.log, -1 for names that are not a number"""
+    name = os.path.basename(file).split('.')[0]
+    return int(name) if name.isdigit() else -1
+
+
+def _qperf_files(catalog: Catalog) -> List[str]:
+    return [file for scenario in catalog.select(artifact='qperf') for file in connection_files(scenario.path)]
+
+
+def files_fingerprint(catalog: Catalog) -> str:
+    """hash of the names, sizes and modification times of all qperf logs of catalog"""
+    digest = hashlib.sha256()
+    for file in _qperf_files(catalog):
+        stat = os.stat(file)
+        digest.update(f'{os.path.relpath(file, catalog.root)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return digest.hexdigest()
+
+
+def export_store(root: str = './data', path: str = STORE_PATH, add_zero_report: bool = True,
+                 workers: Optional[int] = None) -> RunStore:
+    """parse all qperf runs of root, with the parse cache, and write them to a store at path"""
+    catalog = Catalog(root, cache_size=1, workers=workers)
+    with span('export_store', path=path) as s:
+        fingerprint = files_fingerprint(catalog)
+        parts: Dict[str, List[np.ndarray]] = {column: [] for column in COLUMNS}
+        lengths = []
+        runs: Dict[str, list] = {column: [] for column in RUN_COLUMNS}
+        variants, files, internal_errors, headers = [], [], [], []
+        for scenario in catalog.select(artifact='qperf'):
+            scenario_files = connection_files(scenario.path)
+            connections = catalog.connections(scenario, add_zero_report=add_zero_report)
+            for file, connection in zip(scenario_files, connections):
+                for column in COLUMNS:
+                    parts[column].append(getattr(connection, column))
+                lengths.append(len(connection.times))
+                runs['rtt_ms'].append(scenario.rtt_ms)
+                runs['run_id'].append(_run_id(file))
+                runs['time_to_first_byte'].append(getattr(connection, 'time_to_first_byte', np.nan))
+                establishment_time = getattr(connection, 'establishment_time', None)
+                runs['establishment_time'].append(np.nan if establishment_time is None else establishment_time)
+                variants.append(scenario.variant)
+                files.append(os.path.relpath(file, root))
+                internal_errors.append(connection.internal_error)
+                headers.append(_header_entry(connection.header))
+            catalog.clear()
+        s.count(runs=len(lengths), reports=int(sum(lengths)))
+
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        try:
+            for column in COLUMNS:
+                dtype = np.float64 if column in ('times', 'download_rates') else np.int64
+                values = np.concatenate(parts[column]) if parts[column] else np.empty(0)
+                np.save(os.path.join(tmp_path, f'{column}.npy'), values.astype(dtype, copy=False))
+            np.save(os.path.join(tmp_path, 'offsets.npy'), np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))))
+            for column in RUN_COLUMNS:
+                dtype = np.int64 if column in ('rtt_ms', 'run_id') else np.float64
+                np.save(os.path.join(tmp_path, f'run_{column}.npy'), np.array(runs[column], dtype=dtype))
+            with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+                json.dump({
+                    'version': STORE_VERSION,
+                    'root': os.path.abspath(root),
+                    'add_zero_report': add_zero_report,
+                    'fingerprint': fingerprint,
+                    'variants': variants,
+                    'files': files,
+                    'internal_errors': internal_errors,
+                    'headers': headers,
+                }, f)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp_path, path)
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    return load_store(path)
+
+
+def _map(path: str, name: str) -> np.ndarray:
+    """read only memory mapped array, as a plain ndarray because slicing np.memmap is several times slower"""
+    return np.asarray(np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'))
+
+
+def load_store(path: str = STORE_PATH) -> RunStore:
+    """memory map a store written by export_store"""
+    with span('load_store', path=path) as s:
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != STORE_VERSION:
+            raise ValueError(f'{path} has version {meta["version"]}, expected {STORE_VERSION}, export it again')
+        store = RunStore(
+            path,
+            meta['root'],
+            meta['add_zero_report'],
+            {column: _map(path, column) for column in COLUMNS},
+            _map(path, 'offsets'),
+            {column: _map(path, f'run_{column}') for column in RUN_COLUMNS},
+            meta['variants'],
+            meta['files'],
+            meta['internal_errors'],
+            meta['headers'],
+            meta['fingerprint'],
+        )
+        s.count(runs=len(store))
+        return store
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='export all qperf runs of a data directory to a run store')
+    parser.add_argument('--root', default='./data')
+    parser.add_argument('-o', '--output', default=STORE_PATH)
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of processes, default: cpu count')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    store = export_store(args.root, args.output, workers=args.workers)
+    logging.info(f'exported {store}')
@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+from typing import Callable, Dict, IO, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from qvis_qperf.aggregated_connection import COLUMNS
+from qvis_qperf.compressed import open_text
+from qvis_qperf.connection import Connection
+from qvis_qperf.parser import QperfLogParser, BANDWIDTH_PREFIX, CLIENT_REPORT_PREFIX, ESTABLISHMENT_TIME_PREFIX, \
+    TIME_TO_FIRST_BYTE_PREFIX
+
+POLL_INTERVAL = 0.2
+"""in seconds"""
+
+
+class OnlineAggregatedConnection:
+    """running per report index count, mean and variance of runs, like AggregatedConnection
+    but the runs are not kept, memory grows with the number of report indices only.\n
+    the variance is updated with Welford's algorithm, the means are sum / count
+    so they are equal to the ones of AggregatedConnection"""
+    num_runs: int
+    counts: np.ndarray
+    """number of runs with a report at each index"""
+    _sums: Dict[str, np.ndarray]
+    _means: Dict[str, np.ndarray]
+    _m2: Dict[str, np.ndarray]
+    """sum of squared differences from the running mean"""
+    _time_to_first_byte_sum: float
+    _establishment_time_sum: float
+    _num_established: int
+
+    def __init__(self, capacity: int = 512):
+        self.num_runs = 0
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self._sums = {column: np.zeros(capacity) for column in COLUMNS}
+        self._means = {column: np.zeros(capacity) for column in COLUMNS}
+        self._m2 = {column: np.zeros(capacity) for column in COLUMNS}
+        self._time_to_first_byte_sum = 0
+        self._establishment_time_sum = 0
+        self._num_established = 0
+
+    @property
+    def num_samples(self) -> int:
+        """number of report indices with at least one report"""
+        return int(np.count_nonzero(self.counts))
+
+    def _grow(self, size: int):
+        capacity = len(self.counts)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        pad = capacity - len(self.counts)
+        self.counts = np.pad(self.counts, (0, pad))
+        for arrays in (self._sums, self._means, self._m2):
+            for column in COLUMNS:
+                arrays[column] = np.pad(arrays[column], (0, pad))
+
+    def add_run(self, time_to_first_byte: float, establishment_time: Optional[float] = None):
+        """register a run, its reports are added with add_reports"""
+        self.num_runs += 1
+        self._time_to_first_byte_sum += time_to_first_byte
+        if establishment_time is not None:
+            self._establishment_time_sum += establishment_time
+            self._num_established += 1
+
+    def add_reports(self, start_index: int, **columns: np.ndarray):
+        """add consecutive reports of one run, starting at report index start_index\n
+        columns: all of COLUMNS, one value per report"""
+        length = len(columns['times'])
+        if length == 0:
+            return
+        self._grow(start_index + length)
+        window = slice(start_index, start_index + length)
+        self.counts[window] += 1
+        counts = self.counts[window]
+        for column in COLUMNS:
+            values = np.asarray(columns[column], dtype=np.float64)
+            means = self._means[column][window]
+            delta = values - means
+            means += delta / counts
+            self._m2[column][window] += delta * (values - means)
+            self._sums[column][window] += values
+
+    def add(self, connection: Connection):
+        """add a complete run"""
+        self.add_run(connection.time_to_first_byte, connection.establishment_time)
+        self.add_reports(0, **{column: getattr(connection, column) for column in COLUMNS})
+
+    def _check_column(self, column: str):
+        if column not in COLUMNS:
+            raise ValueError(f'unknown column {column}')
+
+    def sum(self, column: str) -> np.ndarray:
+        """per index sum over all runs"""
+        self._check_column(column)
+        return self._sums[column][:self.num_samples]
+
+    def mean(self, column: str) -> np.ndarray:
+        """per index mean over all runs"""
+        return self.sum(column) / self.counts[:self.num_samples]
+
+    def variance(self, column: str, ddof: int = 1) -> np.ndarray:
+        """per index variance over all runs, NaN where there are not more than ddof runs"""
+        self._check_column(column)
+        counts = self.counts[:self.num_samples]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(counts > ddof, self._m2[column][:self.num_samples] / (counts - ddof), np.nan)
+
+    def std(self, column: str, ddof: int = 1) -> np.ndarray:
+        """per index standard deviation over all runs"""
+        return np.sqrt(self.variance(column, ddof=ddof))
+
+    @property
+    def time_to_first_byte(self) -> float:
+        """in seconds, NaN before the first run"""
+        if self.num_runs == 0:
+            return np.nan
+        return self._time_to_first_byte_sum / self.num_runs
+
+    @property
+    def establishment_time(self) -> float:
+        """in seconds, mean of the runs with a connection establishment time, NaN if there are none"""
+        if self._num_established == 0:
+            return np.nan
+        return self._establishment_time_sum / self._num_established
+
+    def to_avg_connection(self) -> Connection:
+        """connection of the per index mean of all runs, see AggregatedConnection.to_avg_connection"""
+        counts = self.counts[:self.num_samples]
+        return Connection.from_arrays(
+            self.mean('times'),
+            self.mean('download_rates'),
+            self.sum('bytes_received').astype(np.int64) // counts,
+            self.sum('packets_received').astype(np.int64) // counts,
+            establishment_time=self.establishment_time,
+            time_to_first_byte=self.time_to_first_byte,
+        )
+
+
+class ConnectionStream:
+    """qperf client output of consecutive runs parsed line by line,
+    reports are forwarded to an OnlineAggregatedConnection as soon as they are parsed"""
+    aggregate: OnlineAggregatedConnection
+    add_zero_report: bool
+    max_s: float
+    parser: Optional[QperfLogParser]
+    """parser of the current run"""
+    on_run_complete: Optional[Callable[[Connection], None]]
+    _num_aggregated: int
+    """reports of the current run that were added to aggregate"""
+    _total_bytes: int
+
+    def __init__(self, aggregate: Optional[OnlineAggregatedConnection] = None, add_zero_report: bool = True,
+                 max_s: float = float('inf'), on_run_complete: Optional[Callable[[Connection], None]] = None):
+        self.aggregate = aggregate if aggregate is not None else OnlineAggregatedConnection()
+        self.add_zero_report = add_zero_report
+        self.max_s = max_s
+        self.on_run_complete = on_run_complete
+        self.parser = None
+        self._num_aggregated = 0
+        self._total_bytes = 0
+
+    def _is_run_start(self, line: str) -> bool:
+        """runs start with the measurement setup or, without one, with the connection establishment"""
+        if self.parser is None:
+            return True
+        if line.startswith(BANDWIDTH_PREFIX):
+            return self.parser.header.bandwidth is not None or self.parser.time_to_first_byte is not None
+        if line.startswith(ESTABLISHMENT_TIME_PREFIX):
+            return self.parser.establishment_time is not None
+        return False
+
+    def feed(self, lines: Iterable[str]) -> ConnectionStream:
+        """the reports of all lines are aggregated at once"""
+        for line in lines:
+            self._parse_line(line)
+        if self.parser is not None:
+            self._aggregate_new_reports()
+        return self
+
+    def feed_line(self, line: str):
+        self._parse_line(line)
+        if self.parser is not None:
+            self._aggregate_new_reports()
+
+    def _parse_line(self, line: str):
+        if self._is_run_start(line):
+            self.finish_run()
+            self.parser = QperfLogParser(add_zero_report=self.add_zero_report, max_s=self.max_s)
+            self._num_aggregated = 0
+            self._total_bytes = 0
+        had_time_to_first_byte = self.parser.time_to_first_byte is not None
+        try:
+            self.parser.feed_line(line)
+        except ValueError:
+            # a report without time to first byte, e.g. when tailing starts in the middle of a run
+            return
+        if not had_time_to_first_byte and self.parser.time_to_first_byte is not None:
+            self.aggregate.add_run(self.parser.time_to_first_byte, self.parser.establishment_time)
+
+    def _aggregate_new_reports(self):
+        start = self._num_aggregated
+        if len(self.parser.times) == start:
+            return
+        bytes_received = self.parser.bytes_received[start:]
+        cumulative = self._total_bytes + np.cumsum(bytes_received, dtype=np.int64)
+        self.aggregate.add_reports(
+            start,
+            times=self.parser.times[start:],
+            download_rates=self.parser.download_rates[start:],
+            bytes_received=bytes_received,
+            packets_received=self.parser.packets_received[start:],
+            cumulative_bytes_received=cumulative,
+        )
+        self._total_bytes = int(cumulative[-1])
+        self._num_aggregated = len(self.parser.times)
+
+    @property
+    def connection(self) -> Optional[Connection]:
+        """the current run, parsed so far, None before its time to first byte"""
+        if self.parser is None or self.parser.time_to_first_byte is None:
+            return None
+        return Connection.from_arrays(
+            self.parser.times,
+            self.parser.download_rates,
+            self.parser.bytes_received,
+            self.parser.packets_received,
+            establishment_time=self.parser.establishment_time,
+            time_to_first_byte=self.parser.time_to_first_byte,
+            internal_error=self.parser.internal_error,
+            header=self.parser.header,
+        )
+
+    def finish_run(self):
+        """end the current run, called at the start of the next run and at the end of the stream"""
+        if self.parser is not None:
+            self._aggregate_new_reports()
+        if self.on_run_complete is not None:
+            connection = self.connection
+            if connection is not None:
+                self.on_run_complete(connection)
+        self.parser = None
+
+
+def follow(file: str | IO[str], poll_interval: float = POLL_INTERVAL,
+           idle_timeout: Optional[float] = None) -> Iterator[str]:
+    """complete lines of file as they are written, like tail -f.\n
+    file: path, '-' for stdin, or an open file.
+    pipes and stdin end at their end of file, regular files after idle_timeout seconds without new lines,
+    or never if idle_timeout is None"""
+    if file == '-':
+        file = sys.stdin
+    if not isinstance(file, str):
+        if not os.path.isfile(getattr(file, 'name', '')):
+            yield from iter(file.readline, '')
+            return
+        file = file.name
+    with open(file) as f:
+        partial = ''
+        idle_since = time.monotonic()
+        while True:
+            line = f.readline()
+            if line.endswith('\n'):
+                yield partial + line
+                partial = ''
+                idle_since = time.monotonic()
+                continue
+            # the rest of the line is not written yet
+            partial += line
+            if idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+                if partial:
+                    yield partial
+                return
+            time.sleep(poll_interval)
+
+
+def _line_time(line: str, time_to_first_byte: Optional[float]) -> Optional[float]:
+    """time in seconds after the start of the run at which qperf printed line, None if unknown"""
+    try:
+        if line.startswith(CLIENT_REPORT_PREFIX) and time_to_first_byte is not None:
+            return time_to_first_byte + float(line.split()[2].rstrip(':'))
+        for prefix in (ESTABLISHMENT_TIME_PREFIX, TIME_TO_FIRST_BYTE_PREFIX):
+            if line.startswith(prefix):
+                return float(line[len(prefix):].split()[0])
+    except (ValueError, IndexError):
+        pass
+    return None
+
+
+def replay(files: List[str], output: IO[str] = sys.stdout, speed: float = 1.0):
+    """write qperf logs to output one after another at the pace they were recorded,
+    a stand-in for a running measurement campaign\n
+    speed: factor, 2 replays twice as fast"""
+    for file in files:
+        start = time.monotonic()
+        time_to_first_byte = None
+        with open_text(file) as f:
+            for line in f:
+                if line.startswith(TIME_TO_FIRST_BYTE_PREFIX):
+                    time_to_first_byte = _line_time(line, None)
+                line_time = _line_time(line, time_to_first_byte)
+                if line_time is not None:
+                    delay = start + line_time / speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                output.write(line)
+                output.flush()
@@ -0,0 +1,177 @@
+"""link utilization of the congestion window and bytes in flight of server and proxy qlogs, relative to the BDP.\n
+the recovery:metrics_updated columns are step functions, a value holds until the next update of the same column.
+before the first update the link counts as unused. times are shifted like in the scripts,
+the distributed PEP traces start at the handover of the server side proxy.
+
+table of all scenarios with: python -m qvis_qperf.utilization [--root ./data] [-o FILE]"""
+from __future__ import annotations
+
+import argparse
+import functools
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from qvis_qperf.catalog import Catalog, CLIENT_SIDE_PEP, DISTRIBUTED_PEP, DISTRIBUTED_PEP_STATIC_CC, NO_PEP
+from qvis_qperf.profiling import span
+from qvis_qperf.qlog import load_qlog
+
+BANDWIDTH = 100_000_000
+"""of the emulated link, in bit/s"""
+
+MAX_MS = 40000
+"""end of the compared time span, like in compare_congestion.py"""
+
+CONGESTION_TRACES: Dict[str, str] = {
+    NO_PEP: 'server.qlog.gz',
+    CLIENT_SIDE_PEP: 'server.qlog.gz',
+    DISTRIBUTED_PEP: 'server_side_proxy_client_facing.qlog.gz',
+    DISTRIBUTED_PEP_STATIC_CC: 'server_side_proxy_client_facing.qlog.gz',
+}
+"""qlog file of the sender of each variant, see compare_congestion.py"""
+
+HANDOVER_VARIANTS = [DISTRIBUTED_PEP, DISTRIBUTED_PEP_STATIC_CC]
+"""their traces are shifted by handover_ms"""
+
+UTILIZATION_COLUMNS = ['congestion_window', 'bytes_in_flight']
+
+NO_PEP_LABEL = 'no_pep'
+"""variant column of the scenarios without PEP, whose variant is empty"""
+
+FIELDS = ['rtt_ms', 'variant', 'column', 'bdp', 'time_to_bdp', 'fraction_at_bdp', 'gap', 'reductions']
+"""columns of the utilization table"""
+
+
+class Utilization:
+    """of one column of one trace"""
+    rtt_ms: int
+    variant: str
+    column: str
+    bdp: float
+    """in bytes"""
+    time_to_bdp: float
+    """in seconds, NaN if the BDP is not reached"""
+    fraction_at_bdp: float
+    """of the time span"""
+    gap: float
+    """integral of the bytes below the BDP over time, in byte seconds"""
+    reductions: int
+    """number of decreases, congestion window reductions for the congestion window"""
+
+    def __init__(self, rtt_ms: int, variant: str, column: str, bdp: float, time_to_bdp: float,
+                 fraction_at_bdp: float, gap: float, reductions: int):
+        self.rtt_ms = rtt_ms
+        self.variant = variant
+        self.column = column
+        self.bdp = bdp
+        self.time_to_bdp = time_to_bdp
+        self.fraction_at_bdp = fraction_at_bdp
+        self.gap = gap
+        self.reductions = reductions
+
+    def __repr__(self) -> str:
+        return f'Utilization({self.rtt_ms}ms, {self.variant!r}, {self.column})'
+
+
+def bdp(rtt_ms: float, bandwidth: float = BANDWIDTH) -> float:
+    """bandwidth delay product in bytes"""
+    return rtt_ms / 1000 * bandwidth / 8
+
+
+def handover_ms(rtt_ms: int) -> int:
+    """handover of the server side proxy, as passed by the scripts"""
+    return 2 * rtt_ms
+
+
+def forward_fill(times: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """times and values of the non NaN values, repeated values removed"""
+    valid = ~np.isnan(values)
+    times, values = times[valid], values[valid]
+    changed = np.diff(values, prepend=np.nan) != 0
+    return times[changed], values[changed]
+
+
+def utilization_metrics(times: np.ndarray, values: np.ndarray, bdp: float, start: float,
+                        end: float) -> Tuple[float, float, float, int]:
+    """time to BDP in s, fraction of the time at or above the BDP, gap in byte seconds and number of decreases
+    of the step function values at times in ms, between start and end in ms"""
+    times, values = forward_fill(times, values)
+    within = times <= end
+    times, values = times[within], values[within]
+    duration = (end - start) / 1000
+    if len(times) == 0 or duration <= 0:
+        return math.nan, 0.0, bdp * max(duration, 0), 0
+    # each value holds until the next one, the first one from max(start, its time)
+    bounds = np.clip(np.append(times, end), start, end)
+    durations = np.diff(bounds) / 1000
+    at_bdp = values >= bdp
+    reached = np.flatnonzero(at_bdp & (durations > 0))
+    time_to_bdp = max(float(times[reached[0]]), start) / 1000 if len(reached) > 0 else math.nan
+    gap = float(np.sum(np.maximum(bdp - values, 0) * durations) + bdp * (bounds[0] - start) / 1000)
+    decreases = np.diff(values[bounds[1:] > start]) < 0
+    return time_to_bdp, float(np.sum(durations[at_bdp])) / duration, gap, int(np.count_nonzero(decreases))
+
+
+def trace_utilization(file: str, rtt_ms: int, variant: str, shift_ms: float = 0,
+                      max_ms: float = MAX_MS) -> List[Utilization]:
+    """utilization of each of UTILIZATION_COLUMNS of a qlog file"""
+    with span('trace_utilization', file=file):
+        metrics = load_qlog(file, max_ms=max_ms, shift_ms=shift_ms).metrics_updated
+        times = np.asarray(metrics['time'])
+        link_bdp = bdp(rtt_ms)
+        end = max_ms if max_ms != float('inf') else float(times[-1]) if len(times) > 0 else 0.0
+        return [Utilization(rtt_ms, variant, column, link_bdp,
+                            *utilization_metrics(times, np.asarray(metrics[column]), link_bdp, 0, end))
+                for column in UTILIZATION_COLUMNS]
+
+
+def _trace_utilization(args: Tuple[str, int, str, float], max_ms: float) -> List[Utilization]:
+    return trace_utilization(*args, max_ms=max_ms)
+
+
+def utilization_table(root: str = './data', max_ms: float = MAX_MS,
+                      workers: Optional[int] = None) -> List[Utilization]:
+    """utilization of all scenarios of root with a trace in CONGESTION_TRACES, ordered by rtt and variant"""
+    traces = []
+    for scenario in Catalog(root).select(artifact='qlog'):
+        trace = CONGESTION_TRACES.get(scenario.variant)
+        file = os.path.join(scenario.path, trace) if trace is not None else None
+        if file is None or not os.path.isfile(file):
+            continue
+        shift_ms = handover_ms(scenario.rtt_ms) if scenario.variant in HANDOVER_VARIANTS else 0
+        traces.append((file, scenario.rtt_ms, scenario.variant, shift_ms))
+    traces.sort(key=lambda t: (t[1], list(CONGESTION_TRACES).index(t[2])))
+    utilization = functools.partial(_trace_utilization, max_ms=max_ms)
+    if workers == 1 or len(traces) <= 1:
+        results = list(map(utilization, traces))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(traces))) as executor:
+            results = list(executor.map(utilization, traces))
+    return [row for rows in results for row in rows]
+
+
+def write_utilization_table(output_file: str, root: str = './data', max_ms: float = MAX_MS,
+                            workers: Optional[int] = None):
+    """tab separated, one line per row of utilization_table"""
+    rows = utilization_table(root, max_ms, workers)
+    with open(output_file, 'w') as f:
+        f.write('\t'.join(FIELDS) + '\n')
+        for row in rows:
+            values = {field: getattr(row, field) for field in FIELDS}
+            values['variant'] = values['variant'] or NO_PEP_LABEL
+            f.write('\t'.join(map(lambda field: str(values[field]), FIELDS)) + '\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='BDP utilization of the congestion window of all scenarios')
+    parser.add_argument('--root', default='./data')
+    parser.add_argument('-o', '--output', default='/dev/stdout')
+    parser.add_argument('--max-ms', type=float, default=MAX_MS, help='end of the time span')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of processes, default: cpu count')
+    args = parser.parse_args()
+    write_utilization_table(args.output, args.root, args.max_ms, args.workers)
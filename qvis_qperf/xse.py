@@ -0,0 +1,165 @@
+"""XSE-QUIC overhead of received stream data, from the stream frames table of a qlog trace.\n
+the raw rate counts every received stream frame, retransmissions included, the payload rate counts
+the stream data once, without the XSE record overhead. qlog does not log record boundaries,
+so records are assumed to be full, XSE_RECORD_PAYLOAD bytes of payload each, except the last one.
+payload is attributed to the frame that first extends the received stream, data filling a gap later counts as raw only.
+
+a trace is decompressed and parsed once by load_qlog, every later analysis reads the stored tables.
+report with: python -m qvis_qperf.xse [--no-xse] FILE ..."""
+from __future__ import annotations
+
+import argparse
+import functools
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from qvis_qperf.profiling import span
+from qvis_qperf.qlog import QlogTrace, load_qlog
+
+XSE_RECORD_PAYLOAD = 16384
+XSE_RECORD_OVERHEAD = 21
+"""record header and authentication tag"""
+
+MIN_OVERHEAD_RATIO = XSE_RECORD_OVERHEAD / XSE_RECORD_PAYLOAD
+"""of full records, (16405 - 16384) / 16384"""
+
+
+class XseAnalysis:
+    """received data of one stream, see analyze_xse"""
+    file: str
+    stream_id: int
+    xse: bool
+    """False if the trace is not XSE, payload is the stream data then"""
+    times: np.ndarray
+    """of the received stream frames, in ms"""
+    raw_bytes: np.ndarray
+    """per frame"""
+    payload_bytes: np.ndarray
+    """per frame, payload the frame adds to the received stream"""
+
+    def __init__(self, file: str, stream_id: int, xse: bool, times: np.ndarray, raw_bytes: np.ndarray,
+                 payload_bytes: np.ndarray):
+        self.file = file
+        self.stream_id = stream_id
+        self.xse = xse
+        self.times = times
+        self.raw_bytes = raw_bytes
+        self.payload_bytes = payload_bytes
+
+    def __repr__(self) -> str:
+        return f'XseAnalysis({self.file}, stream {self.stream_id}, {len(self.times)} frames)'
+
+    @property
+    def time_to_first_byte(self) -> float:
+        """in ms, NaN if no data was received"""
+        return float(self.times[0]) if len(self.times) > 0 else np.nan
+
+    @property
+    def duration(self) -> float:
+        """from the first to the last received frame, in ms"""
+        return float(self.times[-1] - self.times[0]) if len(self.times) > 0 else 0.0
+
+    def _rate(self, num_bytes: int) -> float:
+        if self.duration <= 0:
+            return np.nan
+        return num_bytes * 8 / (self.duration / 1000)
+
+    @property
+    def raw_rate(self) -> float:
+        """in bit/s"""
+        return self._rate(int(self.raw_bytes.sum()))
+
+    @property
+    def payload_rate(self) -> float:
+        """in bit/s"""
+        return self._rate(int(self.payload_bytes.sum()))
+
+    @property
+    def overhead_ratio(self) -> float:
+        """bytes received per byte of payload minus one, MIN_OVERHEAD_RATIO if all data was received once"""
+        payload = int(self.payload_bytes.sum())
+        if payload == 0:
+            return np.nan
+        return (int(self.raw_bytes.sum()) - payload) / payload
+
+    def overhead_ratios(self, bin_ms: float, max_ms: float = float('inf')) -> Tuple[np.ndarray, np.ndarray]:
+        """start of each bin in s after the first byte and the overhead ratio of the frames received in it,
+        NaN for bins without payload"""
+        if len(self.times) == 0:
+            return np.empty(0), np.empty(0)
+        elapsed = self.times - self.times[0]
+        end = min(float(elapsed[-1]), max_ms)
+        bins = np.floor(elapsed[elapsed <= end] / bin_ms).astype(np.int64)
+        num_bins = int(np.floor(end / bin_ms)) + 1
+        raw = np.bincount(bins, weights=self.raw_bytes[:len(bins)], minlength=num_bins)
+        payload = np.bincount(bins, weights=self.payload_bytes[:len(bins)], minlength=num_bins)
+        ratios = np.full(num_bins, np.nan)
+        np.divide(raw - payload, payload, out=ratios, where=payload > 0)
+        return np.arange(num_bins) * bin_ms / 1000, ratios
+
+
+def xse_payload(stream_bytes: np.ndarray) -> np.ndarray:
+    """payload in the first stream_bytes bytes of an XSE stream of full records"""
+    records, rest = np.divmod(stream_bytes, XSE_RECORD_PAYLOAD + XSE_RECORD_OVERHEAD)
+    return records * XSE_RECORD_PAYLOAD + np.maximum(rest - XSE_RECORD_OVERHEAD, 0)
+
+
+def analyze_trace(trace: QlogTrace, stream_id: int = 0, xse: bool = True) -> XseAnalysis:
+    """received data of stream stream_id of trace"""
+    frames = trace.stream_frames
+    received = (~frames['sent']) & (frames['stream_id'] == stream_id)
+    times = np.asarray(frames['time'][received], dtype=np.float64)
+    lengths = np.asarray(frames['length'][received], dtype=np.int64)
+    ends = np.asarray(frames['offset'][received], dtype=np.int64) + lengths
+    # received stream length after each frame
+    received_bytes = np.maximum.accumulate(ends) if len(ends) > 0 else ends
+    payload = xse_payload(received_bytes) if xse else received_bytes
+    return XseAnalysis(trace.file, stream_id, xse, times, lengths, np.diff(payload, prepend=0))
+
+
+def analyze_xse(file: str, stream_id: int = 0, xse: bool = True, use_cache: bool = True) -> XseAnalysis:
+    """received data of stream stream_id of a client qlog file"""
+    with span('analyze_xse', file=file) as s:
+        analysis = analyze_trace(load_qlog(file, use_cache=use_cache), stream_id, xse)
+        s.count(frames=len(analysis.times))
+        return analysis
+
+
+def analyze_xse_files(files: List[str], stream_id: int = 0, xse: bool = True, use_cache: bool = True,
+                      workers: Optional[int] = None) -> List[XseAnalysis]:
+    """analyze_xse of each file, in parallel worker processes"""
+    analyze = functools.partial(analyze_xse, stream_id=stream_id, xse=xse, use_cache=use_cache)
+    if workers == 1 or len(files) <= 1:
+        return list(map(analyze, files))
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(workers, len(files))) as executor:
+        return list(executor.map(analyze, files))
+
+
+def _report(analysis: XseAnalysis, bin_ms: float, max_ms: float) -> str:
+    lines = [
+        f'{analysis.file}:',
+        f'  raw: {analysis.raw_rate} bit/s',
+        f'  payload: {analysis.payload_rate} bit/s',
+        f'  overhead: {analysis.overhead_ratio} (minimum {MIN_OVERHEAD_RATIO})',
+    ]
+    for start, ratio in zip(*analysis.overhead_ratios(bin_ms, max_ms)):
+        lines.append(f'  {start:.4f}s {ratio}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='XSE-QUIC rates and overhead of client qlog files')
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--stream', type=int, default=0, help='stream id')
+    parser.add_argument('--no-xse', action='store_true', help='the traces are not XSE-QUIC')
+    parser.add_argument('--bin-ms', type=float, default=1, help='bin size of the overhead ratio time series')
+    parser.add_argument('--max-ms', type=float, default=20, help='end of the time series after the first byte')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of processes, default: cpu count')
+    args = parser.parse_args()
+    for a in analyze_xse_files(args.files, args.stream, not args.no_xse, workers=args.workers):
+        print(_report(a, args.bin_ms, args.max_ms))
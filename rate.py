@@ -6,7 +6,9 @@ from qvis.plot import QvisByteAxisFormatter
 
 from qvis_qperf.aggregated_connection import AggregatedConnection
 from qvis_qperf.connection import Connection, load_all_connections, reduce_steps
-from qvis_qperf.plot import plot_time_to_first_byte, plot_rate
+from qvis_qperf.pipeline import Target
+from qvis_qperf.plot import plot_time_to_first_byte, plot_rate, save_figure
+from qvis_qperf.render import rc_params
 
 
 def plot(connections: List[Connection], output_name: str, zero_at_ttfb: bool = False, timespan: float = 40):
@@ -15,11 +17,11 @@ def plot(connections: List[Connection], output_name: str, zero_at_ttfb: bool = F
     if zero_at_ttfb:
         start_time = agg_connection.time_to_first_byte
     end_time = start_time + timespan
-    plt.rcParams.update({
+    plt.rcParams.update(rc_params({
         "font.family": "serif",
         "text.usetex": True,
         "pgf.rcfonts": False,
-    })
+    }))
     fig, ax = plt.subplots()
     ax.axline((0, 100_000_000), (1, 100_000_000), color='gray', linestyle=(0, (1, 10)))
     plot_rate(ax, connections, label='Individual rates', color='gray', alpha=0.2)
@@ -39,36 +41,54 @@ def plot(connections: List[Connection], output_name: str, zero_at_ttfb: bool = F
     ax.yaxis.set_major_formatter(QvisByteAxisFormatter)  # works for bits to
     fig.set_size_inches(5.5, 2.2)
     output_path = f'./plots/{output_name}.pdf'
-    fig.savefig(output_path, bbox_inches='tight', dpi=300)
+    output_path = save_figure(fig, output_path, bbox_inches='tight', dpi=300)
     print(f'saved plot as {output_path}')
     plt.plot()
 
 
-plot(reduce_steps(load_all_connections('./data/72ms/qperf'), 10), 'rate_72ms')
-plot(reduce_steps(load_all_connections('./data/72ms_client_side_proxy/qperf'), 10), 'rate_72ms_client_side_proxy')
-plot(reduce_steps(load_all_connections('./data/72ms_two_proxies/qperf'), 10), 'rate_72ms_two_proxies')
-plot(reduce_steps(load_all_connections('./data/72ms_two_proxies_simple/qperf'), 10), 'rate_72ms_two_proxies_simple')
-plot(reduce_steps(load_all_connections('./data/72ms_two_proxies_simple_xse/qperf'), 10), 'rate_72ms_two_proxies_simple_xse')
-
-plot(reduce_steps(load_all_connections('./data/220ms/qperf'), 10), 'rate_220ms')
-plot(reduce_steps(load_all_connections('./data/220ms_client_side_proxy/qperf'), 10), 'rate_220ms_client_side_proxy')
-plot(reduce_steps(load_all_connections('./data/220ms_two_proxies/qperf'), 10), 'rate_220ms_two_proxies')
-plot(reduce_steps(load_all_connections('./data/220ms_two_proxies_simple/qperf'), 10), 'rate_220ms_two_proxies_simple')
-plot(reduce_steps(load_all_connections('./data/220ms_two_proxies_simple_xse/qperf'), 10), 'rate_220ms_two_proxies_simple_xse')
-
-plot(reduce_steps(load_all_connections('./data/500ms/qperf'), 10), 'rate_500ms')
-plot(reduce_steps(load_all_connections('./data/500ms_client_side_proxy/qperf'), 10), 'rate_500ms_client_side_proxy')
-plot(reduce_steps(load_all_connections('./data/500ms_two_proxies/qperf'), 10), 'rate_500ms_two_proxies')
-plot(reduce_steps(load_all_connections('./data/500ms_two_proxies_simple/qperf'), 10), 'rate_500ms_two_proxies_simple')
-plot(reduce_steps(load_all_connections('./data/500ms_two_proxies_simple_xse/qperf'), 10), 'rate_500ms_two_proxies_simple_xse')
-
-plot(reduce_steps(load_all_connections('./data/1000ms/qperf'), 10), 'rate_1000ms')
-plot(reduce_steps(load_all_connections('./data/1000ms_client_side_proxy/qperf'), 10), 'rate_1000ms_client_side_proxy')
-plot(reduce_steps(load_all_connections('./data/1000ms_two_proxies/qperf'), 10), 'rate_1000ms_two_proxies')
-plot(reduce_steps(load_all_connections('./data/1000ms_two_proxies_simple/qperf'), 10), 'rate_1000ms_two_proxies_simple')
-plot(reduce_steps(load_all_connections('./data/1000ms_two_proxies_simple_xse/qperf'), 10), 'rate_1000ms_two_proxies_simple_xse')
-
-plot(reduce_steps(load_all_connections('./data/2000ms/qperf'), 10), 'rate_2000ms')
-plot(reduce_steps(load_all_connections('./data/2000ms_client_side_proxy/qperf'), 10), 'rate_2000ms_client_side_proxy')
-plot(reduce_steps(load_all_connections('./data/2000ms_two_proxies/qperf'), 10), 'rate_2000ms_two_proxies')
-plot(reduce_steps(load_all_connections('./data/2000ms_two_proxies_simple/qperf'), 10), 'rate_2000ms_two_proxies_simple')
+def plot_scenario(scenario: str, **kwargs):
+    """scenario: directory name in ./data"""
+    plot(reduce_steps(load_all_connections(f'./data/{scenario}/qperf'), 10), f'rate_{scenario}', **kwargs)
+
+
+def target(scenario: str, **kwargs) -> Target:
+    return Target(f'./plots/rate_{scenario}.pdf', plot_scenario, scenario, inputs=[f'./data/{scenario}/qperf'],
+                  **kwargs)
+
+
+def targets() -> List[Target]:
+    return [
+        target('72ms'),
+        target('72ms_client_side_proxy'),
+        target('72ms_two_proxies'),
+        target('72ms_two_proxies_simple'),
+        target('72ms_two_proxies_simple_xse'),
+
+        target('220ms'),
+        target('220ms_client_side_proxy'),
+        target('220ms_two_proxies'),
+        target('220ms_two_proxies_simple'),
+        target('220ms_two_proxies_simple_xse'),
+
+        target('500ms'),
+        target('500ms_client_side_proxy'),
+        target('500ms_two_proxies'),
+        target('500ms_two_proxies_simple'),
+        target('500ms_two_proxies_simple_xse'),
+
+        target('1000ms'),
+        target('1000ms_client_side_proxy'),
+        target('1000ms_two_proxies'),
+        target('1000ms_two_proxies_simple'),
+        target('1000ms_two_proxies_simple_xse'),
+
+        target('2000ms'),
+        target('2000ms_client_side_proxy'),
+        target('2000ms_two_proxies'),
+        target('2000ms_two_proxies_simple'),
+    ]
+
+
+if __name__ == '__main__':
+    for t in targets():
+        t.run()
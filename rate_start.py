@@ -7,7 +7,9 @@ from qvis.plot import QvisByteAxisFormatter
 
 from qvis_qperf.aggregated_connection import AggregatedConnection
 from qvis_qperf.connection import Connection, load_all_connections, reduce_steps
-from qvis_qperf.plot import plot_time_to_first_byte, plot_rate
+from qvis_qperf.pipeline import Target
+from qvis_qperf.plot import plot_time_to_first_byte, plot_rate, save_figure
+from qvis_qperf.render import rc_params
 
 
 def plot(connections: List[Connection], output_name: str, start_time: float = 0, start_at_ttfb: bool = False, timespan: float = 40):
@@ -15,11 +17,11 @@ def plot(connections: List[Connection], output_name: str, start_time: float = 0,
     if start_at_ttfb:
         start_time = math.floor(agg_connection.time_to_first_byte)
     end_time = start_time + timespan
-    plt.rcParams.update({
+    plt.rcParams.update(rc_params({
         "font.family": "serif",
         "text.usetex": True,
         "pgf.rcfonts": False,
-    })
+    }))
     fig, ax = plt.subplots()
     ax.axline((0, 100_000_000), (1, 100_000_000), color='gray', linestyle=(0, (1, 10)))
     plot_rate(ax, connections, label='Individual rates', color='gray', alpha=0.2)
@@ -39,36 +41,54 @@ def plot(connections: List[Connection], output_name: str, start_time: float = 0,
     ax.yaxis.set_major_formatter(QvisByteAxisFormatter)  # works for bits to
     fig.set_size_inches(5.5, 2.2)
     output_path = f'./plots/{output_name}.pdf'
-    fig.savefig(output_path, bbox_inches='tight', dpi=300)
+    output_path = save_figure(fig, output_path, bbox_inches='tight', dpi=300)
     print(f'saved plot as {output_path}')
     plt.plot()
 
 
-plot(reduce_steps(load_all_connections('./data/72ms/qperf'), 2), 'rate_start_72ms', start_at_ttfb=True, timespan=5)
-plot(reduce_steps(load_all_connections('./data/72ms_client_side_proxy/qperf'), 2), 'rate_start_72ms_client_side_proxy', start_at_ttfb=True, timespan=5)
-plot(reduce_steps(load_all_connections('./data/72ms_two_proxies/qperf'), 2), 'rate_start_72ms_two_proxies', start_at_ttfb=True, timespan=5)
-plot(reduce_steps(load_all_connections('./data/72ms_two_proxies_simple/qperf'), 2), 'rate_start_72ms_two_proxies_simple', start_at_ttfb=True, timespan=5)
-plot(reduce_steps(load_all_connections('./data/72ms_two_proxies_simple_xse/qperf'), 2), 'rate_start_72ms_two_proxies_simple_xse', start_at_ttfb=True, timespan=5)
-
-plot(reduce_steps(load_all_connections('./data/220ms/qperf'), 2), 'rate_start_220ms', start_time=0, timespan=5)
-plot(reduce_steps(load_all_connections('./data/220ms_client_side_proxy/qperf'), 2), 'rate_start_220ms_client_side_proxy', start_time=0, timespan=5)
-plot(reduce_steps(load_all_connections('./data/220ms_two_proxies/qperf'), 2), 'rate_start_220ms_two_proxies', start_time=0, timespan=5)
-plot(reduce_steps(load_all_connections('./data/220ms_two_proxies_simple/qperf'), 2), 'rate_start_220ms_two_proxies_simple', start_time=0, timespan=5)
-plot(reduce_steps(load_all_connections('./data/220ms_two_proxies_simple_xse/qperf'), 2), 'rate_start_220ms_two_proxies_simple_xse', start_time=0, timespan=5)
-
-plot(reduce_steps(load_all_connections('./data/500ms/qperf'), 2), 'rate_start_500ms', start_time=1, timespan=5)
-plot(reduce_steps(load_all_connections('./data/500ms_client_side_proxy/qperf'), 2), 'rate_start_500ms_client_side_proxy', start_time=1, timespan=5)
-plot(reduce_steps(load_all_connections('./data/500ms_two_proxies/qperf'), 2), 'rate_start_500ms_two_proxies', start_time=1, timespan=5)
-plot(reduce_steps(load_all_connections('./data/500ms_two_proxies_simple/qperf'), 2), 'rate_start_500ms_two_proxies_simple', start_time=1, timespan=5)
-plot(reduce_steps(load_all_connections('./data/500ms_two_proxies_simple_xse/qperf'), 2), 'rate_start_500ms_two_proxies_simple_xse', start_time=1, timespan=5)
-
-plot(reduce_steps(load_all_connections('./data/1000ms/qperf'), 2), 'rate_start_1000ms', start_time=3, timespan=5)
-plot(reduce_steps(load_all_connections('./data/1000ms_client_side_proxy/qperf'), 2), 'rate_start_1000ms_client_side_proxy', start_time=3, timespan=5)
-plot(reduce_steps(load_all_connections('./data/1000ms_two_proxies/qperf'), 2), 'rate_start_1000ms_two_proxies', start_time=3, timespan=5)
-plot(reduce_steps(load_all_connections('./data/1000ms_two_proxies_simple/qperf'), 2), 'rate_start_1000ms_two_proxies_simple', start_time=3, timespan=5)
-plot(reduce_steps(load_all_connections('./data/1000ms_two_proxies_simple_xse/qperf'), 2), 'rate_start_1000ms_two_proxies_simple_xse', start_time=3, timespan=5)
-
-plot(reduce_steps(load_all_connections('./data/2000ms/qperf'), 2), 'rate_start_2000ms', start_time=6, timespan=5)
-plot(reduce_steps(load_all_connections('./data/2000ms_client_side_proxy/qperf'), 2), 'rate_start_2000ms_client_side_proxy', start_time=6, timespan=5)
-plot(reduce_steps(load_all_connections('./data/2000ms_two_proxies/qperf'), 2), 'rate_start_2000ms_two_proxies', start_time=6, timespan=5)
-plot(reduce_steps(load_all_connections('./data/2000ms_two_proxies_simple/qperf'), 2), 'rate_start_2000ms_two_proxies_simple', start_time=6, timespan=5)
+def plot_scenario(scenario: str, **kwargs):
+    """scenario: directory name in ./data"""
+    plot(reduce_steps(load_all_connections(f'./data/{scenario}/qperf'), 2), f'rate_start_{scenario}', **kwargs)
+
+
+def target(scenario: str, **kwargs) -> Target:
+    return Target(f'./plots/rate_start_{scenario}.pdf', plot_scenario, scenario, inputs=[f'./data/{scenario}/qperf'],
+                  **kwargs)
+
+
+def targets() -> List[Target]:
+    return [
+        target('72ms', start_at_ttfb=True, timespan=5),
+        target('72ms_client_side_proxy', start_at_ttfb=True, timespan=5),
+        target('72ms_two_proxies', start_at_ttfb=True, timespan=5),
+        target('72ms_two_proxies_simple', start_at_ttfb=True, timespan=5),
+        target('72ms_two_proxies_simple_xse', start_at_ttfb=True, timespan=5),
+
+        target('220ms', start_time=0, timespan=5),
+        target('220ms_client_side_proxy', start_time=0, timespan=5),
+        target('220ms_two_proxies', start_time=0, timespan=5),
+        target('220ms_two_proxies_simple', start_time=0, timespan=5),
+        target('220ms_two_proxies_simple_xse', start_time=0, timespan=5),
+
+        target('500ms', start_time=1, timespan=5),
+        target('500ms_client_side_proxy', start_time=1, timespan=5),
+        target('500ms_two_proxies', start_time=1, timespan=5),
+        target('500ms_two_proxies_simple', start_time=1, timespan=5),
+        target('500ms_two_proxies_simple_xse', start_time=1, timespan=5),
+
+        target('1000ms', start_time=3, timespan=5),
+        target('1000ms_client_side_proxy', start_time=3, timespan=5),
+        target('1000ms_two_proxies', start_time=3, timespan=5),
+        target('1000ms_two_proxies_simple', start_time=3, timespan=5),
+        target('1000ms_two_proxies_simple_xse', start_time=3, timespan=5),
+
+        target('2000ms', start_time=6, timespan=5),
+        target('2000ms_client_side_proxy', start_time=6, timespan=5),
+        target('2000ms_two_proxies', start_time=6, timespan=5),
+        target('2000ms_two_proxies_simple', start_time=6, timespan=5),
+    ]
+
+
+if __name__ == '__main__':
+    for t in targets():
+        t.run()
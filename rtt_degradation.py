@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 import os
+from typing import List
 
 import matplotlib
 from matplotlib import pyplot as plt
@@ -7,61 +8,78 @@ from qvis.plot import QvisByteAxisFormatter, QvisTimeAxisFormatter
 
 from qvis_qperf.aggregated_connection import AggregatedConnection
 from qvis_qperf.connection import load_all_connections, reduce_steps
-from qvis_qperf.plot import plot_rate, plot_time_to_first_byte
-
-# %% load connections
-
-conns_72 = load_all_connections('./data/72ms/qperf')
-conns_220 = load_all_connections('./data/220ms/qperf')
-conns_500 = load_all_connections('./data/500ms/qperf')
-conns_1000 = load_all_connections('./data/1000ms/qperf')
-conns_2000 = load_all_connections('./data/2000ms/qperf')
-
-# %% load qlog files
-
-agg_conn_72 = AggregatedConnection(reduce_steps(conns_72))
-agg_conn_220 = AggregatedConnection(reduce_steps(conns_220))
-agg_conn_500 = AggregatedConnection(reduce_steps(conns_500))
-agg_conn_1000 = AggregatedConnection(reduce_steps(conns_1000))
-agg_conn_2000 = AggregatedConnection(reduce_steps(conns_2000))
-
-
-# %% plot
-plt.rcParams.update({
-    "font.family": "serif",
-    "text.usetex": True,
-    "pgf.rcfonts": False,
-})
-fig, ax = plt.subplots()
-ax.axline((0, 100_000_000), (1, 100_000_000), color='gray', linestyle=(0, (1, 10)))
-
-plot_rate(ax, agg_conn_72, label=r'$72\,$ms', color='tab:blue', marker='x')
-plot_rate(ax, agg_conn_220, label=r'$220\,$ms', color='tab:orange', marker='x')
-plot_rate(ax, agg_conn_500, label=r'$500\,$ms', color='tab:green', marker='x')
-plot_rate(ax, agg_conn_1000, label=r'$1000\,$ms', color='tab:red', marker='x')
-plot_rate(ax, agg_conn_2000, label=r'$2000\,$ms', color='tab:cyan', marker='x')
-
-plot_time_to_first_byte(ax, agg_conn_72, color='tab:blue')
-plot_time_to_first_byte(ax, agg_conn_220, label=None, color='tab:orange')
-plot_time_to_first_byte(ax, agg_conn_500, label=None, color='tab:green')
-plot_time_to_first_byte(ax, agg_conn_1000, label=None, color='tab:red')
-plot_time_to_first_byte(ax, agg_conn_2000, label=None, color='tab:cyan')
-
-fig.set_size_inches(7, 4)
-ax.set_axisbelow(True)
-ax.grid(True)
-ax.set_ylim(ymin=0, ymax=120000000)
-ax.set_xlim(xmin=0, xmax=40)
-lgnd = ax.legend(fancybox=False, shadow=False, loc='lower center',  bbox_to_anchor=(0.5, -0.3), ncol=3, frameon=False)
-for handle in lgnd.legendHandles:
-    handle._sizes = [30]
-    handle._alpha = 1
-ax.xaxis.set_major_formatter(QvisTimeAxisFormatter)
-ax.xaxis.set_major_locator(matplotlib.ticker.MultipleLocator(2))
-ax.yaxis.set_major_formatter(QvisByteAxisFormatter)
-ax.xaxis.set_label_text('Time (s)')
-ax.yaxis.set_label_text('Rate (bit/s)')
-output_path = f'./plots/{os.path.splitext(os.path.basename(__file__))[0]}.pdf'
-fig.savefig(output_path, bbox_inches='tight', dpi=600)
-print(f'saved plot as {output_path}')
-plt.plot()
+from qvis_qperf.catalog import scenario_dir
+from qvis_qperf.pipeline import Target
+from qvis_qperf.plot import plot_rate, plot_time_to_first_byte, save_figure
+from qvis_qperf.render import rc_params
+
+file_name = os.path.splitext(os.path.basename(__file__))[0]
+"""file name of this script without extension"""
+
+
+def plot(output_path: str):
+    # %% load connections
+
+    conns_72 = load_all_connections('./data/72ms/qperf')
+    conns_220 = load_all_connections('./data/220ms/qperf')
+    conns_500 = load_all_connections('./data/500ms/qperf')
+    conns_1000 = load_all_connections('./data/1000ms/qperf')
+    conns_2000 = load_all_connections('./data/2000ms/qperf')
+
+    # %% load qlog files
+
+    agg_conn_72 = AggregatedConnection(reduce_steps(conns_72))
+    agg_conn_220 = AggregatedConnection(reduce_steps(conns_220))
+    agg_conn_500 = AggregatedConnection(reduce_steps(conns_500))
+    agg_conn_1000 = AggregatedConnection(reduce_steps(conns_1000))
+    agg_conn_2000 = AggregatedConnection(reduce_steps(conns_2000))
+
+    # %% plot
+    plt.rcParams.update(rc_params({
+        "font.family": "serif",
+        "text.usetex": True,
+        "pgf.rcfonts": False,
+    }))
+    fig, ax = plt.subplots()
+    ax.axline((0, 100_000_000), (1, 100_000_000), color='gray', linestyle=(0, (1, 10)))
+
+    plot_rate(ax, agg_conn_72, label=r'$72\,$ms', color='tab:blue', marker='x')
+    plot_rate(ax, agg_conn_220, label=r'$220\,$ms', color='tab:orange', marker='x')
+    plot_rate(ax, agg_conn_500, label=r'$500\,$ms', color='tab:green', marker='x')
+    plot_rate(ax, agg_conn_1000, label=r'$1000\,$ms', color='tab:red', marker='x')
+    plot_rate(ax, agg_conn_2000, label=r'$2000\,$ms', color='tab:cyan', marker='x')
+
+    plot_time_to_first_byte(ax, agg_conn_72, color='tab:blue')
+    plot_time_to_first_byte(ax, agg_conn_220, label=None, color='tab:orange')
+    plot_time_to_first_byte(ax, agg_conn_500, label=None, color='tab:green')
+    plot_time_to_first_byte(ax, agg_conn_1000, label=None, color='tab:red')
+    plot_time_to_first_byte(ax, agg_conn_2000, label=None, color='tab:cyan')
+
+    fig.set_size_inches(7, 4)
+    ax.set_axisbelow(True)
+    ax.grid(True)
+    ax.set_ylim(ymin=0, ymax=120000000)
+    ax.set_xlim(xmin=0, xmax=40)
+    lgnd = ax.legend(fancybox=False, shadow=False, loc='lower center',  bbox_to_anchor=(0.5, -0.3), ncol=3, frameon=False)
+    for handle in lgnd.legendHandles:
+        handle._sizes = [30]
+        handle._alpha = 1
+    ax.xaxis.set_major_formatter(QvisTimeAxisFormatter)
+    ax.xaxis.set_major_locator(matplotlib.ticker.MultipleLocator(2))
+    ax.yaxis.set_major_formatter(QvisByteAxisFormatter)
+    ax.xaxis.set_label_text('Time (s)')
+    ax.yaxis.set_label_text('Rate (bit/s)')
+    output_path = save_figure(fig, output_path, bbox_inches='tight', dpi=600)
+    print(f'saved plot as {output_path}')
+    plt.plot()
+
+
+def targets() -> List[Target]:
+    output_path = f'./plots/{file_name}.pdf'
+    return [Target(output_path, plot, output_path,
+                   inputs=[scenario_dir(rtt_ms) for rtt_ms in [72, 220, 500, 1000, 2000]])]
+
+
+if __name__ == '__main__':
+    for t in targets():
+        t.run()
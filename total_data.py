@@ -1,59 +1,67 @@
 #!/usr/bin/env python
+from typing import List
+
 import matplotlib
 from matplotlib import pyplot as plt, transforms
 from qvis.plot import QvisByteAxisFormatter
 
-from qvis_qperf.connection import load_all_connections
-from qvis_qperf.plot import plot_bytes_at_second
+from qvis_qperf.catalog import Catalog, NO_PEP, CLIENT_SIDE_PEP, DISTRIBUTED_PEP, DISTRIBUTED_PEP_XSE, \
+    DISTRIBUTED_PEP_STATIC_CC
+from qvis_qperf.pipeline import Target
+from qvis_qperf.plot import plot_bytes_at_second, save_figure
+from qvis_qperf.render import rc_params
+
+catalog = Catalog('./data')
+
 
 def plot(max_s:float=40, output_name:str ='total_data'):
-    plt.rcParams.update({
+    plt.rcParams.update(rc_params({
         "font.family": "serif",
         "text.usetex": True,
         "pgf.rcfonts": False,
-    })
+    }))
     fig, ax = plt.subplots()
     offset = lambda p: transforms.ScaledTranslation(p / 72., 0, plt.gcf().dpi_scale_trans)
     trans = plt.gca().transData
     xlabels = ['72\,ms RTT', '220\,ms RTT', '500\,ms RTT', '1000\,ms RTT', '2000\,ms RTT']
 
     plot_bytes_at_second(ax, [
-        load_all_connections('./data/72ms/qperf'),
-        load_all_connections('./data/220ms/qperf'),
-        load_all_connections('./data/500ms/qperf'),
-        load_all_connections('./data/1000ms/qperf'),
-        load_all_connections('./data/2000ms/qperf'),
+        catalog.connections(72, NO_PEP),
+        catalog.connections(220, NO_PEP),
+        catalog.connections(500, NO_PEP),
+        catalog.connections(1000, NO_PEP),
+        catalog.connections(2000, NO_PEP),
     ], max_s, x=xlabels, label='No PEP', transform=trans + offset(-28), color="#253c4b")
 
     plot_bytes_at_second(ax, [
-        load_all_connections('./data/72ms_client_side_proxy/qperf'),
-        load_all_connections('./data/220ms_client_side_proxy/qperf'),
-        load_all_connections('./data/500ms_client_side_proxy/qperf'),
-        load_all_connections('./data/1000ms_client_side_proxy/qperf'),
-        load_all_connections('./data/2000ms_client_side_proxy/qperf'),
+        catalog.connections(72, CLIENT_SIDE_PEP),
+        catalog.connections(220, CLIENT_SIDE_PEP),
+        catalog.connections(500, CLIENT_SIDE_PEP),
+        catalog.connections(1000, CLIENT_SIDE_PEP),
+        catalog.connections(2000, CLIENT_SIDE_PEP),
     ], max_s, x=xlabels, label='Client-side PEP', transform=trans + offset(-14), color="#00885c")
 
     plot_bytes_at_second(ax, [
-        load_all_connections('./data/72ms_two_proxies_simple/qperf'),
-        load_all_connections('./data/220ms_two_proxies_simple/qperf'),
-        load_all_connections('./data/500ms_two_proxies_simple/qperf'),
-        load_all_connections('./data/1000ms_two_proxies_simple/qperf'),
-        load_all_connections('./data/2000ms_two_proxies_simple/qperf'),
+        catalog.connections(72, DISTRIBUTED_PEP),
+        catalog.connections(220, DISTRIBUTED_PEP),
+        catalog.connections(500, DISTRIBUTED_PEP),
+        catalog.connections(1000, DISTRIBUTED_PEP),
+        catalog.connections(2000, DISTRIBUTED_PEP),
     ], max_s, x=xlabels, label='Distributed PEP', color="#ffa600")
 
     plot_bytes_at_second(ax, [
-        load_all_connections('./data/72ms_two_proxies_simple_xse/qperf'),
-        load_all_connections('./data/220ms_two_proxies_simple_xse/qperf'),
-        load_all_connections('./data/500ms_two_proxies_simple_xse/qperf'),
-        load_all_connections('./data/1000ms_two_proxies_simple_xse/qperf'),
+        catalog.connections(72, DISTRIBUTED_PEP_XSE),
+        catalog.connections(220, DISTRIBUTED_PEP_XSE),
+        catalog.connections(500, DISTRIBUTED_PEP_XSE),
+        catalog.connections(1000, DISTRIBUTED_PEP_XSE),
     ], max_s, x=xlabels[:-1], label='Distributed PEP (XSE)', transform=trans + offset(14), color="#bc32cf")
 
     plot_bytes_at_second(ax, [
-        load_all_connections('./data/72ms_two_proxies/qperf'),
-        load_all_connections('./data/220ms_two_proxies/qperf'),
-        load_all_connections('./data/500ms_two_proxies/qperf'),
-        load_all_connections('./data/1000ms_two_proxies/qperf'),
-        load_all_connections('./data/2000ms_two_proxies/qperf'),
+        catalog.connections(72, DISTRIBUTED_PEP_STATIC_CC),
+        catalog.connections(220, DISTRIBUTED_PEP_STATIC_CC),
+        catalog.connections(500, DISTRIBUTED_PEP_STATIC_CC),
+        catalog.connections(1000, DISTRIBUTED_PEP_STATIC_CC),
+        catalog.connections(2000, DISTRIBUTED_PEP_STATIC_CC),
     ], max_s, x=xlabels, color='tab:orange', label='Distributed PEP (static CC)', transform=trans + offset(28))
 
     ax.xaxis.set_label_text('Scenario')
@@ -71,8 +79,17 @@ def plot(max_s:float=40, output_name:str ='total_data'):
     ax.yaxis.set_major_formatter(QvisByteAxisFormatter)  # works for bits to
     fig.set_size_inches(8, 5)
     output_path = f'./plots/{output_name}.pdf'
-    fig.savefig(output_path, bbox_inches='tight', dpi=300)
+    output_path = save_figure(fig, output_path, bbox_inches='tight', dpi=300)
     print(f'saved plot as {output_path}')
     plt.plot()
 
-plot(40, 'total_data_40s')
+
+def targets() -> List[Target]:
+    scenarios = catalog.select(variant=None)
+    return [Target('./plots/total_data_40s.pdf', plot, 40, 'total_data_40s',
+                   inputs=list(map(lambda s: s.path, scenarios)))]
+
+
+if __name__ == '__main__':
+    for t in targets():
+        t.run()
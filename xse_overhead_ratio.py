@@ -1,33 +1,36 @@
 #!/usr/bin/env python
 import os
+from typing import List
 
 from matplotlib import pyplot as plt
-from qvis.connection import Connection, read_qlog
-from qvis.plot import plot_received_xse_overhead_ratio
 
-def plot():
-    file_name = os.path.splitext(os.path.basename(__file__))[0]
-    """file name of this script without extension"""
+from qvis_qperf.catalog import DISTRIBUTED_PEP, DISTRIBUTED_PEP_XSE, scenario_dir
+from qvis_qperf.pipeline import Target
+from qvis_qperf.plot import save_figure
+from qvis_qperf.render import rc_params
+from qvis_qperf.xse import MIN_OVERHEAD_RATIO, XseAnalysis, analyze_xse, analyze_xse_files
 
-    max_ms = 10000
+file_name = os.path.splitext(os.path.basename(__file__))[0]
+"""file name of this script without extension"""
 
-    conn_72ms: Connection = read_qlog('./data/72ms_two_proxies_simple_xse/qlog/client.qlog.gz', max_ms=max_ms)
-    conn_220ms: Connection = read_qlog('./data/220ms_two_proxies_simple_xse/qlog/client.qlog.gz', max_ms=max_ms)
-    conn_500ms: Connection = read_qlog('./data/500ms_two_proxies_simple_xse/qlog/client.qlog.gz', max_ms=max_ms)
-    conn_1000ms: Connection = read_qlog('./data/1000ms_two_proxies_simple_xse/qlog/client.qlog.gz', max_ms=max_ms)
 
-    plt.rcParams.update({
+def plot(output_path: str):
+    bin_ms = 0.5
+    rtts_ms = [72, 220, 500, 1000]
+
+    analyses = analyze_xse_files(
+        [f'./data/{rtt_ms}ms_two_proxies_simple_xse/qlog/client.qlog.gz' for rtt_ms in rtts_ms])
+
+    plt.rcParams.update(rc_params({
         "font.family": "serif",
         "text.usetex": True,
         "pgf.rcfonts": False,
-    })
+    }))
     fig, ax = plt.subplots()
-    min_ratio = (16405 - 16384) / 16384
-    ax.axline((0, min_ratio), (1, min_ratio), color='gray', linestyle=(0, (1, 10)))
-    plot_received_xse_overhead_ratio(ax, conn_72ms, 0, label='72\,ms', color='tab:blue', shift_ms=-conn_72ms.time_to_first_byte(0), markersize=5)
-    plot_received_xse_overhead_ratio(ax, conn_220ms, 0, label='220\,ms', color='tab:orange', shift_ms=-conn_220ms.time_to_first_byte(0), markersize=5)
-    plot_received_xse_overhead_ratio(ax, conn_500ms, 0, label='500\,ms', color='tab:green', shift_ms=-conn_500ms.time_to_first_byte(0), markersize=5)
-    plot_received_xse_overhead_ratio(ax, conn_1000ms, 0, label='1000\,ms', color='tab:red', shift_ms=-conn_1000ms.time_to_first_byte(0), markersize=5)
+    ax.axline((0, MIN_OVERHEAD_RATIO), (1, MIN_OVERHEAD_RATIO), color='gray', linestyle=(0, (1, 10)))
+    for rtt_ms, analysis, color in zip(rtts_ms, analyses, ['tab:blue', 'tab:orange', 'tab:green', 'tab:red']):
+        times, ratios = analysis.overhead_ratios(bin_ms, max_ms=20)
+        ax.plot(times, ratios, label=f'{rtt_ms}\\,ms', color=color, marker='.', linestyle='', markersize=5)
     fig.set_size_inches(8, 6)
     ax.set_axisbelow(True)
     ax.grid(True)
@@ -38,26 +41,43 @@ def plot():
         handle._sizes = [30]
     ax.xaxis.set_label_text('Time (s)')
     ax.yaxis.set_label_text('Ratio')
-    output_path = f'./plots/{file_name}.pdf'
-    fig.savefig(output_path, bbox_inches='tight', dpi=600)
+    output_path = save_figure(fig, output_path, bbox_inches='tight', dpi=600)
     print(f'saved plot as {output_path}')
     plt.plot()
 
 
-def report(connection: Connection, xse_connection: Connection, output_file: str):
+def report(analysis: XseAnalysis, xse_analysis: XseAnalysis, output_file: str):
     with open(output_file, 'w') as f:
-        f.write(f'without xse: {connection.avg_stream_receive_rate(0)} bit/s\n')
-        xse_raw = xse_connection.avg_raw_xse_stream_receive_rate(0)
-        f.write(f'with xse: raw: {xse_raw} bit/s\n')
-        xse_data = xse_connection.avg_xse_stream_receive_rate(0)
-        f.write(f'with xse: payload: {xse_data} bit/s\n')
-        overhead_ratio = (xse_raw - xse_data) / xse_data
-        f.write(f'with xse: overhead: {overhead_ratio}\n')
-
-plot()
-
-report(read_qlog('./data/72ms_two_proxies_simple/qlog/client.qlog.gz'), read_qlog('./data/72ms_two_proxies_simple_xse/qlog/client.qlog.gz'), './results/xse_overhead_72ms.txt')
-report(read_qlog('./data/220ms_two_proxies_simple/qlog/client.qlog.gz'), read_qlog('./data/220ms_two_proxies_simple_xse/qlog/client.qlog.gz'), './results/xse_overhead_220ms.txt')
-report(read_qlog('./data/500ms_two_proxies_simple/qlog/client.qlog.gz'), read_qlog('./data/500ms_two_proxies_simple_xse/qlog/client.qlog.gz'), './results/xse_overhead_500ms.txt')
-report(read_qlog('./data/1000ms_two_proxies_simple/qlog/client.qlog.gz'), read_qlog('./data/1000ms_two_proxies_simple_xse/qlog/client.qlog.gz'), './results/xse_overhead_1000ms.txt')
-report(read_qlog('./data/2000ms_two_proxies_simple/qlog/client.qlog.gz'), read_qlog('./data/2000ms_two_proxies_simple_xse/qlog/client.qlog.gz'), './results/xse_overhead_2000ms.txt')
+        f.write(f'without xse: {analysis.raw_rate} bit/s\n')
+        f.write(f'with xse: raw: {xse_analysis.raw_rate} bit/s\n')
+        f.write(f'with xse: payload: {xse_analysis.payload_rate} bit/s\n')
+        f.write(f'with xse: overhead: {xse_analysis.overhead_ratio}\n')
+
+
+def report_rtt(rtt_ms: int, output_file: str):
+    report(analyze_xse(f'./data/{rtt_ms}ms_two_proxies_simple/qlog/client.qlog.gz', xse=False),
+           analyze_xse(f'./data/{rtt_ms}ms_two_proxies_simple_xse/qlog/client.qlog.gz'), output_file)
+
+
+def report_target(rtt_ms: int, output_file: str) -> Target:
+    return Target(output_file, report_rtt, rtt_ms, output_file,
+                  inputs=[scenario_dir(rtt_ms, DISTRIBUTED_PEP, 'qlog'), scenario_dir(rtt_ms, DISTRIBUTED_PEP_XSE, 'qlog')])
+
+
+def targets() -> List[Target]:
+    output_path = f'./plots/{file_name}.pdf'
+    return [
+        Target(output_path, plot, output_path,
+               inputs=[scenario_dir(rtt_ms, DISTRIBUTED_PEP_XSE, 'qlog') for rtt_ms in [72, 220, 500, 1000]]),
+
+        report_target(72, './results/xse_overhead_72ms.txt'),
+        report_target(220, './results/xse_overhead_220ms.txt'),
+        report_target(500, './results/xse_overhead_500ms.txt'),
+        report_target(1000, './results/xse_overhead_1000ms.txt'),
+        report_target(2000, './results/xse_overhead_2000ms.txt'),
+    ]
+
+
+if __name__ == '__main__':
+    for t in targets():
+        t.run()